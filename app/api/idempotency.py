@@ -1,22 +1,275 @@
 # app/api/idempotency.py
+import asyncio
+import base64
+import gzip
 import json
 import logging
-from typing import Callable
+import struct
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+import orjson
+import redis.asyncio as redis
 from fastapi import Request, Response, status
 from fastapi.routing import APIRoute
-from starlette.responses import JSONResponse
-from app.core.redis_client import get_redis_client
+from starlette.responses import JSONResponse, StreamingResponse
+from app.core.redis_client import get_binary_redis_client
 from app.core.config import settings
+from app.core.metrics import metrics
 
 # Define which methods are considered for idempotency
 IDEMPOTENT_METHODS = {"POST", "PUT", "DELETE", "PATCH"}
 CACHE_TTL_SECONDS = 24 * 60 * 60  # 24 hours
-LOCK_TTL_SECONDS = 10 # Short lock to prevent race conditions
+LOCK_TTL_SECONDS = 10 # Short lock to prevent race conditions; renewed while the handler runs
+LOCK_RENEW_INTERVAL_SECONDS = LOCK_TTL_SECONDS / 3
+# Renewal stops after this long, so a lock whose request was abandoned still expires.
+LOCK_MAX_HOLD_SECONDS = 15 * 60
+# How long a duplicate waits for the in-flight original before giving up with a 409.
+WAIT_TIMEOUT_SECONDS = 60
 logger = logging.getLogger(__name__)
 
+# Stored responses are a fixed header (magic, version, flags, status code, length of the
+# JSON-encoded headers) followed by the headers and body, gzipped together when flagged.
+ENVELOPE_MAGIC = b"\x00IR"
+ENVELOPE_VERSION = 1
+ENVELOPE_HEADER = struct.Struct(">3sBBHI")
+FLAG_COMPRESSED = 1
+FLAG_BODY_OMITTED = 2
+# Recomputed when the response is replayed.
+UNSTORED_HEADERS = {"content-length"}
+
+# KEYS: cache key, lock key. ARGV: lock token, lock TTL in ms.
+# Returns {"cached", response}, {"acquired"} or {"busy"}.
+CHECK_AND_LOCK_SCRIPT = """
+local cached = redis.call('GET', KEYS[1])
+if cached then
+    return {'cached', cached}
+end
+if redis.call('SET', KEYS[2], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return {'acquired'}
+end
+return {'busy'}
+"""
+
+# KEYS: cache key, lock key. ARGV: lock token, response ('' to store nothing), cache TTL in
+# seconds, completion channel. Stores the response, releases the lock if this request still
+# holds it and wakes any duplicates waiting on the channel.
+STORE_AND_UNLOCK_SCRIPT = """
+if ARGV[2] ~= '' then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+end
+if redis.call('GET', KEYS[2]) == ARGV[1] then
+    redis.call('DEL', KEYS[2])
+end
+redis.call('PUBLISH', ARGV[4], ARGV[2] ~= '' and 'stored' or 'released')
+return 1
+"""
+
+# KEYS: lock key. ARGV: lock token, lock TTL in ms.
+RENEW_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+@dataclass(frozen=True)
+class IdempotencyScripts:
+    check_and_lock: Callable
+    store_and_unlock: Callable
+    renew_lock: Callable
+
+# Registered once per Redis client rather than on every request.
+_registered_scripts: "weakref.WeakKeyDictionary[redis.Redis, IdempotencyScripts]" = weakref.WeakKeyDictionary()
+
+def scripts_for(redis_client: redis.Redis) -> IdempotencyScripts:
+    scripts = _registered_scripts.get(redis_client)
+    if scripts is None:
+        scripts = _registered_scripts[redis_client] = IdempotencyScripts(
+            check_and_lock=redis_client.register_script(CHECK_AND_LOCK_SCRIPT),
+            store_and_unlock=redis_client.register_script(STORE_AND_UNLOCK_SCRIPT),
+            renew_lock=redis_client.register_script(RENEW_LOCK_SCRIPT),
+        )
+    return scripts
+
+class IdempotencyKeys:
+    """Redis keys and scripts for one Idempotency-Key."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        user_id: str,
+        idempotency_key: str,
+        scripts: IdempotencyScripts | None = None,
+    ):
+        self.redis = redis_client
+        self.cache_key = f"idempotency:{user_id}:{idempotency_key}"
+        self.lock_key = f"{self.cache_key}:lock"
+        self.channel = f"{self.cache_key}:done"
+        self.token = uuid.uuid4().hex
+        scripts = scripts or scripts_for(redis_client)
+        self._check_and_lock = scripts.check_and_lock
+        self._store_and_unlock = scripts.store_and_unlock
+        self._renew_lock = scripts.renew_lock
+
+    async def check_and_lock(self) -> tuple[str, bytes | None]:
+        """Returns ("cached", entry), ("acquired", None) or ("busy", None) in one round trip."""
+        result = await self._check_and_lock(
+            keys=[self.cache_key, self.lock_key], args=[self.token, int(LOCK_TTL_SECONDS * 1000)]
+        )
+        return result[0].decode(), result[1] if len(result) > 1 else None
+
+    async def store_and_unlock(self, response_data: bytes | None) -> None:
+        await self._store_and_unlock(
+            keys=[self.cache_key, self.lock_key],
+            args=[self.token, response_data or "", CACHE_TTL_SECONDS, self.channel],
+        )
+
+    async def keep_lock(self) -> None:
+        """
+        Extends the lock until cancelled, so a slow handler cannot outlive it. Gives up after
+        LOCK_MAX_HOLD_SECONDS and lets the lock expire.
+        """
+        deadline = time.monotonic() + LOCK_MAX_HOLD_SECONDS
+        while True:
+            await asyncio.sleep(LOCK_RENEW_INTERVAL_SECONDS)
+            if time.monotonic() >= deadline:
+                logger.warning("Stopped renewing idempotency lock %s after %ss.", self.lock_key, LOCK_MAX_HOLD_SECONDS)
+                return
+            try:
+                if not await self._renew_lock(keys=[self.lock_key], args=[self.token, int(LOCK_TTL_SECONDS * 1000)]):
+                    logger.warning("Idempotency lock %s was lost before the request finished.", self.lock_key)
+                    return
+            except Exception as exc:
+                logger.warning("Failed to renew idempotency lock %s: %s", self.lock_key, exc)
+
+    async def wait_for_result(self) -> tuple[str, bytes | None]:
+        """
+        Waits for the in-flight request with the same key to finish. Returns the outcome of
+        `check_and_lock` once the original has stored its response, released the lock or the
+        lock has expired; ("busy", None) after WAIT_TIMEOUT_SECONDS.
+        """
+        deadline = time.monotonic() + WAIT_TIMEOUT_SECONDS
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            while True:
+                # Checked after subscribing, so a completion published in between is not missed.
+                state, cached = await self.check_and_lock()
+                remaining = deadline - time.monotonic()
+                if state != "busy" or remaining <= 0:
+                    return state, cached
+                # Wake up at least once per lock TTL to notice an original that died without publishing.
+                await pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=min(remaining, LOCK_TTL_SECONDS)
+                )
+        finally:
+            await pubsub.unsubscribe(self.channel)
+            await pubsub.aclose()
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+    body_omitted: bool = False
+
+def encode_response(status_code: int, headers: dict[str, str], body: bytes, omit_body: bool = False) -> bytes:
+    stored_headers = {name: value for name, value in headers.items() if name.lower() not in UNSTORED_HEADERS}
+    header_bytes = orjson.dumps(stored_headers)
+    payload = header_bytes if omit_body else header_bytes + body
+    flags = FLAG_BODY_OMITTED if omit_body else 0
+    # Negotiated gzip/brotli bodies do not compress again.
+    already_encoded = any(name.lower() == "content-encoding" for name in stored_headers)
+    if len(payload) >= settings.IDEMPOTENCY_COMPRESS_MIN_BYTES and not already_encoded:
+        payload = gzip.compress(payload, compresslevel=5)
+        flags |= FLAG_COMPRESSED
+    return ENVELOPE_HEADER.pack(ENVELOPE_MAGIC, ENVELOPE_VERSION, flags, status_code, len(header_bytes)) + payload
+
+def decode_response(data: bytes) -> StoredResponse:
+    if not data.startswith(ENVELOPE_MAGIC):
+        # Entries written before the binary envelope: JSON with a base64 or text body.
+        cached = json.loads(data)
+        body = cached["body"]
+        body = base64.b64decode(body) if cached.get("body_encoding") == "base64" else body.encode("utf-8")
+        return StoredResponse(cached["status_code"], cached["headers"], body)
+
+    _, _, flags, status_code, header_length = ENVELOPE_HEADER.unpack_from(data)
+    payload = data[ENVELOPE_HEADER.size:]
+    if flags & FLAG_COMPRESSED:
+        payload = gzip.decompress(payload)
+    headers = orjson.loads(payload[:header_length])
+    return StoredResponse(status_code, headers, payload[header_length:], bool(flags & FLAG_BODY_OMITTED))
+
+def _replay(data: bytes) -> Response:
+    stored = decode_response(data)
+    if stored.body_omitted:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={
+                "detail": "A request with this Idempotency-Key was already processed, but its response "
+                          "was streamed or too large to store. Re-read the affected resources."
+            }
+        )
+    return Response(content=stored.body, status_code=stored.status_code, headers=stored.headers)
+
+class LocalResponseCache:
+    """
+    Short-lived per-process LRU of stored responses, so retries of a hot key skip Redis.
+    Entries never change once stored, so serving them from memory is safe.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    def set(self, key: str, data: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+class _ReleaseAfterStreamResponse(Response):
+    """
+    Sends a streaming response, then runs `on_complete` whether the stream finished, failed
+    or was cut short by a disconnect.
+    """
+
+    def __init__(self, response: StreamingResponse, on_complete: Callable[[], Awaitable[None]]):
+        self.response = response
+        self.on_complete = on_complete
+        self.status_code = response.status_code
+        self.raw_headers = response.raw_headers
+        self.background = None
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            # Shielded so a cancelled send still releases the lock.
+            await asyncio.shield(self.on_complete())
+
 class IdempotentAPIRoute(APIRoute):
     def get_route_handler(self) -> Callable:
         original_handler = super().get_route_handler()
+        local_cache = LocalResponseCache(settings.IDEMPOTENCY_L1_MAX_ENTRIES, settings.IDEMPOTENCY_L1_TTL_SECONDS)
 
         async def idempotent_handler(request: Request) -> Response:
             # Bypass for non-idempotent methods
@@ -32,58 +285,92 @@ class IdempotentAPIRoute(APIRoute):
                     content={"detail": "X-User-ID and Idempotency-Key headers are required for this operation."}
                 )
 
-            redis = get_redis_client()
-            cache_key = f"idempotency:{user_id}:{idempotency_key}"
-            lock_key = f"{cache_key}:lock"
+            redis_client = get_binary_redis_client()
+            keys = IdempotencyKeys(redis_client, user_id, idempotency_key, scripts_for(redis_client))
+            route_label = f"{request.method} {self.path}"
 
-            # 1. Check for a cached response
-            cached_response_data = await redis.get(cache_key)
-            if cached_response_data:
-                if settings.IDEMPOTENCY_DEBUG:
-                    logger.info("Idempotency cache hit for %s", cache_key)
-                cached = json.loads(cached_response_data)
-                return Response(
-                    content=cached["body"],
-                    status_code=cached["status_code"],
-                    headers=cached["headers"]
-                )
-            elif settings.IDEMPOTENCY_DEBUG:
-                logger.info("Idempotency cache miss for %s", cache_key)
+            local_entry = local_cache.get(keys.cache_key)
+            if local_entry is not None:
+                metrics.increment("idempotency.l1_hits")
+                return _replay(local_entry)
 
-            # 2. Lock the key to prevent race conditions
-            if not await redis.set(lock_key, "1", nx=True, ex=LOCK_TTL_SECONDS):
+            # 1. Return the cached response or take the lock, in one round trip
+            state, cached_response_data = await keys.check_and_lock()
+            if state == "busy":
+                # 2. A request with this key is in flight: wait for its response
+                if settings.IDEMPOTENCY_DEBUG:
+                    logger.info("Idempotency lock contention for %s; waiting", keys.cache_key)
+                state, cached_response_data = await keys.wait_for_result()
+            if state == "cached":
                 if settings.IDEMPOTENCY_DEBUG:
-                    logger.info("Idempotency lock contention for %s", cache_key)
+                    logger.info("Idempotency cache hit for %s", keys.cache_key)
+                metrics.increment("idempotency.hits")
+                local_cache.set(keys.cache_key, cached_response_data)
+                return _replay(cached_response_data)
+            if state == "busy":
                 return JSONResponse(
                     status_code=status.HTTP_409_CONFLICT,
                     content={"detail": "A request with this Idempotency-Key is already in progress."}
                 )
+            if settings.IDEMPOTENCY_DEBUG:
+                logger.info("Idempotency cache miss for %s", keys.cache_key)
 
+            renewal = asyncio.create_task(keys.keep_lock())
+            response_data_to_cache = None
+            streaming = False
             try:
                 # 3. Execute the original request handler
                 response: Response = await original_handler(request)
 
-                # 4. Cache the response if it's a success or a client error worth caching
+                # 4. Cache the response if it's a success or a client error worth caching.
+                if isinstance(response, StreamingResponse):
+                    # The body is produced after this handler returns and cannot be replayed:
+                    # keep the lock until the stream ends, then store a body-less marker so a
+                    # retry is told the request already ran instead of running it again.
+                    marker = encode_response(response.status_code, dict(response.headers), b"", omit_body=True)
+                    streaming = True
+                    return _ReleaseAfterStreamResponse(
+                        response, lambda: self._release_after_stream(keys, renewal, marker, route_label)
+                    )
                 if 200 <= response.status_code < 500:
-                    # We need to read the body to cache it.
-                    # A response body can only be read once, so we must then create a new response.
-                    response_body = response.body
-                    
-                    response_data_to_cache = {
-                        "status_code": response.status_code,
-                        "headers": dict(response.headers),
-                        "body": response_body.decode("utf-8")
-                    }
-                    await redis.set(cache_key, json.dumps(response_data_to_cache), ex=CACHE_TTL_SECONDS)
-                    if settings.IDEMPOTENCY_DEBUG:
-                        logger.info("Cached response for %s", cache_key)
-                
+                    response_data_to_cache = self._entry_for(response, route_label)
+
                 return response
 
             finally:
-                # 5. Release the lock
-                await redis.delete(lock_key)
-                if settings.IDEMPOTENCY_DEBUG:
-                    logger.info("Released idempotency lock for %s", cache_key)
+                # 5. Store the response and release the lock in one round trip; waiting
+                # duplicates are notified either way and retry if nothing was stored.
+                if not streaming:
+                    renewal.cancel()
+                    await keys.store_and_unlock(response_data_to_cache)
+                    if response_data_to_cache is not None:
+                        local_cache.set(keys.cache_key, response_data_to_cache)
+                    if settings.IDEMPOTENCY_DEBUG:
+                        logger.info("Released idempotency lock for %s", keys.cache_key)
 
         return idempotent_handler
+
+    @staticmethod
+    def _entry_for(response: Response, route_label: str) -> bytes | None:
+        """Encodes `response` for storage, applying IDEMPOTENCY_MAX_ENTRY_BYTES."""
+        entry = encode_response(response.status_code, dict(response.headers), response.body)
+        if len(entry) > settings.IDEMPOTENCY_MAX_ENTRY_BYTES:
+            metrics.increment(f"idempotency.oversize.{route_label}")
+            if settings.IDEMPOTENCY_OVERSIZE_POLICY == "skip":
+                return None
+            entry = encode_response(response.status_code, dict(response.headers), b"", omit_body=True)
+        IdempotentAPIRoute._count_stored(entry, route_label)
+        return entry
+
+    @staticmethod
+    def _count_stored(entry: bytes, route_label: str) -> None:
+        metrics.increment(f"idempotency.entries_stored.{route_label}")
+        metrics.increment(f"idempotency.bytes_stored.{route_label}", len(entry))
+
+    @staticmethod
+    async def _release_after_stream(
+        keys: IdempotencyKeys, renewal: asyncio.Task, marker: bytes, route_label: str
+    ) -> None:
+        renewal.cancel()
+        IdempotentAPIRoute._count_stored(marker, route_label)
+        await keys.store_and_unlock(marker)
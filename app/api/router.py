@@ -1,21 +1,31 @@
 # app/api/router.py
+import json
+import logging
+from typing import AsyncIterator
 from uuid import UUID
-from fastapi import APIRouter, Depends, status, HTTPException, Response, Header, Request
+from fastapi import APIRouter, Depends, status, HTTPException, Response, Header, Request, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from app.models.graph import Node, Graph, Edge, NodeUpdate, NodeCreate
+from app.models.graph import Node, Graph, GraphDelta, Edge, NodeUpdate, NodeCreate, VectorEncoding
+from app.models.job import Job, JobAccepted, JobStatus
+from app.models.bulk import BulkEdgesRequest, BulkNodesRequest, BulkResult
 from app.models.prompt import PromptDocument, PromptUpdate
 from app.services.graph_service import GraphService
-from app.db.driver import get_db_driver
-from neo4j import AsyncDriver
-from app.core.exceptions import NodeNotFoundException
+from app.services.container import ServiceContainer
+from app.core.exceptions import NodeNotFoundException, QuotaExceededException, ServiceOverloadedException
 from app.services.prompt_service import PromptService
 from app.core.limiter import limiter
 from app.api.idempotency import IdempotentAPIRoute
+from app.services.job_queue import JobQueue
+from app.api.serialization import negotiate, negotiated_response
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 router.route_class = IdempotentAPIRoute
 
-prompt_service = PromptService()
+# Number of NDJSON lines buffered into a single chunk of the streaming graph response.
+NDJSON_CHUNK_SIZE = 200
 
 # --- New Request Model ---
 class ActionRequest(BaseModel):
@@ -28,14 +38,37 @@ def get_user_id(x_user_id: str = Header(..., description="Client-generated uniqu
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="X-User-ID header is required.")
     return x_user_id
 
-def get_prompt_service() -> PromptService:
-    return prompt_service
+def get_vector_encoding(
+    vector_encoding: VectorEncoding | None = Query(
+        None,
+        description="Include node embeddings in a compact base64 encoding. Omitted by default."
+    )
+) -> VectorEncoding | None:
+    return vector_encoding
 
-def get_service(
-    driver: AsyncDriver = Depends(get_db_driver),
-    prompt_service: PromptService = Depends(get_prompt_service)
-) -> GraphService:
-    return GraphService(driver, prompt_service)
+def get_container(request: Request) -> ServiceContainer:
+    return request.app.state.container
+
+def get_prompt_service(container: ServiceContainer = Depends(get_container)) -> PromptService:
+    return container.prompt_service
+
+def get_service(container: ServiceContainer = Depends(get_container)) -> GraphService:
+    return container.graph_service
+
+def get_job_queue(container: ServiceContainer = Depends(get_container)) -> JobQueue:
+    return container.job_queue
+
+async def _graph_to_ndjson(items: AsyncIterator[Node | Edge]) -> AsyncIterator[str]:
+    """Encodes streamed graph elements as `{"type": ..., "data": ...}` lines."""
+    buffer: list[str] = []
+    async for item in items:
+        item_type = "node" if isinstance(item, Node) else "edge"
+        buffer.append(json.dumps({"type": item_type, "data": item.model_dump(mode="json")}))
+        if len(buffer) >= NDJSON_CHUNK_SIZE:
+            yield "\n".join(buffer) + "\n"
+            buffer.clear()
+    if buffer:
+        yield "\n".join(buffer) + "\n"
 
 @router.delete("/graph", status_code=status.HTTP_204_NO_CONTENT, tags=["Graph"])
 @limiter.limit("10/minute")
@@ -48,22 +81,120 @@ async def clear_workspace(
     await service.clear_workspace(user_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
-@router.get("/graph", response_model=Graph, tags=["Graph"])
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+@router.get(
+    "/graph",
+    response_model=Graph | GraphDelta,
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "The workspace matches the `If-None-Match` ETag."}},
+    tags=["Graph"]
+)
 async def get_full_graph(
+    request: Request,
+    since: int | None = Query(
+        None,
+        ge=0,
+        description="Return a GraphDelta with only the changes after this workspace revision."
+    ),
+    user_id: str = Depends(get_user_id),
+    vector_encoding: VectorEncoding | None = Depends(get_vector_encoding),
+    service: GraphService = Depends(get_service)
+):
+    """
+    Returns the whole workspace, tagged with a strong ETag for its revision; unchanged
+    workspaces answer `If-None-Match` with 304. With `since`, returns only what changed after
+    that revision. Responses are MessagePack when `Accept` prefers `application/msgpack`,
+    and gzip or brotli encoded per `Accept-Encoding`.
+    """
+    negotiation = negotiate(request)
+    if since is not None:
+        delta = await service.get_graph_delta(user_id, since, vector_encoding)
+        return negotiated_response(request, delta, negotiation=negotiation)
+
+    variant = vector_encoding.value if vector_encoding else "plain"
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Revalidation only needs the revision; build the payload only if it changed.
+        etag = f'"{await service.get_graph_revision(user_id)}-{variant}-{negotiation.tag}"'
+        if _etag_matches(if_none_match, etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+            )
+
+    payload, revision = await service.get_graph_payload(user_id, vector_encoding)
+    headers = {"ETag": f'"{revision}-{variant}-{negotiation.tag}"', "Cache-Control": "no-cache"}
+    return negotiated_response(request, gzipped_json=payload, headers=headers, negotiation=negotiation)
+
+async def _action_events_to_sse(events: AsyncIterator[tuple[str, Node | Edge]]) -> AsyncIterator[str]:
+    """Encodes streamed AI action results as Server-Sent Events, ending with `done` or `error`."""
+    try:
+        async for kind, item in events:
+            yield f"event: {kind}\ndata: {item.model_dump_json()}\n\n"
+    except (ServiceOverloadedException, QuotaExceededException) as e:
+        yield f"event: error\ndata: {json.dumps({'detail': e.message, 'retry_after': e.retry_after})}\n\n"
+        return
+    except Exception:
+        logger.exception("Streaming AI action failed.")
+        yield f"event: error\ndata: {json.dumps({'detail': 'AI failed to generate a valid graph modification.'})}\n\n"
+        return
+    yield "event: done\ndata: {}\n\n"
+
+@router.get("/graph/stream", tags=["Graph"])
+async def stream_full_graph(
     user_id: str = Depends(get_user_id),
+    vector_encoding: VectorEncoding | None = Depends(get_vector_encoding),
     service: GraphService = Depends(get_service)
 ):
-    return await service.get_graph(user_id)
+    """
+    Streams the workspace as newline-delimited JSON: all nodes first, then all edges,
+    each line shaped as `{"type": "node" | "edge", "data": {...}}`.
+    """
+    await service.check_budget(user_id)
+    return StreamingResponse(
+        _graph_to_ndjson(service.stream_graph(user_id, vector_encoding)),
+        media_type="application/x-ndjson"
+    )
 
-@router.post("/graph/execute-action", status_code=status.HTTP_201_CREATED, response_model=Graph, tags=["Graph Actions"])
+@router.post(
+    "/graph/execute-action",
+    status_code=status.HTTP_201_CREATED,
+    response_model=Graph,
+    responses={status.HTTP_202_ACCEPTED: {"model": JobAccepted}},
+    tags=["Graph Actions"]
+)
 @limiter.limit("15/minute")
 async def execute_action(
     request: Request,
     action_request: ActionRequest,
+    run_async: bool = Query(
+        False,
+        alias="async",
+        description="Queue the action for a worker and return 202 with a job ID instead of waiting."
+    ),
     user_id: str = Depends(get_user_id),
-    service: GraphService = Depends(get_service)
+    service: GraphService = Depends(get_service),
+    job_queue: JobQueue = Depends(get_job_queue)
 ):
     """Executes a complex, prompt-driven action on the graph."""
+    if run_async:
+        job = await job_queue.enqueue(user_id, action_request.action_key, action_request.selected_node_ids)
+        accepted = JobAccepted(
+            job_id=job.id,
+            status=job.status,
+            status_url=f"/jobs/{job.id}",
+            result_url=f"/jobs/{job.id}/result",
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=accepted.model_dump(mode="json"),
+            headers={"Location": accepted.status_url},
+        )
+
     try:
         created_graph = await service.execute_ai_action(
             action_request.action_key, action_request.selected_node_ids, user_id
@@ -73,10 +204,68 @@ async def execute_action(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="AI failed to generate a valid graph modification."
             )
-        return created_graph
+        return negotiated_response(request, created_graph, status_code=status.HTTP_201_CREATED)
+    except NodeNotFoundException as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+
+@router.post("/graph/execute-action/stream", tags=["Graph Actions"])
+@limiter.limit("15/minute")
+async def stream_action(
+    request: Request,
+    action_request: ActionRequest,
+    user_id: str = Depends(get_user_id),
+    service: GraphService = Depends(get_service)
+):
+    """
+    Executes a prompt-driven action and streams the results as Server-Sent Events: a `node`
+    event for each node once it is persisted, an `edge` event as soon as both endpoints
+    exist, then a final `done` (or `error`) event.
+    """
+    try:
+        events = await service.stream_ai_action(
+            action_request.action_key, action_request.selected_node_ids, user_id
+        )
     except NodeNotFoundException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return StreamingResponse(
+        _action_events_to_sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/jobs/{job_id}", response_model=Job, tags=["Graph Actions"])
+async def get_job(
+    job_id: UUID,
+    user_id: str = Depends(get_user_id),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """Returns the status of a queued AI action."""
+    job = await job_queue.get(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
 
+@router.get("/jobs/{job_id}/result", response_model=Graph, tags=["Graph Actions"])
+async def get_job_result(
+    request: Request,
+    job_id: UUID,
+    user_id: str = Depends(get_user_id),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """Returns the Graph created by a finished AI action job."""
+    job = await job_queue.get(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    if job.status != JobStatus.SUCCEEDED:
+        detail = f"Job is {job.status.value}."
+        if job.error:
+            detail = f"{detail} {job.error}"
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+    result = await job_queue.get_result(job_id)
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job result has expired")
+    return negotiated_response(request, result)
 
 @router.post("/nodes", status_code=status.HTTP_201_CREATED, response_model=Node, tags=["Nodes"])
 @limiter.limit("60/minute")
@@ -86,7 +275,23 @@ async def add_node(
     user_id: str = Depends(get_user_id),
     service: GraphService = Depends(get_service)
 ):
-    return await service.create_node(node_data, user_id)
+    node = await service.create_node(node_data, user_id)
+    return negotiated_response(request, node, status_code=status.HTTP_201_CREATED)
+
+@router.post("/nodes/bulk", response_model=BulkResult, tags=["Nodes"])
+@limiter.limit("10/minute")
+async def add_nodes_bulk(
+    request: Request,
+    bulk_request: BulkNodesRequest,
+    user_id: str = Depends(get_user_id),
+    service: GraphService = Depends(get_service)
+):
+    """
+    Creates up to BULK_MAX_ITEMS nodes in one request. The response lists a result per
+    submitted node, in request order; failed items do not roll back the others.
+    """
+    result = await service.create_nodes_bulk(bulk_request.nodes, user_id)
+    return negotiated_response(request, result)
 
 @router.get("/nodes/{node_id}", response_model=Node, tags=["Nodes"])
 @limiter.limit("200/minute")
@@ -94,12 +299,13 @@ async def get_node(
     request: Request,
     node_id: UUID,
     user_id: str = Depends(get_user_id),
+    vector_encoding: VectorEncoding | None = Depends(get_vector_encoding),
     service: GraphService = Depends(get_service)
 ):
-    node = await service.get_node(node_id, user_id)
+    node = await service.get_node(node_id, user_id, vector_encoding)
     if node is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
-    return node
+    return negotiated_response(request, node)
 
 @router.put("/nodes/{node_id}", response_model=Node, tags=["Nodes"])
 @limiter.limit("60/minute")
@@ -113,7 +319,7 @@ async def update_node(
     updated_node = await service.update_node_properties(node_id, node_update, user_id)
     if updated_node is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Node not found")
-    return updated_node
+    return negotiated_response(request, updated_node)
 
 @router.delete("/nodes/{node_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Nodes"])
 @limiter.limit("60/minute")
@@ -140,6 +346,21 @@ async def add_edge(
     except NodeNotFoundException as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=e.message)
 
+@router.post("/edges/bulk", response_model=BulkResult, tags=["Edges"])
+@limiter.limit("10/minute")
+async def add_edges_bulk(
+    request: Request,
+    bulk_request: BulkEdgesRequest,
+    user_id: str = Depends(get_user_id),
+    service: GraphService = Depends(get_service)
+):
+    """
+    Creates up to BULK_MAX_ITEMS edges in one request. Edges whose source or target is not
+    in the workspace are reported as `not_found` instead of failing the request.
+    """
+    result = await service.create_edges_bulk(bulk_request.edges, user_id)
+    return negotiated_response(request, result)
+
 @router.delete("/edges", status_code=status.HTTP_204_NO_CONTENT, tags=["Edges"])
 @limiter.limit("120/minute")
 async def delete_edge(
@@ -0,0 +1,132 @@
+# app/api/serialization.py
+# Response encoding for graph-sized payloads: pydantic-core/orjson instead of FastAPI's default
+# jsonable_encoder path, MessagePack when the client asks for it, and gzip/brotli content
+# coding from Accept-Encoding.
+import gzip
+from dataclasses import dataclass
+import orjson
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install brotli`
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:  # optional: `pip install msgpack`
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+# Bodies smaller than this are sent uncompressed; the framing overhead outweighs the savings.
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+@dataclass(frozen=True)
+class Negotiation:
+    media_type: str
+    encoding: str  # "br", "gzip" or "identity"
+
+    @property
+    def tag(self) -> str:
+        """Short label of the representation, for building per-representation ETags."""
+        media = "msgpack" if self.media_type != JSON_MEDIA_TYPE else "json"
+        return media if self.encoding == "identity" else f"{media}-{self.encoding}"
+
+def _parse_header(value: str) -> dict[str, float]:
+    """Maps each token of an Accept-style header to its q-value."""
+    weights = {}
+    for part in value.split(","):
+        token, *params = [piece.strip() for piece in part.split(";")]
+        if not token:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, raw = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(raw)
+                except ValueError:
+                    quality = 0.0
+        weights[token.lower()] = quality
+    return weights
+
+def negotiate(request: Request) -> Negotiation:
+    accept = _parse_header(request.headers.get("accept", ""))
+    media_type = JSON_MEDIA_TYPE
+    if msgpack is not None:
+        msgpack_quality = max((accept.get(media, 0.0) for media in MSGPACK_MEDIA_TYPES), default=0.0)
+        json_quality = max(accept.get(JSON_MEDIA_TYPE, 0.0), accept.get("*/*", 0.0))
+        if msgpack_quality > 0 and msgpack_quality >= json_quality:
+            media_type = MSGPACK_MEDIA_TYPES[0]
+
+    accept_encoding = _parse_header(request.headers.get("accept-encoding", ""))
+    encoding = "identity"
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = 0.0
+    for candidate in candidates:
+        quality = accept_encoding.get(candidate, accept_encoding.get("*", 0.0))
+        if quality > best:
+            encoding, best = candidate, quality
+    return Negotiation(media_type=media_type, encoding=encoding)
+
+def serialize(content: BaseModel | dict | list, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    if media_type == JSON_MEDIA_TYPE:
+        # pydantic-core writes JSON straight from the model; going through model_dump() for
+        # orjson costs more than it saves (see benchmarks/bench_graph_serialization.py).
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode("utf-8")
+        return orjson.dumps(content)
+    data = content.model_dump() if isinstance(content, BaseModel) else content
+    # msgpack has no UUID or enum types; send them the way JSON clients see them.
+    return msgpack.packb(data, default=_msgpack_default)
+
+def _msgpack_default(value):
+    if hasattr(value, "value"):
+        return value.value
+    return str(value)
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+def negotiated_response(
+    request: Request,
+    content: BaseModel | dict | list | None = None,
+    *,
+    gzipped_json: bytes | None = None,
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
+    negotiation: Negotiation | None = None,
+) -> Response:
+    """
+    Renders `content` (or an already gzip-compressed JSON body, e.g. from the graph cache)
+    in the representation the client negotiated. Pre-compressed JSON is passed through
+    untouched when the client accepts gzip JSON.
+    """
+    negotiation = negotiation or negotiate(request)
+    response_headers = {"Vary": "Accept, Accept-Encoding", **(headers or {})}
+
+    if gzipped_json is not None and negotiation.media_type == JSON_MEDIA_TYPE and negotiation.encoding == "gzip":
+        body, encoding = gzipped_json, "gzip"
+    else:
+        if gzipped_json is not None:
+            raw = gzip.decompress(gzipped_json)
+            if negotiation.media_type != JSON_MEDIA_TYPE:
+                raw = serialize(orjson.loads(raw), negotiation.media_type)
+        else:
+            raw = serialize(content, negotiation.media_type)
+        encoding = negotiation.encoding if len(raw) >= MIN_COMPRESS_BYTES else "identity"
+        body = compress(raw, encoding)
+
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+    return Response(
+        content=body, status_code=status_code, media_type=negotiation.media_type, headers=response_headers
+    )
@@ -0,0 +1,75 @@
+# app/core/bulkhead.py
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from app.core.config import settings
+from app.core.exceptions import ServiceOverloadedException
+from app.core.metrics import metrics
+
+class Bulkhead:
+    """
+    Caps concurrent calls to a slow dependency. Up to `max_queue` callers may wait for a slot;
+    anyone beyond that, or anyone who waits longer than `queue_timeout`, is rejected immediately.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._active = 0
+        self._waiting = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        else:
+            if self._waiting >= self.max_queue:
+                self._reject("queue full")
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._reject("queue timeout")
+            finally:
+                self._waiting -= 1
+
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    def _reject(self, reason: str) -> None:
+        metrics.increment(f"bulkhead.{self.name}.rejected")
+        raise ServiceOverloadedException(
+            f"{self.name} is at capacity ({reason}). Please retry shortly.",
+            retry_after=self.retry_after,
+        )
+
+_ai_bulkhead: Bulkhead | None = None
+
+def get_ai_bulkhead() -> Bulkhead:
+    """Returns the process-wide bulkhead guarding Gemini generation calls."""
+    global _ai_bulkhead
+    if _ai_bulkhead is None:
+        _ai_bulkhead = Bulkhead(
+            name="ai_generation",
+            max_concurrent=settings.AI_MAX_CONCURRENCY,
+            max_queue=settings.AI_MAX_QUEUE,
+            queue_timeout=settings.AI_QUEUE_TIMEOUT_SECONDS,
+            retry_after=settings.AI_RETRY_AFTER_SECONDS,
+        )
+    return _ai_bulkhead
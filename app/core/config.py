@@ -1,4 +1,5 @@
 # app/core/config.py
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -8,7 +9,74 @@ class Settings(BaseSettings):
     REDIS_URL: str
     GEMINI_API_KEY: str = ""
     LIMITER_STORAGE_URI: str = ""
+    # "hybrid" counts rate limit hits in process and adds them to Redis every sync interval
+    # (expensive endpoints are still checked on every hit); "redis" checks every hit in Redis.
+    LIMITER_MODE: Literal["hybrid", "redis"] = "hybrid"
+    LIMITER_SYNC_INTERVAL_SECONDS: float = 0.5
     IDEMPOTENCY_DEBUG: bool = False
+    # Stored idempotency responses: bodies over the threshold are gzipped, and an entry still
+    # over the cap is kept as a body-less marker ("marker") or not stored at all ("skip").
+    IDEMPOTENCY_COMPRESS_MIN_BYTES: int = 1024
+    IDEMPOTENCY_MAX_ENTRY_BYTES: int = 256 * 1024
+    IDEMPOTENCY_OVERSIZE_POLICY: Literal["marker", "skip"] = "marker"
+    # Per-process LRU of recently stored or replayed responses, checked before Redis.
+    IDEMPOTENCY_L1_MAX_ENTRIES: int = 1024
+    IDEMPOTENCY_L1_TTL_SECONDS: float = 30.0
+    # Concurrent get_embedding calls arriving within this window share one batch request.
+    EMBEDDING_BATCH_WINDOW_MS: int = 10
+    EMBEDDING_MAX_BATCH_SIZE: int = 100
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 5000
+    EMBEDDING_CACHE_TTL_SECONDS: int = 30 * 24 * 60 * 60
+    EMBEDDING_TIMEOUT_SECONDS: float = 15.0
+    # Retries on 429/5xx and transport errors, with jittered exponential backoff.
+    EMBEDDING_MAX_RETRIES: int = 3
+    HTTP_MAX_CONNECTIONS: int = 50
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_TIMEOUT_SECONDS: float = 30.0
+    # Bulkhead around Gemini generation: concurrent calls, waiting callers, and max wait.
+    AI_MAX_CONCURRENCY: int = 8
+    AI_MAX_QUEUE: int = 16
+    AI_QUEUE_TIMEOUT_SECONDS: float = 30.0
+    AI_RETRY_AFTER_SECONDS: int = 5
+    # Fair sharing of AI action slots: concurrent and waiting actions per user, and
+    # round-robin weights by user id (unlisted users weigh 1).
+    AI_USER_MAX_CONCURRENCY: int = 2
+    AI_USER_MAX_QUEUE: int = 8
+    AI_USER_WEIGHTS: dict[str, int] = {}
+    # Streamed AI nodes and edges are written in batches of at most this many items.
+    AI_STREAM_WRITE_BATCH_SIZE: int = 8
+    # Async AI action jobs: how long job records/results live, and tasks per worker process.
+    JOB_TTL_SECONDS: int = 24 * 60 * 60
+    JOB_WORKER_CONCURRENCY: int = 4
+    # Claimed jobs not finished within the visibility timeout (e.g. their worker crashed) go
+    # back to the queue; workers look for them every reaper interval. Keep the timeout well
+    # above the slowest AI action, or a slow job may run twice.
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 10 * 60
+    JOB_REAPER_INTERVAL_SECONDS: float = 30.0
+    # Exact-match cache of LLM responses keyed by the rendered prompt.
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 60 * 60
+    LLM_CACHE_LEASE_SECONDS: int = 60
+    # "neo4j" searches the shared vector index; "memory" keeps per-workspace NumPy matrices
+    # in each process, evicted LRU beyond the budget and reloaded after the TTL.
+    VECTOR_BACKEND: Literal["neo4j", "memory"] = "neo4j"
+    VECTOR_INDEX_MEMORY_BUDGET_MB: int = 256
+    VECTOR_INDEX_TTL_SECONDS: int = 300
+    # Cached GET /graph payloads; entries are also superseded by any write to the workspace.
+    GRAPH_CACHE_TTL_SECONDS: int = 10 * 60
+    # Workspace revisions kept in the change log for `GET /graph?since=`; older clients resync.
+    # The log is trimmed once every this many revisions, so it holds up to twice as many.
+    CHANGELOG_RETENTION_REVISIONS: int = 1000
+    # Per-user budget of cost units over a rolling window (see UsageAccountant): a prompt
+    # token or a row read costs one unit, response tokens and embeddings cost more.
+    USAGE_ACCOUNTING_ENABLED: bool = True
+    USAGE_BUDGET_UNITS: int = 500_000
+    USAGE_WINDOW_SECONDS: int = 60 * 60
+    USAGE_RESPONSE_TOKEN_COST: int = 4
+    USAGE_EMBEDDING_COST: int = 20
+    # POST /nodes/bulk and /edges/bulk: items per request, and items per write transaction.
+    BULK_MAX_ITEMS: int = 5000
+    BULK_WRITE_CHUNK_SIZE: int = 500
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -3,4 +3,18 @@ class NodeNotFoundException(Exception):
     """Raised when a node is not found for a given ID."""
     def __init__(self, message="Node not found."):
         self.message = message
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+class ServiceOverloadedException(Exception):
+    """Raised when a capacity-limited dependency cannot accept more work right now."""
+    def __init__(self, message="Service is at capacity.", retry_after: int = 5):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+class QuotaExceededException(Exception):
+    """Raised when a user has spent their rolling usage budget."""
+    def __init__(self, message="Usage budget exhausted.", retry_after: int = 60):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
@@ -0,0 +1,195 @@
+# app/core/fair_scheduler.py
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+from app.core.config import settings
+from app.core.exceptions import ServiceOverloadedException
+from app.core.metrics import metrics
+
+@dataclass
+class _Waiter:
+    future: asyncio.Future
+    enqueued_at: float
+
+@dataclass
+class _UserState:
+    weight: int
+    active: int = 0
+    credit: int = 0  # Admissions left in this user's current round-robin turn.
+    waiters: deque[_Waiter] = field(default_factory=deque)
+
+class FairScheduler:
+    """
+    Shares `max_concurrent` slots between users. A user holds at most `per_user_concurrency`
+    slots at a time and may have `per_user_queue` more calls waiting. Freed slots go to
+    waiting users in weighted round-robin order: each turn admits up to `weight` of the
+    user's calls (default 1). So a user with many queued calls cannot delay a user with
+    one queued call by more than one turn. Callers waiting longer than `queue_timeout`,
+    or beyond their user's queue limit, are rejected immediately.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        per_user_concurrency: int,
+        per_user_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+        weights: dict[str, int] | None = None,
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.per_user_concurrency = per_user_concurrency
+        self.per_user_queue = per_user_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.weights = weights or {}
+        self._users: dict[str, _UserState] = {}
+        # Users with waiting calls, in the order their turns come up.
+        self._ring: deque[str] = deque()
+        self._active = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(state.waiters) for state in self._users.values())
+
+    def snapshot(self) -> dict[str, float]:
+        """
+        Aggregate slot usage and queueing. User IDs double as workspace credentials, so
+        nothing here is broken down per user.
+        """
+        now = time.monotonic()
+        prefix = f"scheduler.{self.name}"
+        oldest_waits = [now - state.waiters[0].enqueued_at for state in self._users.values() if state.waiters]
+        return {
+            f"{prefix}.active": self._active,
+            f"{prefix}.queued": self.waiting,
+            f"{prefix}.waiting_users": len(oldest_waits),
+            f"{prefix}.max_oldest_wait_seconds": round(max(oldest_waits, default=0), 3),
+        }
+
+    @asynccontextmanager
+    async def acquire(self, user_id: str) -> AsyncIterator[None]:
+        await self._admit(user_id)
+        try:
+            yield
+        finally:
+            self._release(user_id)
+
+    async def _admit(self, user_id: str) -> None:
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserState(weight=max(1, self.weights.get(user_id, 1)))
+        if (
+            self._active < self.max_concurrent
+            and state.active < self.per_user_concurrency
+            and not state.waiters
+        ):
+            # Free slots only coexist with waiters that are at their own user's cap,
+            # so taking one here never jumps ahead of anyone.
+            self._start(state, waited=0.0)
+            return
+        if len(state.waiters) >= self.per_user_queue:
+            self._forget_if_idle(user_id)
+            self._reject("user queue full")
+
+        waiter = _Waiter(future=asyncio.get_running_loop().create_future(), enqueued_at=time.monotonic())
+        state.waiters.append(waiter)
+        if len(state.waiters) == 1:
+            state.credit = state.weight
+            self._ring.append(user_id)
+        metrics.increment(f"scheduler.{self.name}.queued")
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except BaseException as exc:
+            if waiter.future.done():
+                # Admitted just as the wait ended; hand the slot on.
+                self._release(user_id)
+            else:
+                waiter.future.cancel()
+                self._remove_waiter(user_id, waiter)
+            if isinstance(exc, asyncio.TimeoutError):
+                self._reject("queue timeout")
+            raise
+
+    def _start(self, state: _UserState, waited: float) -> None:
+        self._active += 1
+        state.active += 1
+        metrics.increment(f"scheduler.{self.name}.admitted")
+        metrics.increment(f"scheduler.{self.name}.wait_seconds", waited)
+
+    def _release(self, user_id: str) -> None:
+        state = self._users[user_id]
+        self._active -= 1
+        state.active -= 1
+        self._forget_if_idle(user_id)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hands free slots to waiting users in round-robin order, skipping users at their cap."""
+        skipped = 0
+        while self._active < self.max_concurrent and skipped < len(self._ring):
+            user_id = self._ring[0]
+            state = self._users[user_id]
+            if state.active >= self.per_user_concurrency:
+                self._end_turn(state)
+                skipped += 1
+                continue
+
+            waiter = state.waiters.popleft()
+            self._start(state, waited=time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+            skipped = 0
+            state.credit -= 1
+            if not state.waiters:
+                self._ring.popleft()
+            elif state.credit <= 0:
+                self._end_turn(state)
+
+    def _end_turn(self, state: _UserState) -> None:
+        state.credit = state.weight
+        self._ring.rotate(-1)
+
+    def _remove_waiter(self, user_id: str, waiter: _Waiter) -> None:
+        state = self._users[user_id]
+        state.waiters.remove(waiter)
+        if not state.waiters:
+            self._ring.remove(user_id)
+        self._forget_if_idle(user_id)
+
+    def _forget_if_idle(self, user_id: str) -> None:
+        state = self._users.get(user_id)
+        if state is not None and not state.active and not state.waiters:
+            del self._users[user_id]
+
+    def _reject(self, reason: str) -> None:
+        metrics.increment(f"scheduler.{self.name}.rejected")
+        raise ServiceOverloadedException(
+            f"{self.name} is at capacity ({reason}). Please retry shortly.",
+            retry_after=self.retry_after,
+        )
+
+_ai_action_scheduler: FairScheduler | None = None
+
+def get_ai_action_scheduler() -> FairScheduler:
+    """Returns the process-wide scheduler sharing AI action slots fairly between users."""
+    global _ai_action_scheduler
+    if _ai_action_scheduler is None:
+        _ai_action_scheduler = FairScheduler(
+            name="ai_actions",
+            max_concurrent=settings.AI_MAX_CONCURRENCY,
+            per_user_concurrency=settings.AI_USER_MAX_CONCURRENCY,
+            per_user_queue=settings.AI_USER_MAX_QUEUE,
+            queue_timeout=settings.AI_QUEUE_TIMEOUT_SECONDS,
+            retry_after=settings.AI_RETRY_AFTER_SECONDS,
+            weights=settings.AI_USER_WEIGHTS,
+        )
+    return _ai_action_scheduler
@@ -0,0 +1,31 @@
+# app/core/http_client.py
+import httpx
+from app.core.config import settings
+
+class HttpClient:
+    _client: httpx.AsyncClient | None = None
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        """Returns a shared, keep-alive pooled HTTP client for outbound API calls."""
+        if cls._client is None:
+            cls._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=30,
+                ),
+                timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS),
+            )
+        return cls._client
+
+    @classmethod
+    async def close_client(cls):
+        """Closes the shared HTTP client and its pooled connections."""
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Dependency to get the shared HTTP client."""
+    return HttpClient.get_client()
@@ -2,6 +2,16 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from app.core.config import settings
+from app.core.limiter_storage import HybridStorage
+
+# Endpoints whose limits are checked against Redis on every hit. Each call is expensive
+# enough that the few extra requests hybrid counting can admit between syncs matter.
+STRICT_LIMIT_ENDPOINTS = (
+    "app.api.router.execute_action",
+    "app.api.router.stream_action",
+    "app.api.router.add_nodes_bulk",
+    "app.api.router.add_edges_bulk",
+)
 
 
 def get_user_id_key(request) -> str:
@@ -13,9 +23,24 @@ def get_user_id_key(request) -> str:
 
 
 storage_uri = settings.LIMITER_STORAGE_URI or settings.REDIS_URL
+storage_options = {}
+if settings.LIMITER_MODE == "hybrid" and storage_uri.startswith(("redis://", "rediss://")):
+    storage_uri = f"hybrid+{storage_uri}"
+    storage_options = {
+        "strict_scopes": STRICT_LIMIT_ENDPOINTS,
+        "sync_interval": settings.LIMITER_SYNC_INTERVAL_SECONDS,
+    }
 
 limiter = Limiter(
     key_func=get_user_id_key,
     storage_uri=storage_uri,
+    storage_options=storage_options,
     strategy="fixed-window"
 )
+
+
+def close_limiter_storage() -> None:
+    """Flushes locally counted hits to Redis and stops the sync thread."""
+    storage = limiter.limiter.storage
+    if isinstance(storage, HybridStorage):
+        storage.close()
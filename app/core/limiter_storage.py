@@ -0,0 +1,177 @@
+# app/core/limiter_storage.py
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from limits.storage import RedisStorage, Storage, storage_from_string
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _Window:
+    expiry: int
+    expires_at: float
+    synced: int = 0  # Count across all workers as of the last sync.
+    pending: int = 0  # Hits counted here and not yet added in Redis.
+
+class HybridStorage(Storage):
+    """
+    `limits` storage that counts fixed-window hits in process and adds them to the Redis
+    counters in one batch every `sync_interval` seconds, so most limited requests make no
+    Redis round trip. Each worker sees the global count as of its last sync plus its own
+    hits since then, so a limit can be exceeded by roughly what the other workers admit
+    during one interval. Keys for `strict_scopes` (SlowAPI endpoint names) skip the local
+    counters and are checked against Redis on every hit.
+
+    Selected with a `hybrid+redis://` storage URI.
+    """
+
+    STORAGE_SCHEME = ["hybrid+redis", "hybrid+rediss"]
+
+    def __init__(
+        self,
+        uri: str | None = None,
+        strict_scopes: tuple[str, ...] = (),
+        sync_interval: float = 0.5,
+        remote: Storage | None = None,
+        wrap_exceptions: bool = False,
+        **options,
+    ):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions)
+        self.remote = remote or storage_from_string(uri.removeprefix("hybrid+"), **options)
+        self.strict_scopes = tuple(strict_scopes)
+        self.sync_interval = sync_interval
+        self._windows: dict[str, _Window] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sync_thread: threading.Thread | None = None
+
+    @property
+    def base_exceptions(self):
+        return self.remote.base_exceptions
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        if self._is_strict(key):
+            metrics.increment("limiter.strict_hits")
+            return self.remote.incr(key, expiry, amount)
+        metrics.increment("limiter.local_hits")
+        self._ensure_sync_thread()
+        now = time.time()
+        with self._lock:
+            window = self._windows.get(key)
+        if window is None or now >= window.expires_at:
+            # First hit of a window in this worker: start from the shared count.
+            loaded = self._load_window(key, expiry, now)
+            with self._lock:
+                window = self._windows.get(key)
+                if window is None or now >= window.expires_at:
+                    window = self._windows[key] = loaded
+        with self._lock:
+            window.pending += amount
+            return window.synced + window.pending
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and time.time() < window.expires_at:
+                return window.synced + window.pending
+        return self.remote.get(key)
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and time.time() < window.expires_at:
+                return window.expires_at
+        return self.remote.get_expiry(key)
+
+    def check(self) -> bool:
+        return self.remote.check()
+
+    def reset(self) -> int | None:
+        with self._lock:
+            self._windows.clear()
+        return self.remote.reset()
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._windows.pop(key, None)
+        self.remote.clear(key)
+
+    def sync(self) -> None:
+        """Adds the pending hits of every window to Redis and refreshes the shared counts."""
+        now = time.time()
+        with self._lock:
+            for key in [key for key, window in self._windows.items() if now >= window.expires_at]:
+                del self._windows[key]
+            batch = [(key, window, window.pending) for key, window in self._windows.items() if window.pending]
+            for _, window, pending in batch:
+                window.pending -= pending
+        if not batch:
+            return
+
+        try:
+            results = self._add_to_remote([(key, window.expiry, pending) for key, window, pending in batch])
+        except Exception as exc:
+            logger.warning("Failed to sync %s rate limit counters: %s", len(batch), exc)
+            metrics.increment("limiter.sync_errors")
+            with self._lock:
+                for _, window, pending in batch:
+                    window.pending += pending
+            return
+
+        metrics.increment("limiter.syncs")
+        with self._lock:
+            for (_, window, _), (count, expires_at) in zip(batch, results):
+                window.synced = count
+                if expires_at > now:
+                    window.expires_at = expires_at
+
+    def close(self) -> None:
+        """Stops the sync thread after a final sync."""
+        self._stopped.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join(timeout=self.sync_interval * 2)
+        self.sync()
+
+    def _is_strict(self, key: str) -> bool:
+        # SlowAPI keys look like LIMITER/<user>/<endpoint>/<amount>/<multiples>/<granularity>.
+        return any(f"/{scope}/" in key for scope in self.strict_scopes)
+
+    def _load_window(self, key: str, expiry: int, now: float) -> _Window:
+        try:
+            count = self.remote.get(key)
+            expires_at = self.remote.get_expiry(key) if count else now + expiry
+        except Exception as exc:
+            logger.warning("Rate limit storage unreachable; counting %s locally: %s", key, exc)
+            count, expires_at = 0, now + expiry
+        return _Window(expiry=expiry, expires_at=max(expires_at, now + 1), synced=count)
+
+    def _add_to_remote(self, increments: list[tuple[str, int, int]]) -> list[tuple[int, float]]:
+        """Returns the new shared count and window end for each `(key, expiry, amount)`."""
+        if isinstance(self.remote, RedisStorage):
+            # One pipelined round trip for the whole batch.
+            pipeline = self.remote.get_connection().pipeline(transaction=False)
+            for key, expiry, amount in increments:
+                prefixed = self.remote.prefixed_key(key)
+                self.remote.lua_incr_expire([prefixed], [expiry, amount], client=pipeline)
+                pipeline.ttl(prefixed)
+            replies = pipeline.execute()
+            now = time.time()
+            return [(int(replies[i]), now + max(replies[i + 1], 0)) for i in range(0, len(replies), 2)]
+        return [
+            (self.remote.incr(key, expiry, amount), self.remote.get_expiry(key))
+            for key, expiry, amount in increments
+        ]
+
+    def _ensure_sync_thread(self) -> None:
+        if self._sync_thread is not None or self._stopped.is_set():
+            return
+        with self._lock:
+            if self._sync_thread is None:
+                self._sync_thread = threading.Thread(target=self._run_sync, name="limiter-sync", daemon=True)
+                self._sync_thread.start()
+
+    def _run_sync(self) -> None:
+        while not self._stopped.wait(self.sync_interval):
+            self.sync()
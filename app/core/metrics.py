@@ -0,0 +1,27 @@
+# app/core/metrics.py
+# Process-local counters, exposed through GET /metrics. Each worker reports its own values.
+import threading
+from collections import defaultdict
+
+class MetricsRegistry:
+    def __init__(self):
+        self._counters: dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self, prefix: str = "") -> dict[str, float]:
+        with self._lock:
+            return {name: value for name, value in sorted(self._counters.items()) if name.startswith(prefix)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+metrics = MetricsRegistry()
@@ -9,4 +9,26 @@ SIMILARITY_THRESHOLD = 0.75
 VECTOR_DIMENSIONS = 768
 
 # The maximum number of candidate nodes to retrieve from the vector index for consideration.
-MAX_SEMANTIC_CANDIDATES = 100
\ No newline at end of file
+MAX_SEMANTIC_CANDIDATES = 100
+
+# Maximum 1-hop neighbors fetched as context candidates for a single expansion.
+MAX_NEIGHBOR_CANDIDATES = 200
+
+# Approximate token budget for the "existing concepts" section of the expand prompt.
+CONTEXT_TOKEN_BUDGET = 1200
+
+# MMR trade-off between relevance (1.0) and diversity (0.0) when filling the budget.
+CONTEXT_MMR_LAMBDA = 0.7
+
+# Weight of vector similarity versus graph proximity in a candidate's relevance score.
+CONTEXT_SIMILARITY_WEIGHT = 0.6
+
+# Selections with at least this many nodes are searched with the centroid of their
+# embeddings (one index lookup) instead of one lookup per selected node.
+CENTROID_SELECTION_THRESHOLD = 4
+
+# The vector index is shared by all users and filtered by userId after its top-k cut.
+# A search that comes back short for its tenant is retried with k multiplied by this
+# factor, up to VECTOR_SEARCH_MAX_CANDIDATES raw hits per query vector.
+VECTOR_SEARCH_WIDENING_FACTOR = 4
+VECTOR_SEARCH_MAX_CANDIDATES = 5000
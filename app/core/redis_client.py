@@ -4,6 +4,7 @@ from app.core.config import settings
 
 class RedisClient:
     _client: redis.Redis | None = None
+    _binary_client: redis.Redis | None = None
 
     @classmethod
     def get_client(cls) -> redis.Redis:
@@ -16,13 +17,27 @@ class RedisClient:
             )
         return cls._client
 
+    @classmethod
+    def get_binary_client(cls) -> redis.Redis:
+        """Returns a shared Redis client that reads and writes raw bytes."""
+        if cls._binary_client is None:
+            cls._binary_client = redis.from_url(settings.REDIS_URL, decode_responses=False)
+        return cls._binary_client
+
     @classmethod
     async def close_client(cls):
-        """Closes the shared Redis client instance."""
+        """Closes the shared Redis client instances."""
         if cls._client:
             await cls._client.close()
             cls._client = None
+        if cls._binary_client:
+            await cls._binary_client.close()
+            cls._binary_client = None
 
 def get_redis_client() -> redis.Redis:
     """Dependency to get the Redis client."""
-    return RedisClient.get_client()
\ No newline at end of file
+    return RedisClient.get_client()
+
+def get_binary_redis_client() -> redis.Redis:
+    """Dependency to get the bytes-mode Redis client."""
+    return RedisClient.get_binary_client()
\ No newline at end of file
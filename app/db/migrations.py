@@ -0,0 +1,103 @@
+# app/db/migrations.py
+# Ordered, recorded schema migrations. Each applied version is stored as a
+# (:SchemaMigration {version}) node so every migration runs exactly once per database.
+import logging
+from dataclasses import dataclass
+from neo4j import AsyncDriver
+from app.core.rag_config import VECTOR_DIMENSIONS
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    statements: tuple[str, ...]
+
+# Append new migrations to the end with the next version number; never edit one that has shipped.
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        version=1,
+        description="Vector index on Concept.embedding and property index on Concept.userId",
+        statements=(
+            f"""
+            CREATE VECTOR INDEX `concept_embeddings` IF NOT EXISTS
+            FOR (n:Concept) ON (n.embedding)
+            OPTIONS {{ indexConfig: {{
+                `vector.dimensions`: {VECTOR_DIMENSIONS},
+                `vector.similarity_function`: 'cosine'
+            }} }}
+            """,
+            "CREATE INDEX concept_userId IF NOT EXISTS FOR (n:Concept) ON (n.userId)",
+        ),
+    ),
+    Migration(
+        version=2,
+        description="Unique constraint on Concept.id and composite (userId, id) index",
+        statements=(
+            "CREATE CONSTRAINT concept_id_unique IF NOT EXISTS FOR (n:Concept) REQUIRE n.id IS UNIQUE",
+            "CREATE INDEX concept_userId_id IF NOT EXISTS FOR (n:Concept) ON (n.userId, n.id)",
+        ),
+    ),
+    Migration(
+        version=3,
+        description="Workspace revision counters and the (userId, revision) change log index",
+        statements=(
+            "CREATE CONSTRAINT workspace_userId_unique IF NOT EXISTS FOR (w:Workspace) REQUIRE w.userId IS UNIQUE",
+            "CREATE INDEX changelog_userId_revision IF NOT EXISTS FOR (c:ChangeLog) ON (c.userId, c.revision)",
+        ),
+    ),
+)
+
+_BOOTSTRAP_STATEMENT = (
+    "CREATE CONSTRAINT schema_migration_version IF NOT EXISTS "
+    "FOR (m:SchemaMigration) REQUIRE m.version IS UNIQUE"
+)
+
+
+def _validate(migrations: tuple[Migration, ...]) -> None:
+    versions = [migration.version for migration in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError(f"Migration versions must be unique and ascending, got {versions}.")
+
+
+async def get_applied_versions(driver: AsyncDriver) -> set[int]:
+    async with driver.session() as session:
+        result = await session.run("MATCH (m:SchemaMigration) RETURN m.version AS version")
+        return {record["version"] async for record in result}
+
+
+async def run_migrations(driver: AsyncDriver, migrations: tuple[Migration, ...] = MIGRATIONS) -> list[int]:
+    """
+    Applies every pending migration in version order and returns the versions applied.
+    Statements are expected to be idempotent (`IF NOT EXISTS`) so concurrent workers are safe.
+    """
+    _validate(migrations)
+    async with driver.session() as session:
+        result = await session.run(_BOOTSTRAP_STATEMENT)
+        await result.consume()
+
+    applied = await get_applied_versions(driver)
+    newly_applied: list[int] = []
+    for migration in migrations:
+        if migration.version in applied:
+            continue
+        logger.info("Applying schema migration %s: %s", migration.version, migration.description)
+        async with driver.session() as session:
+            # Schema commands must run in their own auto-commit transactions.
+            for statement in migration.statements:
+                result = await session.run(statement)
+                await result.consume()
+            result = await session.run(
+                """
+                MERGE (m:SchemaMigration {version: $version})
+                ON CREATE SET m.description = $description, m.appliedAt = datetime()
+                """,
+                {"version": migration.version, "description": migration.description},
+            )
+            await result.consume()
+        newly_applied.append(migration.version)
+
+    if not newly_applied:
+        logger.info("Database schema is up to date (version %s).", migrations[-1].version if migrations else 0)
+    return newly_applied
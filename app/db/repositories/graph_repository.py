@@ -1,78 +1,259 @@
 # app/db/repositories/graph_repository.py
+from typing import AsyncIterator
+import numpy as np
 from uuid import UUID
 from neo4j import AsyncDriver
-from app.models.graph import Node, Edge, Graph, NodeUpdate
+from app.models.graph import Node, Edge, Graph, GraphDelta, NodeUpdate, ExpansionContext
 from app.core.exceptions import NodeNotFoundException
+from app.core.metrics import metrics
+from app.core.rag_config import VECTOR_SEARCH_WIDENING_FACTOR, VECTOR_SEARCH_MAX_CANDIDATES
+
+# Map projections used by read queries. Embeddings are 768 floats per node, so they are
+# only fetched from Neo4j when a caller explicitly needs them.
+_NODE_PROJECTION = "{.id, .name, .description, .userId}"
+_NODE_PROJECTION_WITH_EMBEDDING = "{.id, .name, .description, .userId, .embedding}"
+
+def _node_projection(include_embedding: bool) -> str:
+    return _NODE_PROJECTION_WITH_EMBEDDING if include_embedding else _NODE_PROJECTION
+
+def centroid_vector(vectors: list[list[float]]) -> list[float]:
+    """Mean of the L2-normalized vectors; searching with it approximates the whole selection."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).mean(axis=0).tolist()
+
+def _node_change(op: str, node_id) -> dict:
+    return {"entity": "node", "op": op, "node_id": str(node_id), "source_id": None, "target_id": None, "label": None}
+
+def _edge_change(op: str, source_id, target_id, label: str) -> dict:
+    return {
+        "entity": "edge", "op": op, "node_id": None,
+        "source_id": str(source_id), "target_id": str(target_id), "label": label,
+    }
 
 class GraphRepository:
-    def __init__(self, driver: AsyncDriver):
+    """
+    Every write runs in a transaction that also bumps the workspace revision and appends
+    to its change log (see `_record_changes`), which backs delta reads of the graph.
+    """
+
+    def __init__(self, driver: AsyncDriver, changelog_retention: int = 1000):
         self.driver = driver
+        self.changelog_retention = changelog_retention
 
     async def delete_all_nodes_for_user(self, user_id: str) -> int:
         """
         Deletes all nodes (and their relationships) for a given user.
         Returns the number of nodes deleted.
         """
-        
+        async with self.driver.session() as session:
+            return await session.execute_write(self._delete_all_nodes, user_id, self.changelog_retention)
+
+    @staticmethod
+    async def _delete_all_nodes(tx, user_id, retention):
         query = "MATCH (n:Concept {userId: $userId}) DETACH DELETE n RETURN count(n) as deleted_count"
+        result = await tx.run(query, {"userId": user_id})
+        record = await result.single()
+        deleted_count = record["deleted_count"] if record else 0
+        if deleted_count:
+            # Nothing before a clear can be replayed as a delta; clients resync instead.
+            await GraphRepository._record_changes(tx, user_id, [], retention, reset=True)
+        return deleted_count
+
+    async def get_full_graph(self, user_id: str, include_embedding: bool = False) -> Graph:
+        query = f"""
+        MATCH (n:Concept {{userId: $userId}})
+        OPTIONAL MATCH (n)-[r]->(m:Concept {{userId: $userId}})
+        WITH collect(DISTINCT n {_node_projection(include_embedding)}) as nodes,
+             collect(CASE WHEN r IS NOT NULL THEN {{source_id: n.id, target_id: m.id, label: type(r)}} END) as relationships
+        OPTIONAL MATCH (w:Workspace {{userId: $userId}})
+        RETURN nodes, relationships, coalesce(w.revision, 0) AS revision
+        """
         async with self.driver.session() as session:
             result = await session.run(query, {"userId": user_id})
             record = await result.single()
-            return record["deleted_count"] if record else 0
+            if not record:
+                return Graph(nodes=[], edges=[], revision=0)
 
-    async def get_full_graph(self, user_id: str) -> Graph:
-        query = """
-        MATCH (n:Concept {userId: $userId})
-        OPTIONAL MATCH (n)-[r]->(m:Concept {userId: $userId})
-        RETURN collect(DISTINCT n) as nodes, collect(DISTINCT r) as relationships
-        """
+            nodes = [Node.model_validate(node_props) for node_props in record["nodes"]]
+            edges = [Edge.model_validate(rel) for rel in record["relationships"]]
+            return Graph(nodes=nodes, edges=edges, revision=record["revision"])
+
+    async def get_workspace_revision(self, user_id: str) -> int:
+        """The workspace's current revision, 0 before its first write. A single unique-index lookup."""
+        query = "OPTIONAL MATCH (w:Workspace {userId: $userId}) RETURN coalesce(w.revision, 0) AS revision"
         async with self.driver.session() as session:
             result = await session.run(query, {"userId": user_id})
             record = await result.single()
-            # ... (rest of the function is unchanged)
-            if not record or not record["nodes"]:
-                return Graph(nodes=[], edges=[])
-
-            nodes_data = record["nodes"]
-            rels_data = record["relationships"]
-
-            nodes = [Node.model_validate(node_props) for node_props in nodes_data]
-
-            edges = []
-            for rel in rels_data:
-                if rel is None:
-                    continue
-                start_node_id = rel.start_node["id"]
-                end_node_id = rel.end_node["id"]
-                edges.append(
-                    Edge(
-                        source_id=start_node_id,
-                        target_id=end_node_id,
-                        label=rel.type
-                    )
-                )
+            return record["revision"] if record else 0
+
+    async def get_graph_changes(self, user_id: str, since: int, include_embedding: bool = False) -> GraphDelta:
+        """
+        Replays the change log after revision `since` into the current state of every node and
+        edge that changed. Returns a delta with `full_resync=True` and no content when `since`
+        predates the retained log, a workspace clear, or is ahead of the workspace.
+        """
+        async with self.driver.session() as session:
+            return await session.execute_read(self._fetch_graph_changes, user_id, since, include_embedding)
+
+    @staticmethod
+    async def _fetch_graph_changes(tx, user_id, since, include_embedding):
+        log_query = """
+        OPTIONAL MATCH (w:Workspace {userId: $userId})
+        WITH coalesce(w.revision, 0) AS revision, coalesce(w.trimmedThrough, 0) AS trimmed_through
+        OPTIONAL MATCH (c:ChangeLog {userId: $userId})
+        WHERE c.revision > $since AND c.revision <= revision
+        WITH revision, trimmed_through, c ORDER BY c.revision, c.seq
+        RETURN revision, trimmed_through,
+               collect(c {.entity, .op, .nodeId, .sourceId, .targetId, .label}) AS changes
+        """
+        result = await tx.run(log_query, {"userId": user_id, "since": since})
+        record = await result.single()
+        revision = record["revision"] if record else 0
+        if not record or since < record["trimmed_through"] or since > revision:
+            return GraphDelta(since=since, revision=revision, full_resync=True)
+
+        # Later entries win: a node or edge ends up either upserted or deleted.
+        node_ops: dict[str, str] = {}
+        edge_ops: dict[tuple[str, str, str], str] = {}
+        for change in record["changes"]:
+            if change["entity"] == "node":
+                node_ops[change["nodeId"]] = change["op"]
+            else:
+                edge_ops[(change["sourceId"], change["targetId"], change["label"])] = change["op"]
+
+        upserted_ids = [node_id for node_id, op in node_ops.items() if op == "upsert"]
+        nodes = []
+        if upserted_ids:
+            node_query = f"""
+            UNWIND $ids AS node_id
+            MATCH (n:Concept {{userId: $userId, id: node_id}})
+            RETURN n {_node_projection(include_embedding)} AS n
+            """
+            result = await tx.run(node_query, {"userId": user_id, "ids": upserted_ids})
+            nodes = [Node.model_validate(record["n"]) async for record in result]
+
+        existing_ids = {str(node.id) for node in nodes}
+        deleted_ids = {node_id for node_id, op in node_ops.items() if op == "delete" or node_id not in existing_ids}
+        edges, deleted_edges = [], []
+        for (source_id, target_id, label), op in edge_ops.items():
+            edge = Edge(source_id=source_id, target_id=target_id, label=label)
+            if op == "delete":
+                deleted_edges.append(edge)
+            elif source_id not in deleted_ids and target_id not in deleted_ids:
+                edges.append(edge)
+        return GraphDelta(
+            since=since,
+            revision=revision,
+            nodes=nodes,
+            edges=edges,
+            deleted_node_ids=sorted(deleted_ids),
+            deleted_edges=deleted_edges,
+        )
+
+    @staticmethod
+    async def _record_changes(tx, user_id, changes, retention, reset=False) -> int:
+        """
+        Bumps the workspace revision and appends `changes` to its change log inside the
+        caller's write transaction. Every `retention` revisions, entries more than `retention`
+        revisions old are trimmed, so the log holds between one and two retention windows.
+        With `reset`, the whole log up to the new revision is discarded.
+        """
+        query = """
+        MERGE (w:Workspace {userId: $userId})
+        // Bumping the revision first takes the node's write lock, so concurrent writers serialize.
+        SET w.revision = coalesce(w.revision, 0) + 1
+        WITH w, w.revision AS revision, coalesce(w.trimmedThrough, 0) AS trimmed
+        WITH w, revision, trimmed, CASE
+            WHEN $reset THEN revision
+            WHEN revision % $retention = 0 AND revision - $retention > trimmed THEN revision - $retention
+            ELSE trimmed
+        END AS trimmed_through
+        SET w.trimmedThrough = trimmed_through
+        FOREACH (i IN range(0, size($changes) - 1) |
+            CREATE (:ChangeLog {
+                userId: $userId, revision: revision, seq: i,
+                entity: $changes[i].entity, op: $changes[i].op, nodeId: $changes[i].node_id,
+                sourceId: $changes[i].source_id, targetId: $changes[i].target_id, label: $changes[i].label
+            })
+        )
+        WITH revision, trimmed, trimmed_through
+        CALL {
+            WITH trimmed, trimmed_through
+            WITH trimmed, trimmed_through WHERE trimmed_through > trimmed
+            MATCH (c:ChangeLog {userId: $userId})
+            WHERE c.revision > trimmed AND c.revision <= trimmed_through
+            DELETE c
+            RETURN count(*) AS trimmed_entries
+        }
+        RETURN revision
+        """
+        result = await tx.run(query, {
+            "userId": user_id,
+            "changes": changes,
+            "retention": retention,
+            "reset": reset,
+        })
+        record = await result.single()
+        return record["revision"] if record else 0
+
+    async def stream_full_graph(self, user_id: str, include_embedding: bool = False) -> AsyncIterator[Node | Edge]:
+        """
+        Yields every node and then every relationship in the user's workspace as the
+        driver pulls records, so no single record has to hold the whole graph.
+        """
+        node_query = f"MATCH (n:Concept {{userId: $userId}}) RETURN n {_node_projection(include_embedding)} AS n"
+        edge_query = """
+        MATCH (a:Concept {userId: $userId})-[r]->(b:Concept {userId: $userId})
+        RETURN a.id AS source_id, b.id AS target_id, type(r) AS label
+        """
+        async with self.driver.session() as session:
+            result = await session.run(node_query, {"userId": user_id})
+            async for record in result:
+                yield Node.model_validate(record["n"])
 
-            return Graph(nodes=nodes, edges=edges)
+            result = await session.run(edge_query, {"userId": user_id})
+            async for record in result:
+                yield Edge(
+                    source_id=record["source_id"],
+                    target_id=record["target_id"],
+                    label=record["label"]
+                )
 
     async def add_edge(self, edge: Edge, user_id: str) -> Edge:
+        async with self.driver.session() as session:
+            created = await session.execute_write(self._create_edge, edge, user_id, self.changelog_retention)
+        if not created:
+            raise NodeNotFoundException("One or both nodes for the edge not found in this workspace.")
+        return edge
+
+    @staticmethod
+    async def _create_edge(tx, edge, user_id, retention):
         query = """
         MATCH (a:Concept {id: $source_id, userId: $userId})
         MATCH (b:Concept {id: $target_id, userId: $userId})
         CALL apoc.create.relationship(a, $rel_type, {}, b) YIELD rel
         RETURN type(rel) as label
         """
-        async with self.driver.session() as session:
-            result = await session.run(query, {
-                "source_id": str(edge.source_id),
-                "target_id": str(edge.target_id),
-                "rel_type": edge.label,
-                "userId": user_id
-            })
-            if await result.single() is None:
-                raise NodeNotFoundException("One or both nodes for the edge not found in this workspace.")
-            return edge
-    
-    async def add_subgraph(self, nodes: list[Node], edges: list[Edge]) -> None:
+        result = await tx.run(query, {
+            "source_id": str(edge.source_id),
+            "target_id": str(edge.target_id),
+            "rel_type": edge.label,
+            "userId": user_id
+        })
+        if await result.single() is None:
+            return False
+        await GraphRepository._record_changes(
+            tx, user_id, [_edge_change("upsert", edge.source_id, edge.target_id, edge.label)], retention
+        )
+        return True
+
+    async def add_subgraph(self, nodes: list[Node], edges: list[Edge], user_id: str) -> set[int]:
+        """
+        Writes the nodes and then the edges in one transaction. Returns the positions in
+        `edges` that were created; the others have an endpoint outside the workspace.
+        """
         nodes_payload = [
             {
                 "id": str(node.id),
@@ -83,25 +264,29 @@ class GraphRepository:
             }
             for node in nodes
         ]
-        # ... (rest of the function is unchanged)
         edges_payload = [
             {
+                "index": index,
                 "source_id": str(edge.source_id),
                 "target_id": str(edge.target_id),
                 "label": edge.label,
             }
-            for edge in edges
+            for index, edge in enumerate(edges)
         ]
 
         async with self.driver.session() as session:
-            await session.execute_write(
+            return await session.execute_write(
                 self._create_subgraph,
                 nodes_payload,
                 edges_payload,
+                user_id,
+                self.changelog_retention,
             )
 
     @staticmethod
-    async def _create_subgraph(tx, nodes_payload, edges_payload):
+    async def _create_subgraph(tx, nodes_payload, edges_payload, user_id, retention):
+        changes = []
+        created_edges = set()
         if nodes_payload:
             node_query = """
             UNWIND $nodes AS nodeData
@@ -114,70 +299,107 @@ class GraphRepository:
             """
             node_result = await tx.run(node_query, {"nodes": nodes_payload})
             await node_result.consume()
-        # ... (edge query is unchanged)
+            changes += [_node_change("upsert", node["id"]) for node in nodes_payload]
         if edges_payload:
             edge_query = """
             UNWIND $edges AS edgeData
-            MATCH (source:Concept {id: edgeData.source_id})
-            MATCH (target:Concept {id: edgeData.target_id})
+            MATCH (source:Concept {id: edgeData.source_id, userId: $userId})
+            MATCH (target:Concept {id: edgeData.target_id, userId: $userId})
             CALL apoc.create.relationship(source, edgeData.label, {}, target) YIELD rel
-            RETURN count(rel) as created_edges
+            RETURN edgeData.index AS index, edgeData.source_id AS source_id,
+                   edgeData.target_id AS target_id, edgeData.label AS label
             """
-            edge_result = await tx.run(edge_query, {"edges": edges_payload})
-            await edge_result.consume()
+            edge_result = await tx.run(edge_query, {"edges": edges_payload, "userId": user_id})
+            async for record in edge_result:
+                created_edges.add(record["index"])
+                changes.append(_edge_change("upsert", record["source_id"], record["target_id"], record["label"]))
+        if changes:
+            await GraphRepository._record_changes(tx, user_id, changes, retention)
+        return created_edges
 
-    async def update_node(self, node_id: UUID, node_update: NodeUpdate, user_id: str) -> Node | None:
+    async def update_node(
+        self, node_id: UUID, node_update: NodeUpdate, user_id: str, embedding: list[float] | None = None
+    ) -> Node | None:
+        """Applies the set fields of `node_update`, and `embedding` when the text changed."""
         props_to_update = node_update.model_dump(exclude_unset=True)
+        if embedding is not None:
+            props_to_update["embedding"] = embedding
 
         if not props_to_update:
             return await self.get_node_by_id(node_id, user_id)
 
-        query = """
-        MATCH (n:Concept {id: $node_id, userId: $userId})
+        async with self.driver.session() as session:
+            return await session.execute_write(
+                self._update_node, node_id, props_to_update, user_id, self.changelog_retention
+            )
+
+    @staticmethod
+    async def _update_node(tx, node_id, props_to_update, user_id, retention):
+        query = f"""
+        MATCH (n:Concept {{id: $node_id, userId: $userId}})
         SET n += $props
-        RETURN n
+        RETURN n {_NODE_PROJECTION} AS n
         """
-        async with self.driver.session() as session:
-            result = await session.run(query, {"node_id": str(node_id), "props": props_to_update, "userId": user_id})
-            record = await result.single()
-            return Node.model_validate(record["n"]) if record else None
+        result = await tx.run(query, {"node_id": str(node_id), "props": props_to_update, "userId": user_id})
+        record = await result.single()
+        if not record:
+            return None
+        await GraphRepository._record_changes(tx, user_id, [_node_change("upsert", node_id)], retention)
+        return Node.model_validate(record["n"])
 
     async def add_node(self, node: Node) -> Node:
-        query = """
-        MERGE (n:Concept {id: $node_id})
+        async with self.driver.session() as session:
+            return await session.execute_write(self._create_node, node, self.changelog_retention)
+
+    @staticmethod
+    async def _create_node(tx, node, retention):
+        query = f"""
+        MERGE (n:Concept {{id: $node_id}})
         ON CREATE SET
             n.name = $name,
             n.description = $description,
             n.embedding = $embedding,
             n.userId = $userId
-        RETURN n
+        RETURN n {_NODE_PROJECTION} AS n
         """
-        async with self.driver.session() as session:
-            result = await session.run(query, {
-                "node_id": str(node.id),
-                "name": node.name,
-                "description": node.description,
-                "embedding": node.embedding,
-                "userId": node.userId,
-            })
-            record = await result.single()
-            return Node.model_validate(record["n"])
-    
-    async def get_node_by_id(self, node_id: UUID, user_id: str) -> Node | None:
-        query = "MATCH (n:Concept {id: $node_id, userId: $userId}) RETURN n"
+        result = await tx.run(query, {
+            "node_id": str(node.id),
+            "name": node.name,
+            "description": node.description,
+            "embedding": node.embedding,
+            "userId": node.userId,
+        })
+        record = await result.single()
+        await GraphRepository._record_changes(tx, node.userId, [_node_change("upsert", node.id)], retention)
+        return Node.model_validate(record["n"])
+
+    async def get_node_by_id(self, node_id: UUID, user_id: str, include_embedding: bool = False) -> Node | None:
+        query = f"MATCH (n:Concept {{id: $node_id, userId: $userId}}) RETURN n {_node_projection(include_embedding)} AS n"
         async with self.driver.session() as session:
             result = await session.run(query, {"node_id": str(node_id), "userId": user_id})
             record = await result.single()
             return Node.model_validate(record["n"]) if record else None
 
     async def delete_node_by_id(self, node_id: UUID, user_id: str) -> bool:
-        query = "MATCH (n:Concept {id: $node_id, userId: $userId}) DETACH DELETE n"
         async with self.driver.session() as session:
-            result = await session.run(query, {"node_id": str(node_id), "userId": user_id})
-            summary = await result.consume()
-            return summary.counters.nodes_deleted > 0
+            return await session.execute_write(self._delete_node, node_id, user_id, self.changelog_retention)
+
+    @staticmethod
+    async def _delete_node(tx, node_id, user_id, retention):
+        query = "MATCH (n:Concept {id: $node_id, userId: $userId}) DETACH DELETE n"
+        result = await tx.run(query, {"node_id": str(node_id), "userId": user_id})
+        summary = await result.consume()
+        if summary.counters.nodes_deleted == 0:
+            return False
+        await GraphRepository._record_changes(tx, user_id, [_node_change("delete", node_id)], retention)
+        return True
 
     async def delete_edge(self, edge: Edge, user_id: str) -> bool:
+        async with self.driver.session() as session:
+            return await session.execute_write(self._delete_edge, edge, user_id, self.changelog_retention)
+
+    @staticmethod
+    async def _delete_edge(tx, edge, user_id, retention):
         query = """
         MATCH (a:Concept {id: $source_id, userId: $userId})
         MATCH (b:Concept {id: $target_id, userId: $userId})
@@ -187,21 +409,37 @@ class GraphRepository:
         ) YIELD value
         RETURN value.deleted_count > 0 as was_deleted
         """
+        result = await tx.run(query, {
+            "source_id": str(edge.source_id),
+            "target_id": str(edge.target_id),
+            "rel_type": edge.label,
+            "userId": user_id
+        })
+        record = await result.single()
+        if not record or not record["was_deleted"]:
+            return False
+        await GraphRepository._record_changes(
+            tx, user_id, [_edge_change("delete", edge.source_id, edge.target_id, edge.label)], retention
+        )
+        return True
+
+    async def get_node_embeddings(self, user_id: str) -> list[Node]:
+        """Every node of the user that has an embedding, with the embedding included."""
+        query = f"""
+        MATCH (n:Concept {{userId: $userId}})
+        WHERE n.embedding IS NOT NULL
+        RETURN n {_NODE_PROJECTION_WITH_EMBEDDING} AS n
+        """
         async with self.driver.session() as session:
-            result = await session.run(query, {
-                "source_id": str(edge.source_id),
-                "target_id": str(edge.target_id),
-                "rel_type": edge.label,
-                "userId": user_id
-            })
-            record = await result.single()
-            return record["was_deleted"] if record else False
-    
-    async def get_1_hop_neighbors(self, node_id: UUID, user_id: str) -> list[Node]:
-        query = """
-        MATCH (source:Concept {id: $node_id, userId: $userId})--(neighbor:Concept)
+            result = await session.run(query, {"userId": user_id})
+            return [Node.model_validate(record["n"]) async for record in result]
+
+    async def get_1_hop_neighbors(self, node_id: UUID, user_id: str, include_embedding: bool = False) -> list[Node]:
+        query = f"""
+        MATCH (source:Concept {{id: $node_id, userId: $userId}})--(neighbor:Concept)
         WHERE neighbor.userId = $userId
-        RETURN DISTINCT neighbor
+        WITH DISTINCT neighbor
+        RETURN neighbor {_node_projection(include_embedding)} AS neighbor
         """
         async with self.driver.session() as session:
             result = await session.run(query, {"node_id": str(node_id), "userId": user_id})
@@ -214,22 +452,178 @@ class GraphRepository:
         excluded_node_ids: list[UUID],
         user_id: str,
         threshold: float,
-        limit: int
+        limit: int,
+        include_embedding: bool = False
     ) -> list[Node]:
         excluded_ids_str = [str(uuid) for uuid in excluded_node_ids]
-        query = """
-            CALL db.index.vector.queryNodes('concept_embeddings', $limit, $query_vector)
-            YIELD node, score
-            WHERE score >= $threshold AND node.userId = $userId AND NOT node.id IN $excluded_ids
-            RETURN node
+        async with self.driver.session() as session:
+            candidates = await session.execute_read(
+                self._search_vector_index, [query_vector], excluded_ids_str, user_id, threshold, limit,
+                include_embedding
+            )
+        return [Node.model_validate(candidate) for candidate in candidates]
+
+    async def find_semantically_similar_nodes_batch(
+        self,
+        query_vectors: list[list[float]],
+        excluded_node_ids: list[UUID],
+        user_id: str,
+        threshold: float,
+        limit: int,
+        use_centroid: bool = False,
+        include_embedding: bool = False
+    ) -> list[Node]:
         """
+        Runs every query vector against the vector index in a single query per search round.
+        Hits are de-duplicated, keeping each candidate's best score, and the top `limit` are
+        returned best first. With `use_centroid`, the vectors are collapsed into their
+        normalized mean and the index is searched once.
+        """
+        if not query_vectors:
+            return []
+        if use_centroid and len(query_vectors) > 1:
+            query_vectors = [centroid_vector(query_vectors)]
+
+        excluded_ids_str = [str(uuid) for uuid in excluded_node_ids]
         async with self.driver.session() as session:
-            result = await session.run(query, {
-                "limit": limit,
-                "query_vector": query_vector,
+            candidates = await session.execute_read(
+                self._search_vector_index, query_vectors, excluded_ids_str, user_id, threshold, limit,
+                include_embedding
+            )
+        return [Node.model_validate(candidate) for candidate in candidates]
+
+    @staticmethod
+    async def _search_vector_index(
+        tx,
+        query_vectors: list[list[float]],
+        excluded_ids: list[str],
+        user_id: str,
+        threshold: float,
+        limit: int,
+        include_embedding: bool,
+        widening_factor: int = VECTOR_SEARCH_WIDENING_FACTOR,
+        max_candidates: int = VECTOR_SEARCH_MAX_CANDIDATES,
+    ) -> list[dict]:
+        """
+        Tenant-aware top-`limit` search over the shared `concept_embeddings` index.
+
+        The index ranks nodes of every user, so the tenant filter runs after the top-k cut.
+        Each vector starts with k = `limit` and is re-queried with k widened by
+        `widening_factor` until it has `limit` matches, its lowest raw score drops below the
+        threshold (nothing further down can qualify), the index is exhausted or k reaches
+        `max_candidates`. Returns node maps ordered by best score.
+        """
+        query = f"""
+        UNWIND range(0, size($query_vectors) - 1) AS vector_index
+        CALL db.index.vector.queryNodes('concept_embeddings', $k, $query_vectors[vector_index])
+        YIELD node, score
+        WITH vector_index, count(*) AS raw_hits, min(score) AS min_score,
+             collect(CASE WHEN score >= $threshold AND node.userId = $userId AND NOT node.id IN $excluded_ids
+                          THEN {{node: node {_node_projection(include_embedding)}, score: score}} END) AS matches
+        RETURN vector_index, raw_hits, min_score, matches
+        """
+        best: dict[str, tuple[float, dict]] = {}
+        pending = list(query_vectors)
+        k = limit
+        while pending:
+            result = await tx.run(query, {
+                "query_vectors": pending,
+                "k": k,
                 "threshold": threshold,
-                "excluded_ids": excluded_ids_str,
-                "userId": user_id
+                "excluded_ids": excluded_ids,
+                "userId": user_id,
             })
-            records = [record async for record in result]
-            return [Node.model_validate(record["node"]) for record in records]
\ No newline at end of file
+            widen = []
+            async for record in result:
+                for match in record["matches"]:
+                    node_id = match["node"]["id"]
+                    if node_id not in best or match["score"] > best[node_id][0]:
+                        best[node_id] = (match["score"], match["node"])
+                saturated = len(record["matches"]) >= limit
+                exhausted = record["raw_hits"] < k or record["min_score"] < threshold
+                if not saturated and not exhausted:
+                    widen.append(pending[record["vector_index"]])
+
+            if not widen or k >= max_candidates:
+                break
+            metrics.increment("vector_search.widenings", len(widen))
+            pending = widen
+            k = min(k * widening_factor, max_candidates)
+
+        ranked = sorted(best.values(), key=lambda item: item[0], reverse=True)
+        return [node for _, node in ranked[:limit]]
+
+    async def get_expansion_context(
+        self,
+        node_ids: list[UUID],
+        user_id: str,
+        threshold: float,
+        limit: int,
+        max_neighbors: int = 200,
+        use_centroid: bool = False,
+        include_candidates: bool = True
+    ) -> ExpansionContext:
+        """
+        Fetches the selected source nodes, up to `max_neighbors` de-duplicated 1-hop neighbors
+        and the best-scoring vector-search candidates for the selection in one read transaction.
+        With `use_centroid`, the index is searched once with the mean of the source embeddings
+        instead of once per source; with `include_candidates=False` the vector search is skipped.
+        All nodes carry embeddings so the caller can rank them. Source nodes keep the order of
+        `node_ids`.
+        """
+        node_ids_str = [str(node_id) for node_id in node_ids]
+        async with self.driver.session() as session:
+            sources, neighbors, candidates = await session.execute_read(
+                self._fetch_expansion_context, node_ids_str, user_id, threshold, limit, max_neighbors,
+                use_centroid, include_candidates
+            )
+
+        sources_by_id = {source["id"]: source for source in sources}
+        source_nodes = [
+            Node.model_validate(sources_by_id[node_id]) for node_id in node_ids_str if node_id in sources_by_id
+        ]
+        return ExpansionContext(
+            source_nodes=source_nodes,
+            neighbors=[Node.model_validate(neighbor) for neighbor in neighbors],
+            semantic_nodes=[Node.model_validate(candidate) for candidate in candidates],
+        )
+
+    @staticmethod
+    async def _fetch_expansion_context(
+        tx, node_ids, user_id, threshold, limit, max_neighbors, use_centroid, include_candidates
+    ):
+        query = f"""
+        UNWIND $node_ids AS node_id
+        MATCH (source:Concept {{id: node_id, userId: $userId}})
+        WITH collect(DISTINCT source) AS sources
+        CALL {{
+            WITH sources
+            UNWIND sources AS source
+            MATCH (source)--(neighbor:Concept {{userId: $userId}})
+            WHERE NOT neighbor IN sources
+            WITH DISTINCT neighbor LIMIT $max_neighbors
+            RETURN collect(neighbor) AS neighbors
+        }}
+        RETURN [source IN sources | source {_NODE_PROJECTION_WITH_EMBEDDING}] AS sources,
+               [neighbor IN neighbors | neighbor {_NODE_PROJECTION_WITH_EMBEDDING}] AS neighbors
+        """
+        result = await tx.run(query, {
+            "node_ids": node_ids,
+            "userId": user_id,
+            "max_neighbors": max_neighbors,
+        })
+        record = await result.single()
+        if record is None:
+            return [], [], []
+
+        sources, neighbors = record["sources"], record["neighbors"]
+        query_vectors = [source["embedding"] for source in sources if source.get("embedding")]
+        if not include_candidates or not query_vectors:
+            return sources, neighbors, []
+        if use_centroid and len(query_vectors) > 1:
+            query_vectors = [centroid_vector(query_vectors)]
+        excluded_ids = [node["id"] for node in sources + neighbors]
+        candidates = await GraphRepository._search_vector_index(
+            tx, query_vectors, excluded_ids, user_id, threshold, limit, include_embedding=True
+        )
+        return sources, neighbors, candidates
@@ -11,10 +11,14 @@ from slowapi.errors import RateLimitExceeded
 
 from app.api import router as api_router
 from app.db.driver import Neo4jDriver
+from app.db.migrations import run_migrations
 from app.core.redis_client import RedisClient
-from app.core.exceptions import NodeNotFoundException
-from app.core.rag_config import VECTOR_DIMENSIONS
-from app.core.limiter import limiter
+from app.core.http_client import HttpClient
+from app.core.exceptions import NodeNotFoundException, QuotaExceededException, ServiceOverloadedException
+from app.core.limiter import limiter, close_limiter_storage
+from app.services.container import ServiceContainer
+from app.core.metrics import metrics
+from app.core.fair_scheduler import get_ai_action_scheduler
 
 MAX_RETRIES = 10
 RETRY_DELAY = 3
@@ -28,6 +32,8 @@ _last_non_health_activity = time.time()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup Logic ---
+    app.state.container = await ServiceContainer.create()
+
     # Start the Neo4j initialization in the background
     startup_task = asyncio.create_task(_initialize_neo4j())
 
@@ -50,12 +56,15 @@ async def lifespan(app: FastAPI):
             with suppress(asyncio.CancelledError):
                 await startup_task
         
+        await app.state.container.close()
+        close_limiter_storage()
         await Neo4jDriver.close_driver()
         await RedisClient.close_client()
-        print("Successfully closed Neo4j and Redis connections.")
+        await HttpClient.close_client()
+        print("Successfully closed Neo4j, Redis and HTTP connections.")
 
 async def _initialize_neo4j():
-    """Attempt to verify Neo4j connectivity and ensure the vector index exists."""
+    """Attempt to verify Neo4j connectivity and apply any pending schema migrations."""
     neo4j_ready_event.clear()
     driver = None
     for attempt in range(MAX_RETRIES):
@@ -64,7 +73,9 @@ async def _initialize_neo4j():
             driver = await Neo4jDriver.get_driver()
             await driver.verify_connectivity()
             print("Successfully connected to Neo4j.")
-            await _ensure_vector_index(driver)
+            applied = await run_migrations(driver)
+            if applied:
+                print(f"Applied schema migrations: {applied}")
             print("Neo4j initialization complete.")
             neo4j_ready_event.set()
             return
@@ -82,31 +93,6 @@ async def _initialize_neo4j():
             print(f"Unexpected error while initializing Neo4j: {exc}")
             raise
 
-async def _ensure_vector_index(driver):
-    """Ensure the required vector and property indexes exist before serving traffic."""
-    async with driver.session() as session:
-        check_vector_index_query = "SHOW INDEXES YIELD name WHERE toLower(name) = 'concept_embeddings' RETURN count(*) > 0 AS indexExists"
-        result = await session.run(check_vector_index_query)
-        record = await result.single()
-        if not (record and record["indexExists"]):
-            print("Vector index 'concept_embeddings' not found. Creating it now...")
-            await session.run(
-                f"""
-                CREATE VECTOR INDEX `concept_embeddings`
-                FOR (n:Concept) ON (n.embedding)
-                OPTIONS {{ indexConfig: {{
-                    `vector.dimensions`: {VECTOR_DIMENSIONS},
-                    `vector.similarity_function`: 'cosine'
-                }} }}
-                """
-            )
-        else:
-            print("Vector index 'concept_embeddings' already exists.")
-        print("Ensuring property index on userId exists...")
-        await session.run("CREATE INDEX concept_userId IF NOT EXISTS FOR (n:Concept) ON (n.userId)")
-        print("Database indexes are configured.")
-
-
 app = FastAPI(
     title="GenAI Graph Framework API",
     description="A generalized, AI-powered knowledge graph framework.",
@@ -142,6 +128,22 @@ async def node_not_found_exception_handler(request: Request, exc: NodeNotFoundEx
         content={"message": exc.message},
     )
 
+@app.exception_handler(ServiceOverloadedException)
+async def service_overloaded_exception_handler(request: Request, exc: ServiceOverloadedException):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"message": exc.message},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(QuotaExceededException)
+async def quota_exceeded_exception_handler(request: Request, exc: QuotaExceededException):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"message": exc.message},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 app.include_router(api_router.router)
 
 @app.middleware("http")
@@ -192,3 +194,9 @@ async def redis_health_check():
             detail=f"Redis unavailable: {exc}"
         ) from exc
     return {"status": "ok", "ping": pong}
+
+@app.get("/metrics", tags=["Health"], status_code=status.HTTP_200_OK)
+async def process_metrics():
+    """Counters for this worker process (cache hits/misses, upstream API calls), plus the
+    AI action scheduler's current queue depth and longest wait."""
+    return {**metrics.snapshot(), **get_ai_action_scheduler().snapshot()}
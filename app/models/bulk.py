@@ -0,0 +1,34 @@
+# app/models/bulk.py
+from enum import Enum
+from uuid import UUID
+from pydantic import BaseModel, Field
+from app.core.config import settings
+from app.models.graph import Edge, NodeCreate
+
+class BulkItemStatus(str, Enum):
+    CREATED = "created"
+    NOT_FOUND = "not_found"
+    FAILED = "failed"
+
+class BulkNodesRequest(BaseModel):
+    nodes: list[NodeCreate] = Field(min_length=1, max_length=settings.BULK_MAX_ITEMS)
+
+class BulkEdgesRequest(BaseModel):
+    edges: list[Edge] = Field(min_length=1, max_length=settings.BULK_MAX_ITEMS)
+
+class BulkItemResult(BaseModel):
+    """Outcome of one submitted item; `index` is its position in the request."""
+    index: int
+    status: BulkItemStatus
+    id: UUID | None = None
+    error: str | None = None
+
+class BulkResult(BaseModel):
+    created: int
+    failed: int
+    results: list[BulkItemResult]
+
+    @classmethod
+    def from_results(cls, results: list[BulkItemResult]) -> "BulkResult":
+        created = sum(1 for result in results if result.status == BulkItemStatus.CREATED)
+        return cls(created=created, failed=len(results) - created, results=results)
@@ -1,13 +1,27 @@
 # app/models/graph.py
+from enum import Enum
 from uuid import UUID, uuid4
 from pydantic import BaseModel, Field
 
+class VectorEncoding(str, Enum):
+    """Compact wire encodings for node embeddings."""
+    FLOAT32 = "float32"
+    INT8 = "int8"
+
+class EncodedVector(BaseModel):
+    """A base64-packed embedding; int8 vectors are dequantized as `value * scale`."""
+    encoding: VectorEncoding
+    dimensions: int
+    data: str
+    scale: float | None = None
+
 class Node(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     name: str
     description: str
     embedding: list[float] | None = Field(default=None, repr=False)
     userId: str | None = Field(default=None, repr=False)
+    vector: EncodedVector | None = Field(default=None, repr=False)
 
 class NodeCreate(BaseModel):
     """A model for creating a new node, excluding server-set fields."""
@@ -22,7 +36,30 @@ class Edge(BaseModel):
 class Graph(BaseModel):
     nodes: list[Node]
     edges: list[Edge]
+    # Workspace revision the graph was read at; pass it as `since` to fetch later changes.
+    revision: int | None = None
+
+class GraphDelta(BaseModel):
+    """
+    What changed in a workspace after revision `since`, up to `revision`. Deleting a node
+    also removes its edges, which are not listed separately. When `full_resync` is true the
+    requested revision is no longer covered by the change log, and `nodes`/`edges` hold the
+    whole graph instead.
+    """
+    since: int
+    revision: int
+    full_resync: bool = False
+    nodes: list[Node] = Field(default_factory=list)
+    edges: list[Edge] = Field(default_factory=list)
+    deleted_node_ids: list[UUID] = Field(default_factory=list)
+    deleted_edges: list[Edge] = Field(default_factory=list)
+
+class ExpansionContext(BaseModel):
+    """Everything an AI action needs from the graph before calling the LLM."""
+    source_nodes: list[Node]
+    neighbors: list[Node]
+    semantic_nodes: list[Node]
 
 class NodeUpdate(BaseModel):
     name: str | None = None
-    description: str | None = None
\ No newline at end of file
+    description: str | None = None
@@ -0,0 +1,27 @@
+# app/models/job.py
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
+from pydantic import BaseModel
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class Job(BaseModel):
+    """Status of a queued AI action; the resulting Graph is fetched separately."""
+    id: UUID
+    status: JobStatus
+    action_key: str
+    selected_node_ids: list[UUID]
+    created_at: datetime
+    updated_at: datetime
+    error: str | None = None
+
+class JobAccepted(BaseModel):
+    job_id: UUID
+    status: JobStatus
+    status_url: str
+    result_url: str
@@ -106,3 +106,78 @@ def parse_ai_response_text(raw_text: str) -> dict[str, Any]:
 
     logger.error("Failed to parse AI response after sanitization attempts: %s", last_error)
     raise last_error if last_error else JSONDecodeError("Unable to parse AI response", raw_text, 0)
+
+
+class IncrementalGraphParser:
+    """
+    Extracts objects from the top-level "nodes" and "edges" arrays of a streamed graph payload
+    as soon as each object closes, so callers can act on them before the document is complete.
+    """
+
+    _TRACKED_ARRAYS = {"nodes": "node", "edges": "edge"}
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = -1
+        self._last_key: str | None = None
+        self._array_kind: str | None = None
+        self._object_start = -1
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+    def feed(self, chunk: str) -> list[tuple[str, dict[str, Any] | None]]:
+        """
+        Consumes the next chunk and returns `(kind, object)` pairs, kind being "node" or "edge".
+        Objects that fail to parse are reported as None so positional indexes stay aligned.
+        """
+        self._buffer += chunk
+        buffer = self._buffer
+        events: list[tuple[str, dict[str, Any] | None]] = []
+
+        for index in range(self._pos, len(buffer)):
+            char = buffer[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = buffer[self._string_start + 1:index]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2:
+                    self._array_kind = self._TRACKED_ARRAYS.get(self._last_key or "")
+                elif char == "{" and self._depth == 3 and self._array_kind:
+                    self._object_start = index
+            elif char in "}]":
+                if char == "}" and self._depth == 3 and self._object_start >= 0:
+                    events.append((self._array_kind, self._parse_object(buffer[self._object_start:index + 1])))
+                    self._object_start = -1
+                elif char == "]" and self._depth == 2:
+                    self._array_kind = None
+                self._depth -= 1
+
+        self._pos = len(buffer)
+        return events
+
+    @staticmethod
+    def _parse_object(text: str) -> dict[str, Any] | None:
+        try:
+            parsed = parse_ai_response_text(text)
+        except JSONDecodeError:
+            logger.warning("Skipping malformed streamed object: %s", text)
+            return None
+        return parsed if isinstance(parsed, dict) else None
@@ -1,18 +1,23 @@
 # app/services/ai_service.py
-import asyncio
 import logging
 import json
-from typing import Any
+from typing import Any, AsyncIterator
 from google.genai import types
 import google.genai as genai
 from pydantic import BaseModel, ValidationError
+from app.core.bulkhead import Bulkhead, get_ai_bulkhead
+from app.core.exceptions import ServiceOverloadedException
 from app.models.graph import Node, Edge
 from app.services.prompt_service import PromptService
-from app.services.ai_response_parser import parse_ai_response_text
+from app.services.ai_response_parser import IncrementalGraphParser, parse_ai_response_text
+from app.services.llm_cache import LLMResponseCache
+from app.services.usage_accountant import UsageAccountant
 from uuid import UUID
 
 logger = logging.getLogger(__name__)
 
+GENERATION_MODEL = "gemini-flash-latest"
+
 # Pydantic models for parsing the specific JSON structure from the LLM.
 class AI_Node(BaseModel):
     name: str
@@ -35,9 +40,24 @@ class AI_Graph(BaseModel):
     edges: list[AI_Edge]
 
 class AIService:
-    def __init__(self, api_key: str, prompt_service: PromptService):
+    def __init__(
+        self,
+        api_key: str,
+        prompt_service: PromptService,
+        bulkhead: Bulkhead | None = None,
+        response_cache: LLMResponseCache | None = None,
+        usage_accountant: UsageAccountant | None = None,
+    ):
         self.client = genai.Client(api_key=api_key)
         self.prompt_service = prompt_service
+        self.bulkhead = bulkhead or get_ai_bulkhead()
+        self.response_cache = response_cache or LLMResponseCache()
+        # Charges the tokens of each generation (not of cache hits) to the requesting user.
+        self.usage_accountant = usage_accountant
+
+    async def aclose(self) -> None:
+        """Closes the SDK's async HTTP transport."""
+        await self.client.aio.aclose()
 
     async def generate_graph_modification(
         self,
@@ -46,30 +66,20 @@ class AIService:
         prompt_key: str,
         context: str = ""
     ) -> tuple[list[Node], list[Edge]]:
-        prompt_template = await self.prompt_service.get_prompt(prompt_key, user_id)
-
-        # Format source nodes for the prompt
-        source_nodes_str = "\n".join(
-            [f'- ID {i}: "{node.name}" (Description: {node.description})' for i, node in enumerate(source_nodes)]
-        )
-
-        prompt = prompt_template.format(
-            source_nodes_context=source_nodes_str,
-            existing_nodes_context=context
-        )
-
-        generation_config = types.GenerateContentConfig(
-            response_mime_type="application/json"
-        )
+        prompt = await self._render_prompt(source_nodes, user_id, prompt_key, context)
 
         try:
-            response = await asyncio.to_thread(
-                self.client.models.generate_content,
-                model='gemini-flash-latest',
-                contents=prompt,
-                config=generation_config
+            raw_text = await self.response_cache.get_or_generate(
+                GENERATION_MODEL, prompt, lambda: self._generate_raw_text(prompt, user_id)
             )
-            raw_text = self._extract_structured_text(response)
+        except ServiceOverloadedException:
+            # A full bulkhead surfaces as a 503, not an empty graph.
+            raise
+        except Exception as e:
+            logger.error("An unexpected error occurred with the Gemini API: %s", e)
+            return [], []
+
+        try:
             if not raw_text:
                 logger.error("AI response did not contain structured JSON output.")
                 return [], []
@@ -78,10 +88,11 @@ class AIService:
 
         except (json.JSONDecodeError, ValidationError) as e:
             logger.error("AI response parsing failed: %s", e)
-            logger.debug("Raw AI response text: %s", getattr(response, "text", "No response text available."))
+            logger.debug("Raw AI response text: %s", raw_text)
+            await self.response_cache.invalidate(GENERATION_MODEL, prompt)
             return [], []
         except Exception as e:
-            logger.error("An unexpected error occurred with the Gemini API: %s", e)
+            logger.error("An unexpected error occurred while processing the AI response: %s", e)
             return [], []
 
         # Convert the AI's response models into our main application models
@@ -106,6 +117,85 @@ class AIService:
 
         return new_nodes, new_edges
 
+    async def _generate_raw_text(self, prompt: str, user_id: str) -> str:
+        generation_config = types.GenerateContentConfig(
+            response_mime_type="application/json"
+        )
+        async with self.bulkhead.acquire():
+            response = await self.client.aio.models.generate_content(
+                model=GENERATION_MODEL,
+                contents=prompt,
+                config=generation_config
+            )
+        if self.usage_accountant is not None:
+            await self.usage_accountant.charge_tokens(user_id, getattr(response, "usage_metadata", None))
+        return self._extract_structured_text(response)
+
+    async def stream_graph_modification(
+        self,
+        source_nodes: list[Node],
+        user_id: str,
+        prompt_key: str,
+        context: str = ""
+    ) -> AsyncIterator[tuple[str, int, Node | AI_Edge]]:
+        """
+        Streams the generation and yields `("node", index, Node)` and `("edge", index, AI_Edge)`
+        as soon as each object in the response is complete. `index` is the object's position
+        in its array, which is what edge identifiers refer to.
+        """
+        prompt = await self._render_prompt(source_nodes, user_id, prompt_key, context)
+        generation_config = types.GenerateContentConfig(
+            response_mime_type="application/json"
+        )
+        parser = IncrementalGraphParser()
+        counters = {"node": 0, "edge": 0}
+        usage_metadata = None
+
+        async with self.bulkhead.acquire():
+            stream = await self.client.aio.models.generate_content_stream(
+                model=GENERATION_MODEL,
+                contents=prompt,
+                config=generation_config
+            )
+            try:
+                async for chunk in stream:
+                    # Each chunk reports the running totals; the last one has the final counts.
+                    usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                    text = self._extract_structured_text(chunk)
+                    if not text:
+                        continue
+                    for kind, payload in parser.feed(text):
+                        index = counters[kind]
+                        counters[kind] += 1
+                        try:
+                            if kind == "node" and payload is not None:
+                                ai_node = AI_Node.model_validate(payload)
+                                yield kind, index, Node(name=ai_node.name, description=ai_node.description)
+                            elif kind == "edge" and payload is not None:
+                                yield kind, index, AI_Edge.model_validate(payload)
+                        except ValidationError as e:
+                            logger.warning("Skipping invalid streamed %s at index %s: %s", kind, index, e)
+            finally:
+                if self.usage_accountant is not None:
+                    await self.usage_accountant.charge_tokens(user_id, usage_metadata)
+
+        if not any(counters.values()):
+            logger.error("Streamed AI response did not contain any nodes or edges.")
+            logger.debug("Raw streamed AI response text: %s", parser.text)
+
+    async def _render_prompt(self, source_nodes: list[Node], user_id: str, prompt_key: str, context: str) -> str:
+        prompt_template = await self.prompt_service.get_prompt(prompt_key, user_id)
+
+        # Format source nodes for the prompt
+        source_nodes_str = "\n".join(
+            [f'- ID {i}: "{node.name}" (Description: {node.description})' for i, node in enumerate(source_nodes)]
+        )
+
+        return prompt_template.format(
+            source_nodes_context=source_nodes_str,
+            existing_nodes_context=context
+        )
+
     @staticmethod
     def _extract_structured_text(response: Any) -> str:
         """
@@ -0,0 +1,67 @@
+# app/services/container.py
+from dataclasses import dataclass
+from neo4j import AsyncDriver
+from app.core.config import settings
+from app.core.redis_client import RedisClient
+from app.db.driver import Neo4jDriver
+from app.services.ai_service import AIService
+from app.services.embedding_service import EmbeddingService
+from app.services.graph_service import GraphService
+from app.services.job_queue import JobQueue
+from app.services.prompt_service import PromptService
+from app.services.vector_index import InMemoryVectorIndex
+from app.services.graph_cache import GraphCache
+from app.services.usage_accountant import UsageAccountant
+
+@dataclass
+class ServiceContainer:
+    """
+    Application-scoped singletons, built once in the FastAPI lifespan handler and handed to
+    routes through dependencies instead of being rebuilt on every request.
+    """
+    driver: AsyncDriver
+    prompt_service: PromptService
+    embedding_service: EmbeddingService
+    ai_service: AIService
+    graph_service: GraphService
+    job_queue: JobQueue
+
+    @classmethod
+    async def create(cls) -> "ServiceContainer":
+        driver = await Neo4jDriver.get_driver()
+        prompt_service = PromptService()
+        embedding_service = EmbeddingService(api_key=settings.GEMINI_API_KEY)
+        usage_accountant = UsageAccountant() if settings.USAGE_ACCOUNTING_ENABLED else None
+        ai_service = AIService(
+            api_key=settings.GEMINI_API_KEY,
+            prompt_service=prompt_service,
+            usage_accountant=usage_accountant,
+        )
+        graph_cache = GraphCache()
+        graph_service = GraphService(
+            driver,
+            prompt_service,
+            embedding_service=embedding_service,
+            ai_service=ai_service,
+            graph_cache=graph_cache,
+            usage_accountant=usage_accountant,
+        )
+        if settings.VECTOR_BACKEND == "memory":
+            graph_service.vector_index = InMemoryVectorIndex(
+                loader=graph_service.repo.get_node_embeddings,
+                max_bytes=settings.VECTOR_INDEX_MEMORY_BUDGET_MB * 1024 * 1024,
+                ttl_seconds=settings.VECTOR_INDEX_TTL_SECONDS,
+                version_source=graph_cache.version,
+            )
+        return cls(
+            driver=driver,
+            prompt_service=prompt_service,
+            embedding_service=embedding_service,
+            ai_service=ai_service,
+            graph_service=graph_service,
+            job_queue=JobQueue(RedisClient.get_client()),
+        )
+
+    async def close(self) -> None:
+        """Releases resources owned by the services; shared clients are closed by the lifespan handler."""
+        await self.ai_service.aclose()
@@ -0,0 +1,102 @@
+# app/services/context_ranker.py
+import math
+from dataclasses import dataclass, field
+import numpy as np
+from app.models.graph import Node
+
+# Rough tokens-per-character ratio for English prose; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+def format_context_line(node: Node) -> str:
+    return f"- {node.name}: {node.description}"
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+@dataclass
+class ContextCandidate:
+    node: Node
+    # 1 for direct neighbors of a source node; None when only reachable via vector search.
+    graph_distance: int | None = None
+
+@dataclass
+class ContextSelection:
+    nodes: list[Node] = field(default_factory=list)
+    used_tokens: int = 0
+    candidate_count: int = 0
+    candidate_tokens: int = 0
+
+    @property
+    def dropped_count(self) -> int:
+        return self.candidate_count - len(self.nodes)
+
+    @property
+    def dropped_tokens(self) -> int:
+        return self.candidate_tokens - self.used_tokens
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def select_context(
+    candidates: list[ContextCandidate],
+    query_vectors: list[list[float]],
+    token_budget: int,
+    mmr_lambda: float,
+    similarity_weight: float,
+) -> ContextSelection:
+    """
+    Greedy MMR selection under a token budget. Relevance blends cosine similarity to the
+    closest query vector with graph proximity; each pick is penalized by its similarity to
+    what has already been selected, so near-duplicates do not crowd out the budget.
+    """
+    lines = [format_context_line(candidate.node) for candidate in candidates]
+    costs = [estimate_tokens(line) for line in lines]
+    selection = ContextSelection(candidate_count=len(candidates), candidate_tokens=sum(costs))
+    if not candidates:
+        return selection
+
+    dimensions = next(
+        (len(vector) for vector in query_vectors if vector),
+        next((len(c.node.embedding) for c in candidates if c.node.embedding), 0),
+    )
+    has_vector = np.array([
+        bool(c.node.embedding) and len(c.node.embedding) == dimensions for c in candidates
+    ])
+    vectors = np.zeros((len(candidates), max(dimensions, 1)), dtype=np.float32)
+    for row, candidate in enumerate(candidates):
+        if has_vector[row]:
+            vectors[row] = candidate.node.embedding
+    vectors = _normalize(vectors)
+
+    queries = [vector for vector in query_vectors if vector and len(vector) == dimensions]
+    if queries:
+        query_matrix = _normalize(np.asarray(queries, dtype=np.float32))
+        similarity = (vectors @ query_matrix.T).max(axis=1)
+    else:
+        similarity = np.zeros(len(candidates), dtype=np.float32)
+    proximity = np.array([
+        1.0 / c.graph_distance if c.graph_distance else 0.0 for c in candidates
+    ], dtype=np.float32)
+    relevance = similarity_weight * similarity + (1 - similarity_weight) * proximity
+
+    redundancy = np.zeros(len(candidates), dtype=np.float32)
+    remaining = np.ones(len(candidates), dtype=bool)
+    budget_left = token_budget
+    while remaining.any():
+        affordable = remaining & (np.asarray(costs) <= budget_left)
+        if not affordable.any():
+            break
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        scores[~affordable] = -np.inf
+        best = int(np.argmax(scores))
+
+        selection.nodes.append(candidates[best].node)
+        selection.used_tokens += costs[best]
+        budget_left -= costs[best]
+        remaining[best] = False
+        if has_vector[best]:
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+
+    return selection
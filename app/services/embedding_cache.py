@@ -0,0 +1,94 @@
+# app/services/embedding_cache.py
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Callable
+import numpy as np
+import redis.asyncio as redis
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_binary_redis_client
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Two-tier, content-addressed embedding cache: a bounded in-process LRU in front of Redis.
+    Vectors are stored as little-endian float32 bytes in both tiers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        ttl_seconds: int | None = None,
+        redis_client_factory: Callable[[], redis.Redis] | None = get_binary_redis_client,
+    ):
+        self.max_entries = max_entries if max_entries is not None else settings.EMBEDDING_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.EMBEDDING_CACHE_TTL_SECONDS
+        self._redis_client_factory = redis_client_factory
+        self._local: OrderedDict[str, bytes] = OrderedDict()
+
+    @staticmethod
+    def make_key(model_name: str, dimensions: int, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"embedding:{model_name}:{dimensions}:{digest}"
+
+    async def get(self, key: str) -> list[float] | None:
+        packed = self._local.get(key)
+        if packed is not None:
+            self._local.move_to_end(key)
+            metrics.increment("embedding_cache.l1_hits")
+            return self._unpack(packed)
+
+        packed = await self._get_remote(key)
+        if packed is not None:
+            self._set_local(key, packed)
+            metrics.increment("embedding_cache.l2_hits")
+            return self._unpack(packed)
+
+        metrics.increment("embedding_cache.misses")
+        return None
+
+    async def set(self, key: str, embedding: list[float]) -> None:
+        packed = np.asarray(embedding, dtype="<f4").tobytes()
+        self._set_local(key, packed)
+        if self._redis_client_factory is None:
+            return
+        try:
+            await self._redis_client_factory().set(key, packed, ex=self.ttl_seconds)
+        except Exception as exc:
+            logger.warning("Failed to write embedding cache entry %s: %s", key, exc)
+
+    @staticmethod
+    def stats() -> dict[str, float]:
+        return metrics.snapshot("embedding_cache.")
+
+    async def _get_remote(self, key: str) -> bytes | None:
+        if self._redis_client_factory is None:
+            return None
+        try:
+            return await self._redis_client_factory().get(key)
+        except Exception as exc:
+            logger.warning("Embedding cache lookup failed for %s: %s", key, exc)
+            return None
+
+    def _set_local(self, key: str, packed: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+        self._local[key] = packed
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    @staticmethod
+    def _unpack(packed: bytes) -> list[float]:
+        return np.frombuffer(packed, dtype="<f4").tolist()
+
+_shared_cache: EmbeddingCache | None = None
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Returns the process-wide embedding cache shared by all EmbeddingService instances."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = EmbeddingCache()
+    return _shared_cache
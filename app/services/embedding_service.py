@@ -1,49 +1,165 @@
 import asyncio
 import os
-import requests
-from typing import Literal
+import random
+from typing import Callable, Literal
+import httpx
+from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.metrics import metrics
 from app.core.rag_config import VECTOR_DIMENSIONS
+from app.services.embedding_cache import EmbeddingCache, get_embedding_cache
 
 if os.path.exists(".env"):
     from dotenv import load_dotenv
     load_dotenv()
 
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_BASE_DELAY_SECONDS = 0.5
+RETRY_MAX_DELAY_SECONDS = 8.0
+
 class EmbeddingService:
-    _API_URL_TEMPLATE = "https://generativelanguage.googleapis.com/v1beta/models/{model_name}:embedContent"
+    _BATCH_API_URL_TEMPLATE = "https://generativelanguage.googleapis.com/v1beta/models/{model_name}:batchEmbedContents"
 
     def __init__(
         self,
         api_key: str,
-        model_name: Literal["gemini-embedding-001", "text-embedding-004"] = "gemini-embedding-001"
+        model_name: Literal["gemini-embedding-001", "text-embedding-004"] = "gemini-embedding-001",
+        batch_window_ms: int | None = None,
+        max_batch_size: int | None = None,
+        cache: EmbeddingCache | None = None,
+        http_client_factory: Callable[[], httpx.AsyncClient] = get_http_client,
     ):
         if not api_key:
             raise ValueError("GEMINI_API_KEY must be provided.")
         self.api_key = api_key
         self.model_name = model_name
-        self.api_url = self._API_URL_TEMPLATE.format(model_name=self.model_name)
+        self.batch_api_url = self._BATCH_API_URL_TEMPLATE.format(model_name=self.model_name)
+        window_ms = settings.EMBEDDING_BATCH_WINDOW_MS if batch_window_ms is None else batch_window_ms
+        self.batch_window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size or settings.EMBEDDING_MAX_BATCH_SIZE)
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._inflight: set[asyncio.Task] = set()
+        self.cache = cache or get_embedding_cache()
+        self._http_client_factory = http_client_factory
+        self.timeout = settings.EMBEDDING_TIMEOUT_SECONDS
+        self.max_retries = settings.EMBEDDING_MAX_RETRIES
 
-    def _make_request(self, text: str) -> requests.Response:
+    async def _make_batch_request(self, texts: list[str]) -> httpx.Response:
         headers = {"x-goog-api-key": self.api_key, "Content-Type": "application/json"}
         data = {
-            "model": f"models/{self.model_name}",
-            "content": {"parts": [{"text": text}]},
-            "output_dimensionality": VECTOR_DIMENSIONS
+            "requests": [
+                {
+                    "model": f"models/{self.model_name}",
+                    "content": {"parts": [{"text": text}]},
+                    "output_dimensionality": VECTOR_DIMENSIONS
+                }
+                for text in texts
+            ]
         }
-        return requests.post(self.api_url, headers=headers, json=data)
+        client = self._http_client_factory()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(
+                    self.batch_api_url, headers=headers, json=data, timeout=self.timeout
+                )
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                retry_after = None
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                retry_after = response.headers.get("retry-after")
+            await asyncio.sleep(self._retry_delay(attempt, retry_after))
+
+    @staticmethod
+    def _retry_delay(attempt: int, retry_after: str | None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        backoff = random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+        try:
+            return max(backoff, float(retry_after)) if retry_after else backoff
+        except ValueError:
+            return backoff
 
     async def get_embedding(self, text: str) -> list[float]:
+        """
+        Returns the cached vector for `text` if there is one. Otherwise queues it for the next
+        batch request: calls made within the batch window are coalesced into one
+        batchEmbedContents call, and each caller receives its own vector.
+        """
+        embedding, _ = await self.fetch_embedding(text)
+        return embedding
+
+    async def fetch_embedding(self, text: str) -> tuple[list[float], bool]:
+        """Like `get_embedding`, also reporting whether the vector came from the API (a cache miss)."""
+        cache_key = self.cache.make_key(self.model_name, VECTOR_DIMENSIONS, text)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            return cached, False
+
+        embedding, from_api = await self._enqueue(text)
+        await self.cache.set(cache_key, embedding)
+        return embedding, from_api
+
+    async def _enqueue(self, text: str) -> tuple[list[float], bool]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    async def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        return list(await asyncio.gather(*[self.get_embedding(text) for text in texts]))
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._send_batch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send_batch(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        # Identical texts in the same window are only sent once.
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            metrics.increment("embedding_api.requests")
+            metrics.increment("embedding_api.texts", len(unique_texts))
+            embeddings = await self._embed_batch(unique_texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(unique_texts, embeddings))
+        # Only the first caller for each text is reported as the one that used the API.
+        delivered = set()
+        for text, future in batch:
+            if not future.done():
+                future.set_result((by_text[text], text not in delivered))
+                delivered.add(text)
+
+    async def _embed_batch(self, texts: list[str]) -> list[list[float]]:
         try:
-            response = await asyncio.to_thread(self._make_request, text)
+            response = await self._make_batch_request(texts)
             response.raise_for_status()
-            
+
             response_json = response.json()
-            embedding = response_json.get("embedding", {}).get("values", [])
-            
-            if not embedding:
-                raise ValueError("Failed to retrieve embedding from API response.")
-                
-            return embedding
-        except requests.exceptions.RequestException as e:
+            embeddings = [item.get("values", []) for item in response_json.get("embeddings", [])]
+
+            if len(embeddings) != len(texts) or not all(embeddings):
+                raise ValueError("Failed to retrieve embeddings from batch API response.")
+
+            return embeddings
+        except httpx.HTTPError as e:
             print(f"HTTP Request failed: {e}")
             raise
         except (KeyError, ValueError) as e:
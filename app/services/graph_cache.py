@@ -0,0 +1,97 @@
+# app/services/graph_cache.py
+import gzip
+import logging
+from typing import Callable
+import redis.asyncio as redis
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_binary_redis_client
+
+logger = logging.getLogger(__name__)
+
+class GraphCache:
+    """
+    Read-through cache of serialized workspace graphs in Redis.
+
+    Each workspace has a version counter that every write increments. A cached graph is
+    stored gzip-compressed together with the version it was read at and its Neo4j revision,
+    and is only served while that version is still current, so a write never needs to find
+    and delete entries.
+    The counter has no TTL: if it expired, an old entry could match the reset version.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int | None = None,
+        redis_client_factory: Callable[[], redis.Redis] = get_binary_redis_client,
+    ):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.GRAPH_CACHE_TTL_SECONDS
+        self._redis_client_factory = redis_client_factory
+
+    @staticmethod
+    def version_key(user_id: str) -> str:
+        return f"graph:version:{user_id}"
+
+    @staticmethod
+    def entry_key(user_id: str, variant: str) -> str:
+        return f"graph:cache:{user_id}:{variant}"
+
+    async def get(self, user_id: str, variant: str) -> tuple[bytes | None, int | None, int | None]:
+        """
+        Returns `(compressed_payload, revision, version)`. On a miss the payload and revision
+        are None and the version is the one the caller must pass to `set` after reading from
+        Neo4j. All three are None when Redis is unavailable.
+        """
+        try:
+            raw_version, entry = await self._redis_client_factory().mget(
+                self.version_key(user_id), self.entry_key(user_id, variant)
+            )
+        except Exception as exc:
+            metrics.increment("graph_cache.errors")
+            logger.warning("Graph cache lookup failed for %s: %s", user_id, exc)
+            return None, None, None
+
+        version = int(raw_version or 0)
+        if entry is not None:
+            entry_version, revision, payload = entry.split(b"\n", 2)
+            if int(entry_version) == version:
+                metrics.increment("graph_cache.hits")
+                return payload, int(revision), version
+        metrics.increment("graph_cache.misses")
+        return None, None, version
+
+    async def set(self, user_id: str, variant: str, version: int, revision: int, payload: bytes) -> bytes:
+        """Compresses and stores `payload` as read at `version`; returns the compressed bytes."""
+        compressed = gzip.compress(payload, compresslevel=5)
+        try:
+            await self._redis_client_factory().set(
+                self.entry_key(user_id, variant), b"%d\n%d\n" % (version, revision) + compressed,
+                ex=self.ttl_seconds
+            )
+        except Exception as exc:
+            metrics.increment("graph_cache.errors")
+            logger.warning("Failed to write graph cache entry for %s: %s", user_id, exc)
+        return compressed
+
+    async def version(self, user_id: str) -> int | None:
+        """The workspace's current version, or None when Redis is unavailable."""
+        try:
+            raw_version = await self._redis_client_factory().get(self.version_key(user_id))
+        except Exception as exc:
+            metrics.increment("graph_cache.errors")
+            logger.warning("Graph cache version lookup failed for %s: %s", user_id, exc)
+            return None
+        return int(raw_version or 0)
+
+    async def invalidate(self, user_id: str) -> int | None:
+        """Bumps the workspace version; returns the new version, or None when Redis is unavailable."""
+        try:
+            return await self._redis_client_factory().incr(self.version_key(user_id))
+        except Exception as exc:
+            metrics.increment("graph_cache.errors")
+            logger.warning("Failed to bump graph cache version for %s: %s", user_id, exc)
+            return None
+
+    @staticmethod
+    def stats() -> dict[str, float]:
+        return metrics.snapshot("graph_cache.")
@@ -1,16 +1,37 @@
 # app/services/graph_service.py
+from typing import AsyncIterator
 from uuid import UUID
 import asyncio
+import gzip
+import logging
 from neo4j import AsyncDriver
 from neo4j.exceptions import SessionExpired, ServiceUnavailable
-from app.models.graph import Node, Graph, Edge, NodeUpdate, NodeCreate
+from app.models.graph import Node, Graph, GraphDelta, Edge, NodeUpdate, NodeCreate, VectorEncoding
+from app.models.bulk import BulkItemResult, BulkItemStatus, BulkResult
 from app.db.repositories.graph_repository import GraphRepository
 from app.core.exceptions import NodeNotFoundException
-from app.services.ai_service import AIService
+from app.core.fair_scheduler import FairScheduler, get_ai_action_scheduler
+from app.services.ai_service import AIService, AI_Edge, AI_NodeIdentifier
 from app.services.embedding_service import EmbeddingService
-from app.core.rag_config import SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES
+from app.core.metrics import metrics
+from app.core.rag_config import (
+    SIMILARITY_THRESHOLD,
+    MAX_SEMANTIC_CANDIDATES,
+    MAX_NEIGHBOR_CANDIDATES,
+    CENTROID_SELECTION_THRESHOLD,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_MMR_LAMBDA,
+    CONTEXT_SIMILARITY_WEIGHT,
+)
 from app.core.config import settings
 from app.services.prompt_service import PromptService
+from app.services.context_ranker import ContextCandidate, format_context_line, select_context
+from app.services.vector_codec import encode_vector
+from app.services.vector_index import InMemoryVectorIndex
+from app.services.graph_cache import GraphCache
+from app.services.usage_accountant import UsageAccountant
+
+logger = logging.getLogger(__name__)
 
 def _get_embedding_text_for_node(node: Node) -> str:
     """Creates a rich, consistent text document for embedding."""
@@ -19,12 +40,43 @@ def _get_embedding_text_for_node(node: Node) -> str:
         f"Description: {node.description}"
     )
 
+def _apply_vector_encoding(node: Node, encoding: VectorEncoding | None) -> Node:
+    """Replaces the raw float list with its compact encoding, or drops it entirely."""
+    if encoding is not None and node.embedding:
+        node.vector = encode_vector(node.embedding, encoding)
+    node.embedding = None
+    return node
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 class GraphService:
-    def __init__(self, driver: AsyncDriver, prompt_service: PromptService | None = None):
-        self.repo = GraphRepository(driver)
-        self.embedding_service = EmbeddingService(api_key=settings.GEMINI_API_KEY)
+    def __init__(
+        self,
+        driver: AsyncDriver,
+        prompt_service: PromptService | None = None,
+        embedding_service: EmbeddingService | None = None,
+        ai_service: AIService | None = None,
+        vector_index: InMemoryVectorIndex | None = None,
+        graph_cache: GraphCache | None = None,
+        usage_accountant: UsageAccountant | None = None,
+        scheduler: FairScheduler | None = None,
+    ):
+        self.repo = GraphRepository(driver, changelog_retention=settings.CHANGELOG_RETENTION_REVISIONS)
+        # Every write below must go through _record_write so cached graphs are invalidated.
+        self.graph_cache = graph_cache
+        # When set, semantic search runs against in-process per-workspace matrices
+        # instead of the shared Neo4j vector index.
+        self.vector_index = vector_index
+        # When set, embeddings and rows read are charged to the user, and expensive reads and
+        # AI actions are refused once the user's rolling budget is spent.
+        self.usage_accountant = usage_accountant
+        # AI actions wait here for a slot, shared fairly between users.
+        self.scheduler = scheduler or get_ai_action_scheduler()
+        self.embedding_service = embedding_service or EmbeddingService(api_key=settings.GEMINI_API_KEY)
         self.prompt_service = prompt_service or PromptService()
-        self.ai_service = AIService(
+        self.ai_service = ai_service or AIService(
             api_key=settings.GEMINI_API_KEY,
             prompt_service=self.prompt_service
         )
@@ -32,100 +84,447 @@ class GraphService:
     async def clear_workspace(self, user_id: str) -> None:
         """Clears all nodes and edges for a specific user."""
         await self._with_retry(self.repo.delete_all_nodes_for_user, user_id)
+        if self.vector_index is not None:
+            self.vector_index.drop(user_id)
+        await self._record_write(user_id)
 
     async def create_node(self, node_data: NodeCreate, user_id: str) -> Node:
         node = Node(**node_data.model_dump(), userId=user_id)
-        await self._ensure_embedding(node)
-        return await self._with_retry(self.repo.add_node, node)
+        embedded = await self._ensure_embedding(node)
+        await self._charge(user_id, embeddings=int(embedded))
+        created = await self._with_retry(self.repo.add_node, node)
+        self._index_nodes(user_id, [node])
+        await self._record_write(user_id)
+        return created
+
+    async def create_nodes_bulk(self, nodes_data: list[NodeCreate], user_id: str) -> BulkResult:
+        """
+        Creates many nodes at once, BULK_WRITE_CHUNK_SIZE at a time: each chunk's embeddings
+        are requested together so the embedding batcher can send them in a few batch calls,
+        then the chunk is written in one UNWIND transaction. Only one chunk's embeddings are
+        in flight at a time, so a large request cannot flood the embedding API that
+        interactive requests share. An item whose embedding or chunk fails is reported as
+        failed; the other items are still written.
+        """
+        await self.check_budget(user_id)
+        nodes = [Node(**node_data.model_dump(), userId=user_id) for node_data in nodes_data]
+        results: list[BulkItemResult | None] = [None] * len(nodes)
+        written = []
+        for indexed_chunk in _chunks(list(enumerate(nodes)), settings.BULK_WRITE_CHUNK_SIZE):
+            embedded = await asyncio.gather(
+                *[self._ensure_embedding(node) for _, node in indexed_chunk], return_exceptions=True
+            )
+            chunk = []
+            for (index, node), outcome in zip(indexed_chunk, embedded):
+                if isinstance(outcome, Exception):
+                    logger.warning("Embedding failed for bulk node %s: %s", index, outcome)
+                    results[index] = BulkItemResult(
+                        index=index, status=BulkItemStatus.FAILED, error="Embedding failed"
+                    )
+                else:
+                    chunk.append((index, node))
+            await self._charge(user_id, embeddings=sum(outcome is True for outcome in embedded))
+            if not chunk:
+                continue
+
+            chunk_nodes = [node for _, node in chunk]
+            try:
+                await self._with_retry(self.repo.add_subgraph, chunk_nodes, [], user_id)
+            except Exception as exc:
+                logger.error("Bulk node write failed for %s nodes: %s", len(chunk), exc)
+                for index, _ in chunk:
+                    results[index] = BulkItemResult(index=index, status=BulkItemStatus.FAILED, error="Write failed")
+                continue
+            written += chunk_nodes
+            for index, node in chunk:
+                results[index] = BulkItemResult(index=index, status=BulkItemStatus.CREATED, id=node.id)
+
+        if written:
+            self._index_nodes(user_id, written)
+            await self._record_write(user_id)
+        return BulkResult.from_results(results)
+
+    async def create_edges_bulk(self, edges: list[Edge], user_id: str) -> BulkResult:
+        """
+        Creates many edges in chunked UNWIND transactions. Edges with an endpoint that is not
+        in the user's workspace are reported as not_found.
+        """
+        results: list[BulkItemResult | None] = [None] * len(edges)
+        any_written = False
+        for chunk in _chunks(list(enumerate(edges)), settings.BULK_WRITE_CHUNK_SIZE):
+            try:
+                created = await self._with_retry(self.repo.add_subgraph, [], [edge for _, edge in chunk], user_id)
+            except Exception as exc:
+                logger.error("Bulk edge write failed for %s edges: %s", len(chunk), exc)
+                for index, _ in chunk:
+                    results[index] = BulkItemResult(index=index, status=BulkItemStatus.FAILED, error="Write failed")
+                continue
+            any_written = any_written or bool(created)
+            for offset, (index, _) in enumerate(chunk):
+                if offset in created:
+                    results[index] = BulkItemResult(index=index, status=BulkItemStatus.CREATED)
+                else:
+                    results[index] = BulkItemResult(
+                        index=index, status=BulkItemStatus.NOT_FOUND, error="Source or target node not found"
+                    )
+
+        if any_written:
+            await self._record_write(user_id)
+        return BulkResult.from_results(results)
+
+    async def get_graph(self, user_id: str, vector_encoding: VectorEncoding | None = None) -> Graph:
+        graph = await self._with_retry(
+            self.repo.get_full_graph, user_id, include_embedding=vector_encoding is not None
+        )
+        await self._charge(user_id, rows=len(graph.nodes) + len(graph.edges))
+        for node in graph.nodes:
+            _apply_vector_encoding(node, vector_encoding)
+        return graph
+
+    async def get_graph_revision(self, user_id: str) -> int:
+        """The workspace revision alone, so conditional reads can be answered without loading the graph."""
+        return await self._with_retry(self.repo.get_workspace_revision, user_id)
+
+    async def get_graph_payload(
+        self, user_id: str, vector_encoding: VectorEncoding | None = None
+    ) -> tuple[bytes, int]:
+        """
+        Returns the workspace graph as gzip-compressed JSON along with its revision. While the
+        workspace is unchanged, repeat reads are served from the graph cache without touching Neo4j.
+        """
+        variant = vector_encoding.value if vector_encoding else "plain"
+        version = None
+        if self.graph_cache is not None:
+            cached, revision, version = await self.graph_cache.get(user_id, variant)
+            if cached is not None:
+                return cached, revision
 
-    async def get_graph(self, user_id: str) -> Graph:
-        return await self._with_retry(self.repo.get_full_graph, user_id)
+        await self.check_budget(user_id)
+        graph = await self.get_graph(user_id, vector_encoding)
+        payload = graph.model_dump_json().encode("utf-8")
+        revision = graph.revision or 0
+        if version is None:
+            return gzip.compress(payload, compresslevel=5), revision
+        return await self.graph_cache.set(user_id, variant, version, revision, payload), revision
+
+    async def get_graph_delta(
+        self, user_id: str, since: int, vector_encoding: VectorEncoding | None = None
+    ) -> GraphDelta:
+        """Changes after revision `since`, or the whole graph when the change log cannot cover them."""
+        delta = await self._with_retry(
+            self.repo.get_graph_changes, user_id, since, include_embedding=vector_encoding is not None
+        )
+        if delta.full_resync:
+            await self.check_budget(user_id)
+            graph = await self.get_graph(user_id, vector_encoding)
+            return GraphDelta(
+                since=since, revision=graph.revision, full_resync=True, nodes=graph.nodes, edges=graph.edges
+            )
+        await self._charge(
+            user_id, rows=len(delta.nodes) + len(delta.edges) + len(delta.deleted_node_ids) + len(delta.deleted_edges)
+        )
+        for node in delta.nodes:
+            _apply_vector_encoding(node, vector_encoding)
+        return delta
+
+    async def stream_graph(
+        self, user_id: str, vector_encoding: VectorEncoding | None = None
+    ) -> AsyncIterator[Node | Edge]:
+        # Streaming reads cannot be retried transparently once records have been sent.
+        items = self.repo.stream_full_graph(user_id, include_embedding=vector_encoding is not None)
+        rows = 0
+        try:
+            async for item in items:
+                rows += 1
+                if isinstance(item, Node):
+                    _apply_vector_encoding(item, vector_encoding)
+                yield item
+        finally:
+            await self._charge(user_id, rows=rows)
 
     async def create_edge(self, edge_data: Edge, user_id: str) -> Edge:
-        return await self._with_retry(self.repo.add_edge, edge_data, user_id)
+        edge = await self._with_retry(self.repo.add_edge, edge_data, user_id)
+        await self._record_write(user_id)
+        return edge
 
     async def update_node_properties(self, node_id: UUID, node_update: NodeUpdate, user_id: str) -> Node | None:
-        return await self._with_retry(self.repo.update_node, node_id, node_update, user_id)
+        changes = node_update.model_dump(exclude_unset=True)
+        embedding = None
+        if "name" in changes or "description" in changes:
+            # The vector is derived from the name and description, so a text edit re-embeds.
+            current = await self._with_retry(self.repo.get_node_by_id, node_id, user_id)
+            if current is None:
+                return None
+            edited = current.model_copy(update={**changes, "embedding": None})
+            embedded = await self._ensure_embedding(edited)
+            await self._charge(user_id, embeddings=int(embedded))
+            embedding = edited.embedding
+
+        node = await self._with_retry(self.repo.update_node, node_id, node_update, user_id, embedding=embedding)
+        if node:
+            self._index_nodes(user_id, [node.model_copy(update={"embedding": embedding})])
+            await self._record_write(user_id)
+        return node
     
-    async def get_node(self, node_id: UUID, user_id: str) -> Node | None:
-        return await self._with_retry(self.repo.get_node_by_id, node_id, user_id)
+    async def get_node(
+        self, node_id: UUID, user_id: str, vector_encoding: VectorEncoding | None = None
+    ) -> Node | None:
+        node = await self._with_retry(
+            self.repo.get_node_by_id, node_id, user_id, include_embedding=vector_encoding is not None
+        )
+        return _apply_vector_encoding(node, vector_encoding) if node else None
 
     async def delete_node(self, node_id: UUID, user_id: str) -> bool:
-        return await self._with_retry(self.repo.delete_node_by_id, node_id, user_id)
+        deleted = await self._with_retry(self.repo.delete_node_by_id, node_id, user_id)
+        if deleted:
+            if self.vector_index is not None:
+                self.vector_index.remove(user_id, [str(node_id)])
+            await self._record_write(user_id)
+        return deleted
 
     async def delete_edge(self, edge_data: Edge, user_id: str) -> bool:
-        return await self._with_retry(self.repo.delete_edge, edge_data, user_id)
+        deleted = await self._with_retry(self.repo.delete_edge, edge_data, user_id)
+        if deleted:
+            await self._record_write(user_id)
+        return deleted
 
     async def execute_ai_action(self, action_key: str, selected_node_ids: list[UUID], user_id: str) -> Graph:
         if not selected_node_ids:
             return Graph(nodes=[], edges=[])
 
-        source_nodes = [node for node in await asyncio.gather(
-            *[self._with_retry(self.repo.get_node_by_id, node_id, user_id) for node_id in selected_node_ids]
-        ) if node is not None]
+        await self.check_budget(user_id)
+        async with self.scheduler.acquire(user_id):
+            source_nodes, context_str = await self._build_action_context(selected_node_ids, user_id)
+
+            new_nodes, new_edges = await self.ai_service.generate_graph_modification(
+                source_nodes, user_id, action_key, context=context_str
+            )
+
+            if not new_nodes and not new_edges:
+                return Graph(nodes=[], edges=[])
+
+            for node in new_nodes:
+                node.userId = user_id
+            embedded = await asyncio.gather(*[self._ensure_embedding(node) for node in new_nodes])
+            await self._charge(user_id, embeddings=sum(embedded))
+
+            await self._with_retry(self.repo.add_subgraph, new_nodes, new_edges, user_id)
+            self._index_nodes(user_id, new_nodes)
+            await self._record_write(user_id)
+
+        response_nodes = [
+            _apply_vector_encoding(node.model_copy(), None) for node in new_nodes
+        ]
+        return Graph(nodes=response_nodes, edges=new_edges)
+
+    async def stream_ai_action(
+        self, action_key: str, selected_node_ids: list[UUID], user_id: str
+    ) -> AsyncIterator[tuple[str, Node | Edge]]:
+        """
+        Gathers context eagerly (so a missing selection raises before anything is streamed) and
+        returns an iterator of `("node", Node)` / `("edge", Edge)` events. Each node is embedded and
+        persisted before it is yielded, in small batches; each edge once both of its endpoints
+        exist. The iterator holds one of the user's scheduler slots while the model streams.
+        """
+        if not selected_node_ids:
+            raise NodeNotFoundException("None of the selected nodes were found.")
+        await self.check_budget(user_id)
+        source_nodes, context_str = await self._build_action_context(selected_node_ids, user_id)
+        return self._stream_ai_action_events(action_key, source_nodes, context_str, user_id)
+
+    async def _stream_ai_action_events(
+        self, action_key: str, source_nodes: list[Node], context_str: str, user_id: str
+    ) -> AsyncIterator[tuple[str, Node | Edge]]:
+        new_nodes: dict[int, Node] = {}
+        pending_edges: list[AI_Edge] = []
+        buffered_nodes: list[Node] = []
+        buffered_edges: list[Edge] = []
+        api_embeddings = 0
+
+        def resolve(identifier: AI_NodeIdentifier) -> UUID | None:
+            if identifier.is_new:
+                node = new_nodes.get(identifier.index)
+                return node.id if node else None
+            if 0 <= identifier.index < len(source_nodes):
+                return source_nodes[identifier.index].id
+            return None
+
+        def buffer_edge(ai_edge: AI_Edge) -> bool:
+            source_id, target_id = resolve(ai_edge.source), resolve(ai_edge.target)
+            if not source_id or not target_id:
+                return False
+            buffered_edges.append(Edge(source_id=source_id, target_id=target_id, label=ai_edge.label))
+            return True
+
+        async def flush() -> list[tuple[str, Node | Edge]]:
+            """Embeds and writes the buffered items in one transaction; returns their events."""
+            nonlocal api_embeddings
+            if not buffered_nodes and not buffered_edges:
+                return []
+            nodes, edges = buffered_nodes.copy(), buffered_edges.copy()
+            buffered_nodes.clear()
+            buffered_edges.clear()
+            embedded = await asyncio.gather(*[self._ensure_embedding(node) for node in nodes])
+            api_embeddings += sum(embedded)
+            created = await self._with_retry(self.repo.add_subgraph, nodes, edges, user_id)
+            self._index_nodes(user_id, nodes)
+            await self._record_write(user_id)
+            return [("node", _apply_vector_encoding(node.model_copy(), None)) for node in nodes] + [
+                ("edge", edge) for position, edge in enumerate(edges) if position in created
+            ]
+
+        async with self.scheduler.acquire(user_id):
+            stream = self.ai_service.stream_graph_modification(
+                source_nodes, user_id, action_key, context=context_str
+            )
+            try:
+                previous_kind = None
+                async for kind, index, payload in stream:
+                    # After the first node, writes go out in batches, at the end of the nodes array
+                    # and whenever the buffer fills, so the AI slot is not held across one round
+                    # trip per item.
+                    buffered = len(buffered_nodes) + len(buffered_edges)
+                    if kind != previous_kind or buffered >= settings.AI_STREAM_WRITE_BATCH_SIZE:
+                        for event in await flush():
+                            yield event
+                    previous_kind = kind
+
+                    if kind == "node":
+                        payload.userId = user_id
+                        new_nodes[index] = payload
+                        buffered_nodes.append(payload)
+                        # An edge may arrive before the node it points to.
+                        pending_edges = [ai_edge for ai_edge in pending_edges if not buffer_edge(ai_edge)]
+                        if len(new_nodes) == 1:
+                            # The first node goes out at once; batching starts after it.
+                            for event in await flush():
+                                yield event
+                    elif not buffer_edge(payload):
+                        pending_edges.append(payload)
+
+                for event in await flush():
+                    yield event
+            finally:
+                await self._charge(user_id, embeddings=api_embeddings)
+
+        if pending_edges:
+            logger.warning("Dropping %s streamed edges with unresolved endpoints.", len(pending_edges))
+
+    async def _build_action_context(self, selected_node_ids: list[UUID], user_id: str) -> tuple[list[Node], str]:
+        """Returns the selected source nodes and the prompt context describing what already exists."""
+        use_centroid = len(selected_node_ids) >= CENTROID_SELECTION_THRESHOLD
+        context = await self._with_retry(
+            self.repo.get_expansion_context,
+            selected_node_ids, user_id, SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES,
+            max_neighbors=MAX_NEIGHBOR_CANDIDATES, use_centroid=use_centroid,
+            include_candidates=self.vector_index is None
+        )
+        source_nodes = context.source_nodes
 
         if not source_nodes:
             raise NodeNotFoundException("None of the selected nodes were found.")
 
-        await asyncio.gather(*[self._ensure_embedding(node) for node in source_nodes])
-
-        # Gather context from all source nodes
-        unique_neighbors = {}
-        unique_semantic_nodes = {}
-        excluded_ids = {n.id for n in source_nodes}
-
-        # Collect 1-hop neighbors for all source nodes
-        neighbor_tasks = [self._with_retry(self.repo.get_1_hop_neighbors, node.id, user_id) for node in source_nodes]
-        for neighbors in await asyncio.gather(*neighbor_tasks):
-            for neighbor in neighbors:
-                if neighbor.id not in excluded_ids:
-                    unique_neighbors[neighbor.id] = neighbor
-        
-        excluded_ids.update(unique_neighbors.keys())
-
-        # Collect semantically similar nodes for all source nodes
-        semantic_tasks = [
-            self._with_retry(
-                self.repo.find_semantically_similar_nodes,
-                node.embedding, list(excluded_ids), user_id, SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES
-            ) for node in source_nodes if node.embedding
-        ]
-        for semantic_results in await asyncio.gather(*semantic_tasks):
+        unique_neighbors = {node.id: node for node in context.neighbors}
+        unique_semantic_nodes = {node.id: node for node in context.semantic_nodes}
+
+        # Sources without a stored embedding were skipped by the Neo4j vector search above;
+        # embed them now and search for them in one batched query. The in-memory index
+        # searches for every source here instead.
+        missing_embedding = [node for node in source_nodes if not node.embedding]
+        embedded = await asyncio.gather(*[self._ensure_embedding(node) for node in missing_embedding])
+        await self._charge(
+            user_id,
+            rows=len(source_nodes) + len(unique_neighbors) + len(unique_semantic_nodes),
+            embeddings=sum(embedded),
+        )
+        query_nodes = source_nodes if self.vector_index is not None else missing_embedding
+        if query_nodes:
+            excluded_ids = {n.id for n in source_nodes} | unique_neighbors.keys() | unique_semantic_nodes.keys()
+            semantic_results = await self._find_similar_nodes(
+                [node.embedding for node in query_nodes], list(excluded_ids), user_id, use_centroid
+            )
             for node in semantic_results:
                 if node.id not in excluded_ids:
                     unique_semantic_nodes[node.id] = node
 
-        final_context_nodes = list(unique_neighbors.values()) + list(unique_semantic_nodes.values())
-        
+        candidates = [ContextCandidate(node, graph_distance=1) for node in unique_neighbors.values()]
+        candidates += [
+            ContextCandidate(node) for node_id, node in unique_semantic_nodes.items() if node_id not in unique_neighbors
+        ]
+        selection = select_context(
+            candidates,
+            [node.embedding for node in source_nodes],
+            token_budget=CONTEXT_TOKEN_BUDGET,
+            mmr_lambda=CONTEXT_MMR_LAMBDA,
+            similarity_weight=CONTEXT_SIMILARITY_WEIGHT,
+        )
+        metrics.increment("context.candidates", selection.candidate_count)
+        metrics.increment("context.dropped", selection.dropped_count)
+        metrics.increment("context.dropped_tokens", selection.dropped_tokens)
+        if selection.dropped_count:
+            logger.info(
+                "Expansion context kept %s/%s candidates (~%s/%s tokens); dropped %s.",
+                len(selection.nodes), selection.candidate_count,
+                selection.used_tokens, selection.candidate_tokens, selection.dropped_count,
+            )
+
         context_str = ""
-        if final_context_nodes:
-            context_items = "\n".join([f"- {n.name}: {n.description}" for n in final_context_nodes])
+        if selection.nodes:
+            context_items = "\n".join([format_context_line(n) for n in selection.nodes])
             context_str = (
                 "To avoid creating duplicate concepts, be aware of these "
                 "semantically similar or directly related concepts that already exist in the graph:\n"
                 f"{context_items}"
             )
+        return source_nodes, context_str
 
-        new_nodes, new_edges = await self.ai_service.generate_graph_modification(
-            source_nodes, user_id, action_key, context=context_str
+    async def _find_similar_nodes(
+        self, query_vectors: list[list[float]], excluded_ids: list[UUID], user_id: str, use_centroid: bool
+    ) -> list[Node]:
+        if self.vector_index is not None:
+            results = await self.vector_index.search(
+                user_id, query_vectors, [str(node_id) for node_id in excluded_ids],
+                SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES, use_centroid=use_centroid
+            )
+            if results is not None:
+                return results
+        return await self._with_retry(
+            self.repo.find_semantically_similar_nodes_batch,
+            query_vectors, excluded_ids, user_id, SIMILARITY_THRESHOLD, MAX_SEMANTIC_CANDIDATES,
+            use_centroid=use_centroid, include_embedding=True
         )
 
-        if not new_nodes and not new_edges:
-            return Graph(nodes=[], edges=[])
+    async def check_budget(self, user_id: str) -> None:
+        """Raises QuotaExceededException once the user's rolling usage budget is spent."""
+        if self.usage_accountant is not None:
+            await self.usage_accountant.check(user_id)
 
-        for node in new_nodes:
-            node.userId = user_id
-        await asyncio.gather(*[self._ensure_embedding(node) for node in new_nodes])
-        
-        await self._with_retry(self.repo.add_subgraph, new_nodes, new_edges)
+    async def _charge(self, user_id: str, rows: int = 0, embeddings: int = 0) -> None:
+        if self.usage_accountant is None:
+            return
+        if rows:
+            await self.usage_accountant.charge_rows(user_id, rows)
+        if embeddings:
+            await self.usage_accountant.charge_embeddings(user_id, embeddings)
 
-        return Graph(nodes=new_nodes, edges=new_edges)
+    async def _record_write(self, user_id: str) -> None:
+        if self.graph_cache is not None:
+            version = await self.graph_cache.invalidate(user_id)
+            if self.vector_index is not None and version is not None:
+                # The local index already holds this write; let it keep serving at the new version.
+                self.vector_index.advance(user_id, version)
 
-    async def _ensure_embedding(self, node: Node) -> Node:
-        if not node.embedding:
-            embedding_text = _get_embedding_text_for_node(node)
-            node.embedding = await self.embedding_service.get_embedding(embedding_text)
-        return node
+    def _index_nodes(self, user_id: str, nodes: list[Node]) -> None:
+        if self.vector_index is not None and nodes:
+            self.vector_index.upsert(user_id, nodes)
+
+    async def _ensure_embedding(self, node: Node) -> bool:
+        """Embeds `node` if it has no vector yet; returns True when that took an embedding API call."""
+        if node.embedding:
+            return False
+        embedding_text = _get_embedding_text_for_node(node)
+        node.embedding, from_api = await self.embedding_service.fetch_embedding(embedding_text)
+        return from_api
 
     async def _with_retry(self, func, *args, retries: int = 3, delay: float = 0.5, **kwargs):
         for attempt in range(retries):
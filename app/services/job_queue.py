@@ -0,0 +1,166 @@
+# app/services/job_queue.py
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+import redis.asyncio as redis
+from app.core.config import settings
+from app.models.graph import Graph
+from app.models.job import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "jobs:ai-action:queue"
+PROCESSING_KEY = "jobs:ai-action:processing"
+# Sorted set of claimed job IDs scored by the time they were claimed.
+CLAIMS_KEY = "jobs:ai-action:claims"
+
+# KEYS: processing list, queue, claims. ARGV: claim cutoff, job key prefix, timestamp.
+# Moves jobs claimed before the cutoff back to the queue and returns their IDs. Jobs whose
+# record expired are dropped, and jobs already finished (no longer in the processing
+# list) are left alone.
+REQUEUE_STALE_SCRIPT = """
+local requeued = {}
+for _, job_id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])) do
+    redis.call('ZREM', KEYS[3], job_id)
+    if redis.call('LREM', KEYS[1], 1, job_id) == 1 and redis.call('EXISTS', ARGV[2] .. job_id) == 1 then
+        redis.call('HSET', ARGV[2] .. job_id, 'status', 'queued', 'updated_at', ARGV[3])
+        redis.call('RPUSH', KEYS[2], job_id)
+        table.insert(requeued, job_id)
+    end
+end
+return requeued
+"""
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class JobQueue:
+    """
+    Redis-backed queue for AI actions. API processes enqueue, `python -m app.worker`
+    processes claim jobs with BLMOVE so a job is never handed to two workers. Claims are
+    timestamped, and `requeue_stale` returns jobs whose worker died to the queue.
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl_seconds: int | None = None):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds or settings.JOB_TTL_SECONDS
+        # Registered on first use; only workers reap, and the API builds a queue per request.
+        self._requeue_stale = None
+
+    @staticmethod
+    def _job_key(job_id: UUID | str) -> str:
+        return f"job:{job_id}"
+
+    @staticmethod
+    def _result_key(job_id: UUID | str) -> str:
+        return f"job:{job_id}:result"
+
+    async def enqueue(self, user_id: str, action_key: str, selected_node_ids: list[UUID]) -> Job:
+        job_id = uuid4()
+        now = _now()
+        fields = {
+            "status": JobStatus.QUEUED.value,
+            "user_id": user_id,
+            "action_key": action_key,
+            "selected_node_ids": json.dumps([str(node_id) for node_id in selected_node_ids]),
+            "created_at": now,
+            "updated_at": now,
+        }
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._job_key(job_id), mapping=fields)
+            pipe.expire(self._job_key(job_id), self.ttl_seconds)
+            pipe.lpush(QUEUE_KEY, str(job_id))
+            await pipe.execute()
+        return self._to_job(job_id, fields)
+
+    async def get(self, job_id: UUID | str, user_id: str | None = None) -> Job | None:
+        """Returns the job, or None if it is unknown, expired, or owned by another user."""
+        fields = await self.redis.hgetall(self._job_key(job_id))
+        if not fields or (user_id is not None and fields.get("user_id") != user_id):
+            return None
+        return self._to_job(job_id, fields)
+
+    async def get_result(self, job_id: UUID | str) -> Graph | None:
+        raw = await self.redis.get(self._result_key(job_id))
+        return Graph.model_validate_json(raw) if raw else None
+
+    async def claim(self, timeout: float = 5) -> str | None:
+        """Blocks up to `timeout` seconds for the next job ID and moves it to the processing list."""
+        job_id = await self.redis.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+        if job_id is None:
+            return None
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(CLAIMS_KEY, {job_id: time.time()})
+            pipe.hset(self._job_key(job_id), mapping={"status": JobStatus.RUNNING.value, "updated_at": _now()})
+            await pipe.execute()
+        return job_id
+
+    async def requeue_stale(self, visibility_timeout: float | None = None) -> list[str]:
+        """Moves jobs claimed more than `visibility_timeout` seconds ago back to the queue."""
+        timeout = visibility_timeout if visibility_timeout is not None else settings.JOB_VISIBILITY_TIMEOUT_SECONDS
+        if self._requeue_stale is None:
+            self._requeue_stale = self.redis.register_script(REQUEUE_STALE_SCRIPT)
+        requeued = await self._requeue_stale(
+            keys=[PROCESSING_KEY, QUEUE_KEY, CLAIMS_KEY],
+            args=[time.time() - timeout, self._job_key(""), _now()],
+        )
+        job_ids = [job_id.decode() if isinstance(job_id, bytes) else job_id for job_id in requeued]
+        if job_ids:
+            logger.warning("Requeued %s jobs whose workers stopped responding: %s", len(job_ids), job_ids)
+        return job_ids
+
+    async def save_result(self, job_id: str, graph: Graph) -> None:
+        """Stores the result of a job whose action has run; see `complete`."""
+        await self.redis.set(self._result_key(job_id), graph.model_dump_json(), ex=self.ttl_seconds)
+
+    async def complete(self, job_id: str, graph: Graph) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self._result_key(job_id), graph.model_dump_json(), ex=self.ttl_seconds)
+            pipe.hset(self._job_key(job_id), mapping={"status": JobStatus.SUCCEEDED.value, "updated_at": _now()})
+            pipe.lrem(PROCESSING_KEY, 1, job_id)
+            pipe.zrem(CLAIMS_KEY, job_id)
+            await pipe.execute()
+
+    async def fail(self, job_id: str, error: str) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                self._job_key(job_id),
+                mapping={"status": JobStatus.FAILED.value, "error": error, "updated_at": _now()},
+            )
+            pipe.lrem(PROCESSING_KEY, 1, job_id)
+            pipe.zrem(CLAIMS_KEY, job_id)
+            await pipe.execute()
+
+    async def requeue(self, job_id: str) -> None:
+        """Puts a claimed job back at the head of the queue."""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._job_key(job_id), mapping={"status": JobStatus.QUEUED.value, "updated_at": _now()})
+            pipe.lrem(PROCESSING_KEY, 1, job_id)
+            pipe.zrem(CLAIMS_KEY, job_id)
+            pipe.rpush(QUEUE_KEY, job_id)
+            await pipe.execute()
+
+    async def get_request(self, job_id: str) -> tuple[str, str, list[UUID]] | None:
+        """Returns `(user_id, action_key, selected_node_ids)` for a claimed job."""
+        fields = await self.redis.hgetall(self._job_key(job_id))
+        if not fields:
+            return None
+        return (
+            fields["user_id"],
+            fields["action_key"],
+            [UUID(node_id) for node_id in json.loads(fields["selected_node_ids"])],
+        )
+
+    @staticmethod
+    def _to_job(job_id: UUID | str, fields: dict[str, str]) -> Job:
+        return Job(
+            id=job_id,
+            status=fields["status"],
+            action_key=fields["action_key"],
+            selected_node_ids=json.loads(fields["selected_node_ids"]),
+            created_at=fields["created_at"],
+            updated_at=fields["updated_at"],
+            error=fields.get("error"),
+        )
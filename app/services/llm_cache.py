@@ -0,0 +1,145 @@
+# app/services/llm_cache.py
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable
+from uuid import uuid4
+import redis.asyncio as redis
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+class _LeaderCancelled(Exception):
+    """Set on the shared future when the generating caller is cancelled; waiters retry."""
+
+class LLMResponseCache:
+    """
+    Exact-match cache for LLM responses, keyed by a hash of the model and the fully rendered
+    prompt. Identical concurrent requests share one upstream call: in-process through a shared
+    future, across workers through a Redis lease that the other workers poll behind.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int | None = None,
+        lease_seconds: int | None = None,
+        poll_interval: float = 0.25,
+        enabled: bool | None = None,
+        redis_client_factory: Callable[[], redis.Redis] = get_redis_client,
+    ):
+        self.ttl_seconds = ttl_seconds or settings.LLM_CACHE_TTL_SECONDS
+        self.lease_seconds = lease_seconds or settings.LLM_CACHE_LEASE_SECONDS
+        self.poll_interval = poll_interval
+        self.enabled = settings.LLM_CACHE_ENABLED if enabled is None else enabled
+        self._redis_client_factory = redis_client_factory
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        digest = hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+        return f"llm:response:{digest}"
+
+    async def get_or_generate(self, model: str, prompt: str, generate: Callable[[], Awaitable[str]]) -> str:
+        """Returns the cached response for this prompt, or generates (and caches) it exactly once."""
+        if not self.enabled:
+            return await generate()
+
+        key = self.make_key(model, prompt)
+        while (inflight := self._inflight.get(key)) is not None:
+            metrics.increment("llm_cache.coalesced_local")
+            try:
+                return await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                # The caller generating this response went away; this request was not
+                # cancelled, so take over (or join whoever already has).
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception as retrieved when no duplicate caller is waiting on it.
+        future.add_done_callback(lambda f: f.exception())
+        self._inflight[key] = future
+        try:
+            result = await self._get_or_generate_shared(key, generate)
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def invalidate(self, model: str, prompt: str) -> None:
+        """Drops a cached response, e.g. one that turned out not to parse."""
+        try:
+            await self._redis_client_factory().delete(self.make_key(model, prompt))
+        except Exception as exc:
+            logger.warning("Failed to invalidate LLM cache entry: %s", exc)
+
+    @staticmethod
+    def stats() -> dict[str, float]:
+        return metrics.snapshot("llm_cache.")
+
+    async def _get_or_generate_shared(self, key: str, generate: Callable[[], Awaitable[str]]) -> str:
+        try:
+            redis_client = self._redis_client_factory()
+            cached = await redis_client.get(key)
+        except Exception as exc:
+            logger.warning("LLM cache unavailable, calling the model directly: %s", exc)
+            metrics.increment("llm_cache.errors")
+            return await generate()
+
+        if cached:
+            metrics.increment("llm_cache.hits")
+            return cached
+
+        lease_key = f"{key}:lease"
+        token = uuid4().hex
+        try:
+            cached = await self._acquire_lease(redis_client, key, lease_key, token)
+        except Exception as exc:
+            logger.warning("LLM cache lease unavailable, calling the model directly: %s", exc)
+            metrics.increment("llm_cache.errors")
+            return await generate()
+        if cached:
+            metrics.increment("llm_cache.hits")
+            return cached
+
+        metrics.increment("llm_cache.misses")
+        try:
+            result = await generate()
+            if result:
+                try:
+                    await redis_client.set(key, result, ex=self.ttl_seconds)
+                except Exception as exc:
+                    # The response is still good; only later requests lose the cache hit.
+                    logger.warning("Failed to cache LLM response: %s", exc)
+                    metrics.increment("llm_cache.errors")
+            return result
+        finally:
+            try:
+                if await redis_client.get(lease_key) == token:
+                    await redis_client.delete(lease_key)
+            except Exception as exc:
+                logger.warning("Failed to release LLM cache lease %s: %s", lease_key, exc)
+
+    async def _acquire_lease(self, redis_client: redis.Redis, key: str, lease_key: str, token: str) -> str | None:
+        """Takes the lease to generate `key`, or returns the response another worker generated."""
+        while True:
+            if await redis_client.set(lease_key, token, nx=True, ex=self.lease_seconds):
+                return None
+            # Another worker is generating this response; wait for it or for its lease to lapse.
+            metrics.increment("llm_cache.coalesced_remote")
+            while await redis_client.exists(lease_key):
+                await asyncio.sleep(self.poll_interval)
+                cached = await redis_client.get(key)
+                if cached:
+                    return cached
+            cached = await redis_client.get(key)
+            if cached:
+                return cached
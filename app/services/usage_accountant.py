@@ -0,0 +1,106 @@
+# app/services/usage_accountant.py
+import logging
+import math
+import time
+from typing import Any, Callable
+import redis.asyncio as redis
+from app.core.config import settings
+from app.core.exceptions import QuotaExceededException
+from app.core.metrics import metrics
+from app.core.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+class UsageAccountant:
+    """
+    Charges each user's work in cost units against a rolling budget kept in Redis, so users
+    are throttled by how expensive their requests are rather than how many they make.
+
+    One unit is one Gemini prompt token or one row read from Neo4j. Response tokens cost
+    USAGE_RESPONSE_TOKEN_COST units and each embedding USAGE_EMBEDDING_COST units.
+    Usage is summed over `buckets` slices of the window. Work is charged after it is done,
+    so one request may overshoot the budget; `check` then refuses the user's next expensive
+    request until enough usage has aged out of the window.
+    Redis errors are logged and never block a request.
+    """
+
+    def __init__(
+        self,
+        budget: int | None = None,
+        window_seconds: int | None = None,
+        buckets: int = 12,
+        redis_client_factory: Callable[[], redis.Redis] = get_redis_client,
+    ):
+        self.budget = budget or settings.USAGE_BUDGET_UNITS
+        self.window_seconds = window_seconds or settings.USAGE_WINDOW_SECONDS
+        self.bucket_seconds = max(1, self.window_seconds // buckets)
+        self._redis_client_factory = redis_client_factory
+
+    def _bucket_key(self, user_id: str, bucket: int) -> str:
+        return f"usage:{user_id}:{bucket}"
+
+    def _window_buckets(self, now: float) -> list[int]:
+        current = int(now // self.bucket_seconds)
+        count = math.ceil(self.window_seconds / self.bucket_seconds)
+        return list(range(current - count + 1, current + 1))
+
+    async def check(self, user_id: str) -> None:
+        """Raises QuotaExceededException when the user's rolling usage has reached the budget."""
+        now = time.time()
+        buckets = self._window_buckets(now)
+        try:
+            values = await self._redis_client_factory().mget(
+                [self._bucket_key(user_id, bucket) for bucket in buckets]
+            )
+        except Exception as exc:
+            metrics.increment("usage.errors")
+            logger.warning("Usage lookup failed for %s: %s", user_id, exc)
+            return
+
+        usage = [int(value or 0) for value in values]
+        remaining = sum(usage)
+        if remaining < self.budget:
+            return
+        # The oldest buckets leave the window first; wait until enough of them have.
+        retry_after = self.window_seconds
+        for bucket, units in zip(buckets, usage):
+            remaining -= units
+            if remaining < self.budget:
+                retry_after = (bucket + len(buckets)) * self.bucket_seconds - now
+                break
+        metrics.increment("usage.throttled")
+        raise QuotaExceededException(
+            "Usage budget exhausted for this window. Please retry later.",
+            retry_after=max(1, math.ceil(retry_after)),
+        )
+
+    async def charge(self, user_id: str, kind: str, units: float) -> None:
+        units = math.ceil(units)
+        if units <= 0:
+            return
+        metrics.increment(f"usage.units.{kind}", units)
+        key = self._bucket_key(user_id, self._window_buckets(time.time())[-1])
+        try:
+            async with self._redis_client_factory().pipeline(transaction=False) as pipe:
+                pipe.incrby(key, units)
+                pipe.expire(key, self.window_seconds + self.bucket_seconds)
+                await pipe.execute()
+        except Exception as exc:
+            metrics.increment("usage.errors")
+            logger.warning("Failed to record %s %s units for %s: %s", units, kind, user_id, exc)
+
+    async def charge_tokens(self, user_id: str, usage_metadata: Any) -> None:
+        """Charges the prompt and response token counts from a Gemini response's usage metadata."""
+        if usage_metadata is None:
+            return
+        prompt_tokens = getattr(usage_metadata, "prompt_token_count", None) or 0
+        response_tokens = getattr(usage_metadata, "candidates_token_count", None) or 0
+        await self.charge(
+            user_id, "tokens", prompt_tokens + response_tokens * settings.USAGE_RESPONSE_TOKEN_COST
+        )
+
+    async def charge_embeddings(self, user_id: str, count: int) -> None:
+        await self.charge(user_id, "embeddings", count * settings.USAGE_EMBEDDING_COST)
+
+    async def charge_rows(self, user_id: str, count: int) -> None:
+        await self.charge(user_id, "rows", count)
@@ -0,0 +1,36 @@
+# app/services/vector_codec.py
+import base64
+import numpy as np
+from app.models.graph import EncodedVector, VectorEncoding
+
+_INT8_MAX = 127
+
+
+def encode_vector(values: list[float], encoding: VectorEncoding) -> EncodedVector:
+    """Packs an embedding into little-endian float32 or symmetric int8 bytes, base64-encoded."""
+    array = np.asarray(values, dtype="<f4")
+    if encoding == VectorEncoding.FLOAT32:
+        return EncodedVector(
+            encoding=encoding,
+            dimensions=array.size,
+            data=base64.b64encode(array.tobytes()).decode("ascii"),
+        )
+
+    max_abs = float(np.max(np.abs(array))) if array.size else 0.0
+    scale = max_abs / _INT8_MAX if max_abs > 0 else 1.0
+    quantized = np.clip(np.rint(array / scale), -_INT8_MAX, _INT8_MAX).astype(np.int8)
+    return EncodedVector(
+        encoding=encoding,
+        dimensions=array.size,
+        data=base64.b64encode(quantized.tobytes()).decode("ascii"),
+        scale=scale,
+    )
+
+
+def decode_vector(encoded: EncodedVector) -> list[float]:
+    """Inverse of `encode_vector`; int8 payloads come back as their dequantized approximation."""
+    raw = base64.b64decode(encoded.data)
+    if encoded.encoding == VectorEncoding.FLOAT32:
+        return np.frombuffer(raw, dtype="<f4").tolist()
+    quantized = np.frombuffer(raw, dtype=np.int8).astype(np.float32)
+    return (quantized * (encoded.scale or 1.0)).tolist()
@@ -0,0 +1,250 @@
+# app/services/vector_index.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+import numpy as np
+from app.core.metrics import metrics
+from app.db.repositories.graph_repository import centroid_vector
+from app.models.graph import Node
+
+logger = logging.getLogger(__name__)
+
+class WorkspaceVectors:
+    """
+    One user's embeddings as a contiguous float32 matrix with pre-computed row norms.
+    Rows are appended into spare capacity and removed by moving the last row into the gap.
+    """
+
+    def __init__(self, nodes: list[Node]):
+        nodes = [node for node in nodes if node.embedding]
+        dimensions = len(nodes[0].embedding) if nodes else 0
+        self._matrix = np.zeros((max(len(nodes), 16), dimensions), dtype=np.float32)
+        self._norms = np.zeros(self._matrix.shape[0], dtype=np.float32)
+        self._nodes: list[Node] = []
+        self._rows: dict[str, int] = {}
+        self.loaded_at = time.monotonic()
+        # Graph cache version the snapshot was read at; None when it could not be read.
+        self.version: int | None = None
+        self.upsert(nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes + self._norms.nbytes
+
+    def upsert(self, nodes: list[Node]) -> None:
+        for node in nodes:
+            node_id = str(node.id)
+            row = self._rows.get(node_id)
+            if row is not None:
+                if node.embedding:
+                    self._set_row(row, node.embedding)
+                self._nodes[row] = self._metadata(node, self._nodes[row])
+            elif node.embedding:
+                self._append(node)
+
+    def remove(self, node_ids: list[str]) -> None:
+        for node_id in node_ids:
+            row = self._rows.pop(node_id, None)
+            if row is None:
+                continue
+            last = len(self._nodes) - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._norms[row] = self._norms[last]
+                self._nodes[row] = self._nodes[last]
+                self._rows[str(self._nodes[row].id)] = row
+            self._nodes.pop()
+
+    def search(
+        self, query_vectors: list[list[float]], excluded_ids: set[str], threshold: float, limit: int
+    ) -> list[Node]:
+        """Top-`limit` nodes by their best cosine score against any query vector."""
+        count = len(self._nodes)
+        if not count or not query_vectors or limit <= 0:
+            return []
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = (self._matrix[:count] @ queries.T).max(axis=1) / np.maximum(self._norms[:count], 1e-12)
+        for node_id in excluded_ids:
+            row = self._rows.get(node_id)
+            if row is not None:
+                scores[row] = -np.inf
+
+        eligible = np.flatnonzero(scores >= threshold)
+        if len(eligible) > limit:
+            eligible = eligible[np.argpartition(-scores[eligible], limit - 1)[:limit]]
+        ranked = eligible[np.argsort(-scores[eligible], kind="stable")]
+        return [
+            self._nodes[row].model_copy(update={"embedding": self._matrix[row].tolist()}) for row in ranked
+        ]
+
+    def _append(self, node: Node) -> None:
+        if self._matrix.shape[1] == 0:
+            self._matrix = np.zeros((self._matrix.shape[0], len(node.embedding)), dtype=np.float32)
+        row = len(self._nodes)
+        if row == self._matrix.shape[0]:
+            self._matrix = np.concatenate([self._matrix, np.zeros_like(self._matrix)])
+            self._norms = np.concatenate([self._norms, np.zeros_like(self._norms)])
+        self._set_row(row, node.embedding)
+        self._nodes.append(self._metadata(node))
+        self._rows[str(node.id)] = row
+
+    def _set_row(self, row: int, embedding: list[float]) -> None:
+        self._matrix[row] = embedding
+        self._norms[row] = np.linalg.norm(self._matrix[row])
+
+    @staticmethod
+    def _metadata(node: Node, previous: Node | None = None) -> Node:
+        # The matrix holds the vector; keep only the fields needed to build prompt context.
+        return Node(
+            id=node.id,
+            name=node.name or (previous.name if previous else ""),
+            description=node.description or (previous.description if previous else ""),
+            userId=node.userId or (previous.userId if previous else None),
+        )
+
+class InMemoryVectorIndex:
+    """
+    Per-workspace vector indexes held in process memory, as an alternative to the shared
+    Neo4j vector index. Workspaces are loaded on first search and evicted least-recently-used
+    once their matrices exceed `max_bytes`. GraphService keeps loaded workspaces current
+    through `upsert`, `remove` and `drop`, then `advance`s them to the version its write
+    produced. Before each search the workspace's version is compared with `version_source`
+    (the graph cache counter every process bumps on write) and a workspace another process
+    has written to is reloaded. Without a version, workspaces are refreshed after `ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Awaitable[list[Node]]],
+        max_bytes: int,
+        ttl_seconds: float,
+        version_source: Callable[[str], Awaitable[int | None]] | None = None,
+    ):
+        self._loader = loader
+        self._version_source = version_source
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._workspaces: OrderedDict[str, WorkspaceVectors] = OrderedDict()
+        self._loading: dict[str, asyncio.Future] = {}
+        # Writes seen per workspace while it is being loaded.
+        self._writes_while_loading: dict[str, int] = {}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(workspace.nbytes for workspace in self._workspaces.values())
+
+    async def search(
+        self,
+        user_id: str,
+        query_vectors: list[list[float]],
+        excluded_ids: list[str],
+        threshold: float,
+        limit: int,
+        use_centroid: bool = False,
+    ) -> list[Node] | None:
+        """
+        Returns the best matches in the user's workspace, or None when the workspace does not
+        fit in the memory budget and the caller should fall back to the Neo4j index.
+        """
+        workspace = await self._get_workspace(user_id)
+        if workspace is None:
+            metrics.increment("vector_index.fallbacks")
+            return None
+        if use_centroid and len(query_vectors) > 1:
+            query_vectors = [centroid_vector(query_vectors)]
+        metrics.increment("vector_index.searches")
+        return workspace.search(query_vectors, set(excluded_ids), threshold, limit)
+
+    def upsert(self, user_id: str, nodes: list[Node]) -> None:
+        self._record_write(user_id)
+        workspace = self._workspaces.get(user_id)
+        if workspace is not None:
+            workspace.upsert(nodes)
+            self._evict()
+
+    def remove(self, user_id: str, node_ids: list[str]) -> None:
+        self._record_write(user_id)
+        workspace = self._workspaces.get(user_id)
+        if workspace is not None:
+            workspace.remove([str(node_id) for node_id in node_ids])
+
+    def drop(self, user_id: str) -> None:
+        self._record_write(user_id)
+        self._workspaces.pop(user_id, None)
+
+    def advance(self, user_id: str, version: int) -> None:
+        """
+        Marks the workspace current at `version` after this process applied the write that
+        produced it. Skipped when another write came in between, so the next search reloads.
+        """
+        workspace = self._workspaces.get(user_id)
+        if workspace is not None and workspace.version == version - 1:
+            workspace.version = version
+
+    async def _get_workspace(self, user_id: str) -> WorkspaceVectors | None:
+        version = await self._version_source(user_id) if self._version_source else None
+        workspace = self._workspaces.get(user_id)
+        if workspace is not None and self._is_current(workspace, version):
+            self._workspaces.move_to_end(user_id)
+            metrics.increment("vector_index.hits")
+            return workspace
+
+        future = self._loading.get(user_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._loading[user_id] = future
+            try:
+                future.set_result(await self._load(user_id, version))
+            except BaseException as exc:
+                future.set_exception(exc)
+                # Mark the exception as retrieved when nobody else is waiting on it.
+                future.exception()
+                raise
+            finally:
+                self._loading.pop(user_id, None)
+        return await asyncio.shield(future)
+
+    def _is_current(self, workspace: WorkspaceVectors, version: int | None) -> bool:
+        if version is None:
+            return time.monotonic() - workspace.loaded_at < self.ttl_seconds
+        if workspace.version != version:
+            metrics.increment("vector_index.stale")
+            return False
+        return True
+
+    async def _load(self, user_id: str, version: int | None) -> WorkspaceVectors | None:
+        # `version` was read before the snapshot, so a write racing the load only makes it look stale.
+        self._writes_while_loading[user_id] = 0
+        try:
+            workspace = WorkspaceVectors(await self._loader(user_id))
+        finally:
+            writes = self._writes_while_loading.pop(user_id, 0)
+        workspace.version = version
+        metrics.increment("vector_index.loads")
+        if workspace.nbytes > self.max_bytes:
+            logger.info("Workspace %s needs %s bytes, over the vector index budget.", user_id, workspace.nbytes)
+            self._workspaces.pop(user_id, None)
+            return None
+        # A write that landed while loading may be missing from the snapshot: use it for
+        # this search only and load again next time.
+        if not writes:
+            self._workspaces[user_id] = workspace
+            self._workspaces.move_to_end(user_id)
+            self._evict()
+        return workspace
+
+    def _record_write(self, user_id: str) -> None:
+        if user_id in self._writes_while_loading:
+            self._writes_while_loading[user_id] += 1
+
+    def _evict(self) -> None:
+        while self._workspaces and self.nbytes > self.max_bytes:
+            user_id, _ = self._workspaces.popitem(last=False)
+            metrics.increment("vector_index.evictions")
+            logger.debug("Evicted vector index for workspace %s.", user_id)
@@ -0,0 +1,108 @@
+# app/worker.py
+# Worker process for queued AI actions. Run with `python -m app.worker`; scale by starting
+# more processes (each runs JOB_WORKER_CONCURRENCY jobs at a time).
+import asyncio
+import logging
+import signal
+from app.core.config import settings
+from app.core.exceptions import NodeNotFoundException, QuotaExceededException, ServiceOverloadedException
+from app.core.http_client import HttpClient
+from app.core.redis_client import RedisClient
+from app.db.driver import Neo4jDriver
+from app.services.container import ServiceContainer
+from app.services.graph_service import GraphService
+from app.services.job_queue import JobQueue
+
+logger = logging.getLogger(__name__)
+
+EMPTY_RESULT_ERROR = "AI failed to generate a valid graph modification."
+
+async def process_job(job_id: str, queue: JobQueue, service: GraphService) -> None:
+    request = await queue.get_request(job_id)
+    if request is None:
+        logger.warning("Job %s expired before it could be processed.", job_id)
+        return
+    user_id, action_key, selected_node_ids = request
+
+    executed = await queue.get_result(job_id)
+    if executed is not None:
+        # The action already ran, but marking the job complete failed; finish it without
+        # writing a second copy of the nodes.
+        await queue.complete(job_id, executed)
+        return
+
+    try:
+        graph = await service.execute_ai_action(action_key, selected_node_ids, user_id)
+    except (NodeNotFoundException, QuotaExceededException) as e:
+        await queue.fail(job_id, e.message)
+        return
+    except ServiceOverloadedException as e:
+        logger.info("AI capacity exhausted; requeueing job %s in %ss.", job_id, e.retry_after)
+        await asyncio.sleep(e.retry_after)
+        await queue.requeue(job_id)
+        return
+    except Exception:
+        logger.exception("Job %s failed.", job_id)
+        await queue.fail(job_id, "An unexpected error occurred while executing the action.")
+        return
+
+    if not graph.nodes and not graph.edges:
+        await queue.fail(job_id, EMPTY_RESULT_ERROR)
+        return
+    # Saved on its own first, so a job requeued after a failed `complete` is not run again.
+    await queue.save_result(job_id, graph)
+    await queue.complete(job_id, graph)
+
+async def _worker_loop(queue: JobQueue, service: GraphService, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            job_id = await queue.claim(timeout=1)
+        except Exception as exc:
+            logger.error("Failed to claim a job: %s", exc)
+            await asyncio.sleep(1)
+            continue
+        if job_id is None:
+            continue
+        try:
+            await process_job(job_id, queue, service)
+        except Exception:
+            # Most likely Redis failing while recording the outcome; one job must not
+            # take down every worker loop in the process.
+            logger.exception("Failed to process job %s.", job_id)
+
+async def _reaper_loop(queue: JobQueue, stop: asyncio.Event) -> None:
+    """Returns jobs claimed by crashed workers to the queue."""
+    while not stop.is_set():
+        try:
+            await queue.requeue_stale()
+        except Exception as exc:
+            logger.error("Failed to requeue stale jobs: %s", exc)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.JOB_REAPER_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+async def run_worker(concurrency: int) -> None:
+    container = await ServiceContainer.create()
+    queue = container.job_queue
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("AI action worker started with %s concurrent slots.", concurrency)
+    try:
+        await asyncio.gather(
+            _reaper_loop(queue, stop),
+            *[_worker_loop(queue, container.graph_service, stop) for _ in range(concurrency)],
+        )
+    finally:
+        await container.close()
+        await Neo4jDriver.close_driver()
+        await RedisClient.close_client()
+        await HttpClient.close_client()
+        logger.info("AI action worker stopped.")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker(settings.JOB_WORKER_CONCURRENCY))
@@ -0,0 +1,105 @@
+"""
+Benchmark: CPU time and bytes on the wire for serializing a `Graph` response.
+
+Compares FastAPI's default path (jsonable_encoder + json.dumps, as JSONResponse does for a
+response_model), orjson over model_dump(), and the encoders app/api/serialization.py uses
+(pydantic-core's model_dump_json for JSON, MessagePack), each with identity, gzip and
+brotli content coding. Graphs are built from the `Graph` model with about 1.5 edges
+per node.
+
+    python benchmarks/bench_graph_serialization.py [--sizes 1000 10000 100000] [--repeat 3]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import orjson  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from app.api import serialization  # noqa: E402
+from app.models.graph import Edge, Graph, Node  # noqa: E402
+
+WORDS = "graph concept theory network vector memory learning model signal system data".split()
+
+
+def build_graph(size: int, seed: int = 7) -> Graph:
+    rng = random.Random(seed)
+    nodes = [
+        Node(
+            name=" ".join(rng.choices(WORDS, k=2)).title(),
+            description=" ".join(rng.choices(WORDS, k=rng.randint(8, 20))).capitalize() + ".",
+            userId="bench-user",
+        )
+        for _ in range(size)
+    ]
+    edges = [
+        Edge(source_id=rng.choice(nodes).id, target_id=rng.choice(nodes).id, label=rng.choice(["RELATES_TO", "PART_OF"]))
+        for _ in range(size * 3 // 2)
+    ]
+    return Graph(nodes=nodes, edges=edges, revision=1)
+
+
+def fastapi_default(graph: Graph) -> bytes:
+    content = jsonable_encoder(graph)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def orjson_json(graph: Graph) -> bytes:
+    return orjson.dumps(graph.model_dump())
+
+
+def response_json(graph: Graph) -> bytes:
+    return serialization.serialize(graph, serialization.JSON_MEDIA_TYPE)
+
+
+def msgpack_body(graph: Graph) -> bytes:
+    return serialization.serialize(graph, serialization.MSGPACK_MEDIA_TYPES[0])
+
+
+def measure(func, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.process_time()
+        result = func()
+        best = min(best, time.process_time() - started)
+    return best, result
+
+
+def run(sizes: list[int], repeat: int) -> None:
+    serializers = {
+        "fastapi default": fastapi_default,
+        "orjson": orjson_json,
+        "model_dump_json": response_json,
+    }
+    if serialization.msgpack is not None:
+        serializers["msgpack"] = msgpack_body
+    encodings = ["identity", "gzip"] + (["br"] if serialization.brotli is not None else [])
+
+    print(f"{'nodes':>7}  {'serializer':<16} {'encoding':<9} {'cpu ms':>9} {'bytes':>12}")
+    for size in sizes:
+        graph = build_graph(size)
+        for name, serializer in serializers.items():
+            serialize_seconds, body = measure(lambda: serializer(graph), repeat)
+            for encoding in encodings:
+                compress_seconds, wire = measure(lambda: serialization.compress(body, encoding), repeat)
+                total_ms = (serialize_seconds + compress_seconds) * 1000
+                print(f"{size:>7}  {name:<16} {encoding:<9} {total_ms:>9.1f} {len(wire):>12,}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
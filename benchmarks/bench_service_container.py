@@ -0,0 +1,114 @@
+"""
+Microbenchmark: per-request overhead of building GraphService (plus EmbeddingService,
+AIService and a genai.Client) on every call versus resolving it from the
+application-scoped ServiceContainer.
+
+Runs `GET /nodes/{id}` through FastAPI's TestClient with the repository stubbed out, so
+the numbers isolate dependency resolution and service construction.
+
+    python benchmarks/bench_service_container.py [--requests 2000]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("NEO4J_URI", "bolt://localhost:7687")
+os.environ.setdefault("NEO4J_USER", "neo4j")
+os.environ.setdefault("NEO4J_PASSWORD", "bench")
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:6379/0")
+os.environ.setdefault("GEMINI_API_KEY", "bench-key")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.api import router as router_module  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.limiter import limiter  # noqa: E402
+from app.core.redis_client import RedisClient  # noqa: E402
+from app.db.repositories.graph_repository import GraphRepository  # noqa: E402
+from app.models.graph import Node  # noqa: E402
+from app.services.ai_service import AIService  # noqa: E402
+from app.services.container import ServiceContainer  # noqa: E402
+from app.services.embedding_service import EmbeddingService  # noqa: E402
+from app.services.graph_service import GraphService  # noqa: E402
+from app.services.job_queue import JobQueue  # noqa: E402
+from app.services.prompt_service import PromptService  # noqa: E402
+
+NODE = Node(name="Benchmark", description="A node returned by the stubbed repository.")
+
+
+async def _stub_get_node_by_id(self, node_id, user_id, include_embedding=False):
+    return NODE.model_copy()
+
+
+def build_app(per_request: bool) -> FastAPI:
+    app = FastAPI()
+    app.include_router(router_module.router)
+    prompt_service = PromptService()
+    driver = object()
+    if per_request:
+        # The pre-container wiring: a fresh service graph for every request.
+        def legacy_get_service() -> GraphService:
+            return GraphService(driver, prompt_service)
+        app.dependency_overrides[router_module.get_service] = legacy_get_service
+    else:
+        embedding_service = EmbeddingService(api_key=settings.GEMINI_API_KEY)
+        ai_service = AIService(api_key=settings.GEMINI_API_KEY, prompt_service=prompt_service)
+        app.state.container = ServiceContainer(
+            driver=driver,
+            prompt_service=prompt_service,
+            embedding_service=embedding_service,
+            ai_service=ai_service,
+            graph_service=GraphService(
+                driver, prompt_service, embedding_service=embedding_service, ai_service=ai_service
+            ),
+            job_queue=JobQueue(RedisClient.get_client()),
+        )
+    return app
+
+
+def run(per_request: bool, requests: int) -> float:
+    client = TestClient(build_app(per_request))
+    url = f"/nodes/{uuid4()}"
+    headers = {"X-User-ID": "bench-user"}
+    for _ in range(50):
+        client.get(url, headers=headers)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - start) / requests
+
+
+def construction_cost(iterations: int) -> float:
+    prompt_service = PromptService()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        GraphService(object(), prompt_service)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    limiter.enabled = False
+    GraphRepository.get_node_by_id = _stub_get_node_by_id
+
+    build_only = construction_cost(args.requests)
+    per_request = run(per_request=True, requests=args.requests)
+    container = run(per_request=False, requests=args.requests)
+
+    print(f"GraphService construction alone: {build_only * 1e6:9.1f} us")
+    print(f"GET /nodes/{{id}}, per-request:    {per_request * 1e6:9.1f} us/request")
+    print(f"GET /nodes/{{id}}, container:      {container * 1e6:9.1f} us/request")
+    print(f"Overhead removed:                {(per_request - container) * 1e6:9.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Simulation: per-tenant recall and latency of vector search over a shared index as the
+number of tenants grows.
+
+Every tenant owns the same number of nodes drawn from shared topic clusters, so other
+tenants' nodes compete for the global top-k exactly as they do in the shared
+`concept_embeddings` index. Exact numpy top-k stands in for the HNSW lookup. Three
+strategies are compared against the tenant's true above-threshold neighbours:
+
+* post-filter  - one lookup with k = limit, then the userId filter (the old query)
+* widening     - GraphRepository._search_vector_index (adaptive over-fetch)
+* per-tenant   - search restricted to the tenant's own vectors (the lower bound)
+
+    python benchmarks/bench_tenant_vector_search.py [--nodes-per-tenant 200] [--queries 50]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.rag_config import SIMILARITY_THRESHOLD  # noqa: E402
+from app.db.repositories.graph_repository import GraphRepository  # noqa: E402
+
+DIMENSIONS = 64
+TOPICS = 32
+LIMIT = 20
+
+
+class NumpyIndexTransaction:
+    """Answers the repository's vector search query from an in-memory matrix."""
+
+    def __init__(self, vectors, owners):
+        self.vectors = vectors
+        self.owners = owners
+        self.raw_hits = 0
+
+    async def run(self, query, parameters=None, **kwargs):
+        k = min(parameters["k"], len(self.vectors))
+        rows = []
+        for index, query_vector in enumerate(parameters["query_vectors"]):
+            scores = self.vectors @ np.asarray(query_vector, dtype=np.float32)
+            top = np.argpartition(-scores, k - 1)[:k]
+            self.raw_hits += k
+            matches = [
+                {"node": {"id": int(i)}, "score": float(scores[i])}
+                for i in top
+                if scores[i] >= parameters["threshold"] and self.owners[i] == parameters["userId"]
+                and int(i) not in parameters["excluded_ids"]
+            ]
+            rows.append({
+                "vector_index": index,
+                "raw_hits": k,
+                "min_score": float(scores[top].min()),
+                "matches": matches,
+            })
+        return Rows(rows)
+
+
+class Rows:
+    def __init__(self, rows):
+        self.rows = iter(rows)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+def build_index(tenants, nodes_per_tenant, rng):
+    centers = rng.standard_normal((TOPICS, DIMENSIONS)).astype(np.float32)
+    topics = rng.integers(0, TOPICS, tenants * nodes_per_tenant)
+    vectors = centers[topics] + 0.45 * rng.standard_normal((len(topics), DIMENSIONS)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    owners = np.repeat(np.arange(tenants), nodes_per_tenant)
+    return vectors, owners
+
+
+def true_neighbours(vectors, owners, tenant, query_index):
+    own = np.flatnonzero(owners == tenant)
+    scores = vectors[own] @ vectors[query_index]
+    ranked = own[np.argsort(-scores)]
+    return [int(i) for i in ranked if i != query_index and vectors[i] @ vectors[query_index] >= SIMILARITY_THRESHOLD][:LIMIT]
+
+
+def post_filter(vectors, owners, tenant, query_index):
+    scores = vectors @ vectors[query_index]
+    top = np.argpartition(-scores, LIMIT)[:LIMIT + 1]
+    return [
+        int(i) for i in top
+        if i != query_index and owners[i] == tenant and scores[i] >= SIMILARITY_THRESHOLD
+    ]
+
+
+def per_tenant(vectors, owners, tenant, query_index):
+    return true_neighbours(vectors, owners, tenant, query_index)
+
+
+def widening(tx, vectors, tenant, query_index):
+    found = asyncio.run(GraphRepository._search_vector_index(
+        tx, [vectors[query_index]], [query_index], tenant, SIMILARITY_THRESHOLD, LIMIT, include_embedding=False
+    ))
+    return [node["id"] for node in found]
+
+
+def recall(found, expected):
+    if not expected:
+        return 1.0
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def run(tenant_counts, nodes_per_tenant, queries, seed):
+    print(f"{'tenants':>8} {'nodes':>8}  {'strategy':<12} {'recall':>7} {'ms/query':>9} {'raw hits/q':>11}")
+    for tenants in tenant_counts:
+        rng = np.random.default_rng(seed)
+        vectors, owners = build_index(tenants, nodes_per_tenant, rng)
+        tx = NumpyIndexTransaction(vectors, owners)
+        samples = [(0, int(i)) for i in rng.choice(nodes_per_tenant, size=queries, replace=False)]
+        expected = [true_neighbours(vectors, owners, tenant, i) for tenant, i in samples]
+
+        strategies = {
+            "post-filter": lambda t, i: post_filter(vectors, owners, t, i),
+            "widening": lambda t, i: widening(tx, vectors, t, i),
+            "per-tenant": lambda t, i: per_tenant(vectors, owners, t, i),
+        }
+        for name, search in strategies.items():
+            tx.raw_hits = 0
+            started = time.perf_counter()
+            results = [search(tenant, i) for tenant, i in samples]
+            elapsed_ms = (time.perf_counter() - started) * 1000 / queries
+            mean_recall = np.mean([recall(found, exp) for found, exp in zip(results, expected)])
+            raw_hits = tx.raw_hits / queries if name == "widening" else (
+                LIMIT + 1 if name == "post-filter" else nodes_per_tenant
+            )
+            print(f"{tenants:>8} {len(vectors):>8}  {name:<12} {mean_recall:>7.3f} {elapsed_ms:>9.3f} {raw_hits:>11.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--nodes-per-tenant", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.tenants, args.nodes_per_tenant, args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
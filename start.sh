@@ -27,5 +27,11 @@ until redis-cli -h "$REDIS_HOST" -p "$REDIS_PORT" ping >/dev/null 2>&1; do
 done
 echo "Redis is ready."
 
+# Optionally run an AI action worker alongside the API (single-container deploys).
+if [[ "${RUN_JOB_WORKER:-false}" == "true" ]]; then
+    echo "Starting AI action worker in the background"
+    python -m app.worker &
+fi
+
 # Start the Uvicorn server in the foreground
 uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}"
@@ -1,7 +1,7 @@
 import pytest
 from json import JSONDecodeError
 
-from app.services.ai_response_parser import parse_ai_response_text
+from app.services.ai_response_parser import IncrementalGraphParser, parse_ai_response_text
 
 
 def test_parses_code_fenced_json():
@@ -39,3 +39,30 @@ def test_drops_thought_signature():
 def test_empty_payload_raises_json_error():
     with pytest.raises(JSONDecodeError):
         parse_ai_response_text("")
+
+
+def test_incremental_parser_emits_objects_as_they_close():
+    raw = (
+        '```json\n{"nodes": [{"name": "A {x}", "description": "Uses \\\\theta \\"quoted\\""},'
+        ' {"name": "B", "description": "b"}],'
+        ' "edges": [{"source": {"is_new": false, "index": 0}, "target": {"is_new": true, "index": 1}, "label": "rel"}]}\n```'
+    )
+    parser = IncrementalGraphParser()
+    events = []
+    first_node_end = raw.index("},") + 1
+    for position, char in enumerate(raw):
+        emitted = parser.feed(char)
+        if emitted and not events:
+            assert position == first_node_end - 1
+        events.extend(emitted)
+
+    assert [kind for kind, _ in events] == ["node", "node", "edge"]
+    assert events[0][1] == {"name": "A {x}", "description": 'Uses \\theta "quoted"'}
+    assert events[2][1]["target"] == {"is_new": True, "index": 1}
+    assert parser.text == raw
+
+
+def test_incremental_parser_ignores_other_arrays():
+    parser = IncrementalGraphParser()
+    events = parser.feed('{"notes": [{"a": 1}], "nodes": [{"name": "N", "description": "d"}]}')
+    assert events == [("node", {"name": "N", "description": "d"})]
@@ -0,0 +1,123 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.models.bulk import BulkItemStatus, BulkNodesRequest
+from app.models.graph import Edge, NodeCreate
+from app.services.graph_service import GraphService
+
+
+class StubRepository:
+    def __init__(self, known_ids=(), failing_calls=()):
+        self.known_ids = set(known_ids)
+        self.failing_calls = set(failing_calls)
+        self.calls = []
+
+    async def add_subgraph(self, nodes, edges, user_id):
+        self.calls.append((list(nodes), list(edges), user_id))
+        if len(self.calls) in self.failing_calls:
+            raise RuntimeError("write failed")
+        self.known_ids.update(node.id for node in nodes)
+        return {
+            index for index, edge in enumerate(edges)
+            if edge.source_id in self.known_ids and edge.target_id in self.known_ids
+        }
+
+
+class StubEmbeddingService:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def fetch_embedding(self, text):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        if "broken" in text:
+            raise RuntimeError("embedding failed")
+        return [0.1, 0.2], True
+
+
+class StubGraphCache:
+    def __init__(self):
+        self.invalidations = []
+
+    async def invalidate(self, user_id):
+        self.invalidations.append(user_id)
+
+
+def build_service(repo):
+    service = GraphService(
+        driver=None, embedding_service=StubEmbeddingService(), ai_service=object(), graph_cache=StubGraphCache()
+    )
+    service.repo = repo
+    return service
+
+
+@pytest.mark.asyncio
+async def test_bulk_nodes_are_written_in_chunks_with_per_item_results(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_WRITE_CHUNK_SIZE", 2)
+    repo = StubRepository()
+    service = build_service(repo)
+    nodes = [NodeCreate(name=f"Node {i}", description="broken" if i == 1 else "ok") for i in range(5)]
+
+    result = await service.create_nodes_bulk(nodes, "user-1")
+
+    assert [len(call[0]) for call in repo.calls] == [1, 2, 1]
+    assert result.created == 4 and result.failed == 1
+    assert [item.status for item in result.results] == [
+        BulkItemStatus.CREATED, BulkItemStatus.FAILED, BulkItemStatus.CREATED,
+        BulkItemStatus.CREATED, BulkItemStatus.CREATED,
+    ]
+    assert all(node.embedding == [0.1, 0.2] and node.userId == "user-1" for call in repo.calls for node in call[0])
+    assert service.graph_cache.invalidations == ["user-1"]
+    assert service.embedding_service.max_in_flight == 2
+
+
+@pytest.mark.asyncio
+async def test_a_failed_chunk_only_fails_its_own_items(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_WRITE_CHUNK_SIZE", 2)
+    repo = StubRepository(failing_calls={1})
+    service = build_service(repo)
+    nodes = [NodeCreate(name=f"Node {i}", description="ok") for i in range(3)]
+
+    result = await service.create_nodes_bulk(nodes, "user-1")
+
+    assert [item.status for item in result.results] == [
+        BulkItemStatus.FAILED, BulkItemStatus.FAILED, BulkItemStatus.CREATED,
+    ]
+    assert result.results[2].id is not None
+
+
+@pytest.mark.asyncio
+async def test_bulk_edges_report_missing_endpoints_as_not_found(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_WRITE_CHUNK_SIZE", 2)
+    a, b, c = uuid4(), uuid4(), uuid4()
+    repo = StubRepository(known_ids={a, b, c})
+    service = build_service(repo)
+    edges = [
+        Edge(source_id=a, target_id=b, label="rel"),
+        Edge(source_id=a, target_id=uuid4(), label="rel"),
+        Edge(source_id=b, target_id=c, label="rel"),
+    ]
+
+    result = await service.create_edges_bulk(edges, "user-1")
+
+    assert [item.status for item in result.results] == [
+        BulkItemStatus.CREATED, BulkItemStatus.NOT_FOUND, BulkItemStatus.CREATED,
+    ]
+    assert [item.index for item in result.results] == [0, 1, 2]
+    assert len(repo.calls) == 2
+
+
+def test_bulk_requests_are_capped_at_the_item_limit():
+    node = NodeCreate(name="Node", description="ok")
+
+    with pytest.raises(ValidationError):
+        BulkNodesRequest(nodes=[node] * (settings.BULK_MAX_ITEMS + 1))
+    with pytest.raises(ValidationError):
+        BulkNodesRequest(nodes=[])
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.core.bulkhead import Bulkhead
+from app.core.exceptions import ServiceOverloadedException
+
+
+async def wait_until(predicate):
+    for _ in range(100):
+        if predicate():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("condition not reached")
+
+
+def build_bulkhead(max_concurrent=1, max_queue=1, queue_timeout=5.0):
+    return Bulkhead(
+        name="test",
+        max_concurrent=max_concurrent,
+        max_queue=max_queue,
+        queue_timeout=queue_timeout,
+        retry_after=7,
+    )
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_slots_and_queue_are_full():
+    bulkhead = build_bulkhead()
+    release = asyncio.Event()
+
+    async def hold():
+        async with bulkhead.acquire():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await wait_until(lambda: bulkhead.active == 1)
+    queued = asyncio.create_task(hold())
+    await wait_until(lambda: bulkhead.waiting == 1)
+
+    assert bulkhead.active == 1
+    assert bulkhead.waiting == 1
+    with pytest.raises(ServiceOverloadedException) as exc:
+        async with bulkhead.acquire():
+            pass
+    assert exc.value.retry_after == 7
+
+    release.set()
+    await asyncio.gather(holder, queued)
+    assert bulkhead.active == 0
+    assert bulkhead.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_rejects_callers_that_wait_too_long():
+    bulkhead = build_bulkhead(queue_timeout=0.01)
+    release = asyncio.Event()
+
+    async def hold():
+        async with bulkhead.acquire():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await wait_until(lambda: bulkhead.active == 1)
+
+    with pytest.raises(ServiceOverloadedException):
+        async with bulkhead.acquire():
+            pass
+
+    release.set()
+    await holder
+    async with bulkhead.acquire():
+        assert bulkhead.active == 1
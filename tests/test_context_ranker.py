@@ -0,0 +1,52 @@
+from app.models.graph import Node
+from app.services.context_ranker import (
+    ContextCandidate,
+    estimate_tokens,
+    format_context_line,
+    select_context,
+)
+
+
+def node(name, embedding, description="d"):
+    return Node(name=name, description=description, embedding=embedding)
+
+
+def test_fills_budget_and_reports_dropped_context():
+    candidates = [ContextCandidate(node(f"N{i}", [1.0, float(i)])) for i in range(10)]
+    cost = estimate_tokens(format_context_line(candidates[0].node))
+
+    selection = select_context(candidates, [[1.0, 0.0]], token_budget=cost * 3, mmr_lambda=1.0, similarity_weight=1.0)
+
+    assert [n.name for n in selection.nodes] == ["N0", "N1", "N2"]
+    assert selection.used_tokens <= cost * 3
+    assert selection.dropped_count == 7
+    assert selection.dropped_tokens == selection.candidate_tokens - selection.used_tokens
+
+
+def test_prefers_diverse_candidates_over_near_duplicates():
+    best = node("Best", [1.0, 0.0, 0.0])
+    duplicate = node("Duplicate", [0.99, 0.01, 0.0])
+    distinct = node("Distinct", [0.6, 0.0, 0.8])
+    candidates = [ContextCandidate(n) for n in (best, duplicate, distinct)]
+    budget = sum(estimate_tokens(format_context_line(n)) for n in (best, distinct))
+
+    selection = select_context(candidates, [[1.0, 0.0, 0.0]], token_budget=budget, mmr_lambda=0.3, similarity_weight=1.0)
+
+    assert [n.name for n in selection.nodes] == ["Best", "Distinct"]
+
+
+def test_graph_neighbors_outrank_equally_similar_semantic_matches():
+    semantic = ContextCandidate(node("Semantic", [1.0, 0.0]))
+    neighbor = ContextCandidate(node("Neighbor", [1.0, 0.0]), graph_distance=1)
+    budget = estimate_tokens(format_context_line(neighbor.node))
+
+    selection = select_context([semantic, neighbor], [[1.0, 0.0]], token_budget=budget, mmr_lambda=0.7, similarity_weight=0.6)
+
+    assert [n.name for n in selection.nodes] == ["Neighbor"]
+
+
+def test_candidates_without_embeddings_are_still_eligible():
+    candidates = [ContextCandidate(node("NoVector", None), graph_distance=1)]
+    selection = select_context(candidates, [], token_budget=100, mmr_lambda=0.7, similarity_weight=0.6)
+    assert [n.name for n in selection.nodes] == ["NoVector"]
+    assert select_context([], [[1.0]], token_budget=100, mmr_lambda=0.7, similarity_weight=0.6).nodes == []
@@ -0,0 +1,79 @@
+import pytest
+
+from app.core.metrics import metrics
+from app.services.embedding_cache import EmbeddingCache
+
+
+class StubBinaryRedis:
+    def __init__(self):
+        self.store: dict[str, bytes] = {}
+        self.expiries: dict[str, int] = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+        self.expiries[key] = ex
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_key_is_content_addressed_per_model_and_dimensions():
+    key = EmbeddingCache.make_key("gemini-embedding-001", 768, "Concept Name: A")
+    assert key == EmbeddingCache.make_key("gemini-embedding-001", 768, "Concept Name: A")
+    assert key != EmbeddingCache.make_key("gemini-embedding-001", 256, "Concept Name: A")
+    assert key != EmbeddingCache.make_key("text-embedding-004", 768, "Concept Name: A")
+    assert key.startswith("embedding:gemini-embedding-001:768:")
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used_entry():
+    cache = EmbeddingCache(max_entries=2, redis_client_factory=None)
+    await cache.set("a", [1.0])
+    await cache.set("b", [2.0])
+    assert await cache.get("a") == [1.0]
+    await cache.set("c", [3.0])
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == [1.0]
+    assert await cache.get("c") == [3.0]
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_stores_float32_bytes_and_promotes_to_local():
+    redis_client = StubBinaryRedis()
+    writer = EmbeddingCache(max_entries=10, ttl_seconds=60, redis_client_factory=lambda: redis_client)
+    await writer.set("k", [0.5, -0.25])
+    assert redis_client.store["k"] == b"\x00\x00\x00?\x00\x00\x80\xbe"
+    assert redis_client.expiries["k"] == 60
+
+    reader = EmbeddingCache(max_entries=10, redis_client_factory=lambda: redis_client)
+    assert await reader.get("k") == [0.5, -0.25]
+    redis_client.store.clear()
+    assert await reader.get("k") == [0.5, -0.25]
+
+    assert EmbeddingCache.stats() == {
+        "embedding_cache.l1_hits": 1,
+        "embedding_cache.l2_hits": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_degrade_to_misses():
+    class BrokenRedis:
+        async def get(self, key):
+            raise ConnectionError("down")
+
+        async def set(self, key, value, ex=None):
+            raise ConnectionError("down")
+
+    cache = EmbeddingCache(max_entries=0, redis_client_factory=BrokenRedis)
+    await cache.set("k", [1.0])
+    assert await cache.get("k") is None
+    assert metrics.get("embedding_cache.misses") == 1
@@ -0,0 +1,173 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import embedding_service as embedding_service_module
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_service import EmbeddingService
+
+
+class StubResponse:
+    def __init__(self, texts):
+        self.texts = texts
+        self.text = ""
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return {"embeddings": [{"values": [float(len(text))]} for text in self.texts]}
+
+
+def local_cache(max_entries=0):
+    return EmbeddingCache(max_entries=max_entries, redis_client_factory=None)
+
+
+def build_service(monkeypatch, cache=None, **kwargs):
+    service = EmbeddingService(
+        api_key="test-key", batch_window_ms=5, cache=cache or local_cache(), **kwargs
+    )
+    calls = []
+
+    async def fake_request(texts):
+        calls.append(list(texts))
+        return StubResponse(texts)
+
+    monkeypatch.setattr(service, "_make_batch_request", fake_request)
+    return service, calls
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_batch_request(monkeypatch):
+    service, calls = build_service(monkeypatch)
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+
+    results = await asyncio.gather(*[service.get_embedding(text) for text in texts])
+
+    assert calls == [texts]
+    assert results == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+
+
+@pytest.mark.asyncio
+async def test_batches_are_capped_at_max_batch_size(monkeypatch):
+    service, calls = build_service(monkeypatch, max_batch_size=2)
+
+    results = await service.get_embeddings(["a", "bb", "ccc", "dddd", "eeeee"])
+
+    assert [len(call) for call in calls] == [2, 2, 1]
+    assert results == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+
+
+@pytest.mark.asyncio
+async def test_duplicate_texts_in_a_batch_are_sent_once(monkeypatch):
+    service, calls = build_service(monkeypatch)
+
+    results = await service.get_embeddings(["same", "same", "other"])
+
+    assert calls == [["same", "other"]]
+    assert results == [[4.0], [4.0], [5.0]]
+
+
+@pytest.mark.asyncio
+async def test_batch_failure_is_raised_to_every_caller(monkeypatch):
+    service = EmbeddingService(api_key="test-key", batch_window_ms=5, cache=local_cache())
+
+    async def failing_request(texts):
+        raise ValueError("boom")
+
+    monkeypatch.setattr(service, "_make_batch_request", failing_request)
+
+    results = await asyncio.gather(
+        service.get_embedding("a"), service.get_embedding("b"), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cached_texts_skip_the_api(monkeypatch):
+    service, calls = build_service(monkeypatch, cache=local_cache(max_entries=10))
+
+    first = await service.get_embedding("cached text")
+    second = await service.get_embedding("cached text")
+
+    assert calls == [["cached text"]]
+    assert first == second == [11.0]
+
+
+@pytest.mark.asyncio
+async def test_fetch_embedding_reports_cache_misses(monkeypatch):
+    service, calls = build_service(monkeypatch, cache=local_cache(max_entries=10))
+
+    assert await service.fetch_embedding("cached text") == ([11.0], True)
+    assert await service.fetch_embedding("cached text") == ([11.0], False)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_identical_texts_in_one_batch_count_as_one_api_embedding(monkeypatch):
+    service, calls = build_service(monkeypatch)
+
+    results = await asyncio.gather(service.fetch_embedding("same"), service.fetch_embedding("same"))
+
+    assert calls == [["same"]]
+    assert sorted(from_api for _, from_api in results) == [False, True]
+
+
+class SequencedHttpClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.posts = 0
+
+    async def post(self, url, headers=None, json=None, timeout=None):
+        self.posts += 1
+        outcome = self.responses.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome[0], json=outcome[1], request=httpx.Request("POST", url))
+
+
+@pytest.mark.asyncio
+async def test_retries_rate_limits_server_errors_and_transport_failures(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(embedding_service_module.asyncio, "sleep", fake_sleep)
+    http_client = SequencedHttpClient([
+        (429, {}),
+        httpx.ConnectTimeout("slow"),
+        (503, {}),
+        (200, {"embeddings": [{"values": [0.25]}]}),
+    ])
+    service = EmbeddingService(
+        api_key="test-key", cache=local_cache(), http_client_factory=lambda: http_client
+    )
+
+    assert await service.get_embedding("retry me") == [0.25]
+    assert http_client.posts == 4
+    assert len(sleeps) == 3
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries(monkeypatch):
+    async def fake_sleep(delay):
+        return None
+
+    monkeypatch.setattr(embedding_service_module.asyncio, "sleep", fake_sleep)
+    http_client = SequencedHttpClient([(500, {})] * 10)
+    service = EmbeddingService(
+        api_key="test-key", cache=local_cache(), http_client_factory=lambda: http_client
+    )
+    service.max_retries = 2
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await service.get_embedding("always failing")
+    assert http_client.posts == 3
+
+
+def test_retry_delay_honors_retry_after():
+    assert EmbeddingService._retry_delay(0, "3") >= 3
+    assert 0 <= EmbeddingService._retry_delay(10, None) <= 8
+    assert 0 <= EmbeddingService._retry_delay(0, "not-a-number") <= 0.5
@@ -0,0 +1,150 @@
+from uuid import uuid4
+
+import pytest
+
+from app.db.repositories.graph_repository import GraphRepository
+from app.models.graph import ExpansionContext
+
+
+def node_row(name, embedding=None, user_id="user-1"):
+    return {"id": str(uuid4()), "name": name, "description": name.lower(), "embedding": embedding, "userId": user_id}
+
+
+class ScriptedResult:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    async def single(self):
+        return self.rows[0] if self.rows else None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self.rows:
+            yield row
+
+
+class ExpansionTransaction:
+    """Answers the source/neighbor query with `context_row` and every vector search with `hits`."""
+
+    def __init__(self, context_row, hits=()):
+        self.context_row = context_row
+        self.hits = list(hits)
+        self.context_queries = []
+        self.vector_queries = []
+
+    async def run(self, query, parameters=None, **kwargs):
+        if "query_vectors" not in parameters:
+            self.context_queries.append((query, parameters))
+            return ScriptedResult([self.context_row] if self.context_row is not None else [])
+        self.vector_queries.append(parameters)
+        matches = [{"node": hit, "score": 0.9} for hit in self.hits]
+        return ScriptedResult([
+            {"vector_index": index, "raw_hits": len(matches), "min_score": 0.9, "matches": matches}
+            for index in range(len(parameters["query_vectors"]))
+        ])
+
+
+class ScriptedSession:
+    def __init__(self, tx):
+        self.tx = tx
+        self.reads = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute_read(self, func, *args, **kwargs):
+        self.reads += 1
+        return await func(self.tx, *args, **kwargs)
+
+
+class ScriptedDriver:
+    def __init__(self, tx):
+        self.session_ = ScriptedSession(tx)
+
+    def session(self, **kwargs):
+        return self.session_
+
+
+@pytest.mark.asyncio
+async def test_sources_neighbors_and_candidates_come_from_one_read_transaction():
+    a, b = node_row("A", [1.0, 0.0]), node_row("B", [0.0, 1.0])
+    neighbor, candidate = node_row("N", [0.5, 0.5]), node_row("C", [0.7, 0.7])
+    # The query returns sources in match order; the repository restores the requested order.
+    tx = ExpansionTransaction({"sources": [b, a], "neighbors": [neighbor]}, hits=[candidate])
+    driver = ScriptedDriver(tx)
+
+    context = await GraphRepository(driver).get_expansion_context(
+        [a["id"], b["id"]], "user-1", threshold=0.75, limit=5, max_neighbors=20
+    )
+
+    assert driver.session_.reads == 1
+    [(_, parameters)] = tx.context_queries
+    assert parameters == {"node_ids": [a["id"], b["id"]], "userId": "user-1", "max_neighbors": 20}
+    [search] = tx.vector_queries
+    assert search["query_vectors"] == [[0.0, 1.0], [1.0, 0.0]]
+    assert sorted(search["excluded_ids"]) == sorted([a["id"], b["id"], neighbor["id"]])
+    assert (search["userId"], search["threshold"], search["k"]) == ("user-1", 0.75, 5)
+
+    assert isinstance(context, ExpansionContext)
+    assert [n.name for n in context.source_nodes] == ["A", "B"]
+    assert [n.name for n in context.neighbors] == ["N"]
+    assert [n.name for n in context.semantic_nodes] == ["C"]
+    assert context.semantic_nodes[0].embedding == [0.7, 0.7]
+
+
+@pytest.mark.asyncio
+async def test_centroid_search_sends_one_vector():
+    a, b = node_row("A", [2.0, 0.0]), node_row("B", [0.0, 1.0])
+    tx = ExpansionTransaction({"sources": [a, b], "neighbors": []})
+
+    await GraphRepository(ScriptedDriver(tx)).get_expansion_context(
+        [a["id"], b["id"]], "user-1", 0.75, 5, use_centroid=True
+    )
+
+    [search] = tx.vector_queries
+    assert search["query_vectors"] == [pytest.approx([0.5, 0.5])]
+
+
+@pytest.mark.asyncio
+async def test_sources_without_neighbors_or_vector_hits_give_empty_lists():
+    a = node_row("A", [1.0, 0.0])
+    tx = ExpansionTransaction({"sources": [a], "neighbors": []}, hits=[])
+
+    context = await GraphRepository(ScriptedDriver(tx)).get_expansion_context([a["id"]], "user-1", 0.75, 5)
+
+    assert len(tx.vector_queries) == 1
+    assert [n.name for n in context.source_nodes] == ["A"]
+    assert (context.neighbors, context.semantic_nodes) == ([], [])
+
+
+@pytest.mark.asyncio
+async def test_vector_search_is_skipped_without_embeddings_or_when_not_requested():
+    unembedded = node_row("A")
+    embedded = node_row("B", [1.0, 0.0])
+    without_vectors = ExpansionTransaction({"sources": [unembedded], "neighbors": []})
+    not_requested = ExpansionTransaction({"sources": [embedded], "neighbors": []})
+
+    first = await GraphRepository(ScriptedDriver(without_vectors)).get_expansion_context(
+        [unembedded["id"]], "user-1", 0.75, 5
+    )
+    second = await GraphRepository(ScriptedDriver(not_requested)).get_expansion_context(
+        [embedded["id"]], "user-1", 0.75, 5, include_candidates=False
+    )
+
+    assert without_vectors.vector_queries == [] and not_requested.vector_queries == []
+    assert first.semantic_nodes == [] and second.semantic_nodes == []
+
+
+@pytest.mark.asyncio
+async def test_unknown_sources_give_an_empty_context():
+    tx = ExpansionTransaction(None)
+
+    context = await GraphRepository(ScriptedDriver(tx)).get_expansion_context([uuid4()], "user-1", 0.75, 5)
+
+    assert context == ExpansionContext(source_nodes=[], neighbors=[], semantic_nodes=[])
+    assert tx.vector_queries == []
@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from app.core.exceptions import ServiceOverloadedException
+from app.core.fair_scheduler import FairScheduler
+
+
+async def wait_until(predicate):
+    for _ in range(100):
+        if predicate():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError("condition not reached")
+
+
+def build_scheduler(max_concurrent=1, per_user_concurrency=1, per_user_queue=10, queue_timeout=5.0, weights=None):
+    return FairScheduler(
+        name="test",
+        max_concurrent=max_concurrent,
+        per_user_concurrency=per_user_concurrency,
+        per_user_queue=per_user_queue,
+        queue_timeout=queue_timeout,
+        retry_after=7,
+        weights=weights,
+    )
+
+
+class Recorder:
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.order = []
+        self.release = asyncio.Event()
+
+    async def run(self, user_id, label=None):
+        async with self.scheduler.acquire(user_id):
+            self.order.append(label or user_id)
+            await self.release.wait()
+
+
+@pytest.mark.asyncio
+async def test_queued_calls_alternate_between_users():
+    scheduler = build_scheduler()
+    recorder = Recorder(scheduler)
+    holder = asyncio.create_task(recorder.run("heavy", "holder"))
+    await wait_until(lambda: scheduler.active == 1)
+
+    heavy = [asyncio.create_task(recorder.run("heavy")) for _ in range(3)]
+    await wait_until(lambda: scheduler.waiting == 3)
+    light = asyncio.create_task(recorder.run("light"))
+    await wait_until(lambda: scheduler.waiting == 4)
+
+    snapshot = scheduler.snapshot()
+    assert snapshot["scheduler.test.queued"] == 4
+    assert snapshot["scheduler.test.waiting_users"] == 2
+    assert snapshot["scheduler.test.max_oldest_wait_seconds"] >= 0
+    assert not any("heavy" in name or "light" in name for name in snapshot)
+
+    recorder.release.set()
+    await asyncio.gather(holder, *heavy, light)
+    # The light user waits behind one heavy call, not all three.
+    assert recorder.order == ["holder", "heavy", "light", "heavy", "heavy"]
+    assert scheduler.active == 0 and scheduler.snapshot() == {
+        "scheduler.test.active": 0,
+        "scheduler.test.queued": 0,
+        "scheduler.test.waiting_users": 0,
+        "scheduler.test.max_oldest_wait_seconds": 0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_weights_give_users_more_admissions_per_turn():
+    scheduler = build_scheduler(weights={"heavy": 2})
+    recorder = Recorder(scheduler)
+    holder = asyncio.create_task(recorder.run("other", "holder"))
+    await wait_until(lambda: scheduler.active == 1)
+
+    tasks = []
+    for user_id in ["heavy", "heavy", "heavy", "light", "light"]:
+        tasks.append(asyncio.create_task(recorder.run(user_id)))
+        await wait_until(lambda: scheduler.waiting == len(tasks))
+
+    recorder.release.set()
+    await asyncio.gather(holder, *tasks)
+    assert recorder.order == ["holder", "heavy", "heavy", "light", "heavy", "light"]
+
+
+@pytest.mark.asyncio
+async def test_a_user_at_its_cap_does_not_block_other_users():
+    scheduler = build_scheduler(max_concurrent=3, per_user_concurrency=1)
+    recorder = Recorder(scheduler)
+    first = asyncio.create_task(recorder.run("heavy"))
+    await wait_until(lambda: scheduler.active == 1)
+    queued = asyncio.create_task(recorder.run("heavy"))
+    await wait_until(lambda: scheduler.waiting == 1)
+
+    light = asyncio.create_task(recorder.run("light"))
+    await wait_until(lambda: scheduler.active == 2)
+    assert scheduler.waiting == 1
+
+    recorder.release.set()
+    await asyncio.gather(first, queued, light)
+
+
+@pytest.mark.asyncio
+async def test_rejects_beyond_the_user_queue():
+    scheduler = build_scheduler(per_user_queue=1)
+    recorder = Recorder(scheduler)
+    holder = asyncio.create_task(recorder.run("heavy"))
+    await wait_until(lambda: scheduler.active == 1)
+    queued = asyncio.create_task(recorder.run("heavy"))
+    await wait_until(lambda: scheduler.waiting == 1)
+
+    with pytest.raises(ServiceOverloadedException):
+        async with scheduler.acquire("heavy"):
+            pass
+    # Other users still have room to queue.
+    light = asyncio.create_task(recorder.run("light"))
+    await wait_until(lambda: scheduler.waiting == 2)
+
+    recorder.release.set()
+    await asyncio.gather(holder, queued, light)
+
+
+@pytest.mark.asyncio
+async def test_rejects_callers_that_wait_too_long():
+    scheduler = build_scheduler(queue_timeout=0.01)
+    recorder = Recorder(scheduler)
+    holder = asyncio.create_task(recorder.run("heavy"))
+    await wait_until(lambda: scheduler.active == 1)
+
+    with pytest.raises(ServiceOverloadedException) as exc:
+        async with scheduler.acquire("heavy"):
+            pass
+    assert exc.value.retry_after == 7
+    assert scheduler.waiting == 0
+
+    recorder.release.set()
+    await holder
+    async with scheduler.acquire("heavy"):
+        assert scheduler.active == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiters_leave_the_queue():
+    scheduler = build_scheduler()
+    recorder = Recorder(scheduler)
+    holder = asyncio.create_task(recorder.run("heavy"))
+    await wait_until(lambda: scheduler.active == 1)
+    waiter = asyncio.create_task(recorder.run("light"))
+    await wait_until(lambda: scheduler.waiting == 1)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.waiting == 0
+
+    recorder.release.set()
+    await holder
+    assert scheduler.active == 0
@@ -0,0 +1,193 @@
+import gzip
+import json
+
+import pytest
+
+from app.core.metrics import metrics
+from app.models.graph import Edge, Graph, Node, NodeCreate, NodeUpdate
+from app.services.graph_cache import GraphCache
+from app.services.graph_service import GraphService
+
+
+class StubBinaryRedis:
+    def __init__(self):
+        self.store: dict[str, bytes] = {}
+        self.expiries: dict[str, int] = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def mget(self, *keys):
+        return [self.store.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+        self.expiries[key] = ex
+
+    async def incr(self, key):
+        value = int(self.store.get(key, b"0")) + 1
+        self.store[key] = str(value).encode()
+        return value
+
+
+class FailingRedis:
+    async def get(self, key):
+        raise ConnectionError("redis down")
+
+    async def mget(self, *keys):
+        raise ConnectionError("redis down")
+
+    async def set(self, *args, **kwargs):
+        raise ConnectionError("redis down")
+
+    async def incr(self, key):
+        raise ConnectionError("redis down")
+
+
+class CountingRepository:
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.full_graph_reads = 0
+
+    async def get_full_graph(self, user_id, include_embedding=False):
+        self.full_graph_reads += 1
+        return Graph(nodes=[node.model_copy() for node in self.nodes], edges=[], revision=7)
+
+    async def add_node(self, node):
+        self.nodes.append(node)
+        return node
+
+    async def add_edge(self, edge, user_id):
+        return edge
+
+    async def get_node_by_id(self, node_id, user_id):
+        return self.nodes[0]
+
+    async def update_node(self, node_id, node_update, user_id, embedding=None):
+        return self.nodes[0]
+
+    async def delete_node_by_id(self, node_id, user_id):
+        return False
+
+    async def delete_edge(self, edge, user_id):
+        return True
+
+    async def delete_all_nodes_for_user(self, user_id):
+        self.nodes.clear()
+        return 0
+
+
+class StubEmbeddingService:
+    async def fetch_embedding(self, text):
+        return [0.1, 0.2], True
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def build_service(repo, redis_client):
+    service = GraphService(
+        driver=None,
+        embedding_service=StubEmbeddingService(),
+        ai_service=object(),
+        graph_cache=GraphCache(ttl_seconds=60, redis_client_factory=lambda: redis_client),
+    )
+    service.repo = repo
+    return service
+
+
+def decode(payload):
+    return json.loads(gzip.decompress(payload))
+
+
+@pytest.mark.asyncio
+async def test_entries_are_compressed_and_only_served_for_the_current_version():
+    redis_client = StubBinaryRedis()
+    cache = GraphCache(ttl_seconds=60, redis_client_factory=lambda: redis_client)
+
+    assert await cache.get("user-1", "plain") == (None, None, 0)
+    compressed = await cache.set("user-1", "plain", 0, 7, b'{"nodes": []}')
+    assert await cache.get("user-1", "plain") == (compressed, 7, 0)
+    assert redis_client.expiries["graph:cache:user-1:plain"] == 60
+
+    await cache.invalidate("user-1")
+    assert await cache.get("user-1", "plain") == (None, None, 1)
+    assert metrics.get("graph_cache.hits") == 1
+    assert metrics.get("graph_cache.misses") == 2
+
+
+@pytest.mark.asyncio
+async def test_repeat_reads_skip_neo4j_until_a_write():
+    repo = CountingRepository([Node(name="A", description="a", userId="user-1")])
+    service = build_service(repo, StubBinaryRedis())
+
+    first, first_revision = await service.get_graph_payload("user-1")
+    second, second_revision = await service.get_graph_payload("user-1")
+    assert repo.full_graph_reads == 1
+    assert decode(first) == decode(second)
+    assert first_revision == second_revision == 7
+
+    await service.create_node(NodeCreate(name="B", description="b"), "user-1")
+    third, _ = await service.get_graph_payload("user-1")
+    assert repo.full_graph_reads == 2
+    assert [node["name"] for node in decode(third)["nodes"]] == ["A", "B"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("write", [
+    lambda s: s.create_edge(Edge(source_id=Node(name="x", description="").id,
+                                 target_id=Node(name="y", description="").id, label="rel"), "user-1"),
+    lambda s: s.update_node_properties(Node(name="x", description="").id, NodeUpdate(name="z"), "user-1"),
+    lambda s: s.delete_edge(Edge(source_id=Node(name="x", description="").id,
+                                 target_id=Node(name="y", description="").id, label="rel"), "user-1"),
+    lambda s: s.clear_workspace("user-1"),
+])
+async def test_writes_invalidate_the_cached_graph(write):
+    repo = CountingRepository([Node(name="A", description="a", userId="user-1")])
+    service = build_service(repo, StubBinaryRedis())
+
+    await service.get_graph_payload("user-1")
+    await write(service)
+    await service.get_graph_payload("user-1")
+
+    assert repo.full_graph_reads == 2
+
+
+@pytest.mark.asyncio
+async def test_noop_delete_keeps_the_cached_graph():
+    repo = CountingRepository([Node(name="A", description="a", userId="user-1")])
+    service = build_service(repo, StubBinaryRedis())
+
+    await service.get_graph_payload("user-1")
+    await service.delete_node(Node(name="x", description="").id, "user-1")
+    await service.get_graph_payload("user-1")
+
+    assert repo.full_graph_reads == 1
+
+
+@pytest.mark.asyncio
+async def test_unavailable_redis_falls_back_to_neo4j():
+    repo = CountingRepository([Node(name="A", description="a", userId="user-1")])
+    service = build_service(repo, FailingRedis())
+
+    payload, _ = await service.get_graph_payload("user-1")
+    await service.create_node(NodeCreate(name="B", description="b"), "user-1")
+
+    assert [node["name"] for node in decode(payload)["nodes"]] == ["A"]
+    assert metrics.get("graph_cache.errors") == 2
+
+
+@pytest.mark.asyncio
+async def test_version_follows_invalidations_and_is_none_without_redis():
+    redis_client = StubBinaryRedis()
+    cache = GraphCache(redis_client_factory=lambda: redis_client)
+
+    before = await cache.version("user-1")
+    bumped = await cache.invalidate("user-1")
+
+    assert (before, bumped, await cache.version("user-1")) == (0, 1, 1)
+    assert await GraphCache(redis_client_factory=FailingRedis).version("user-1") is None
@@ -0,0 +1,195 @@
+import gzip
+import json
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import router as router_module
+from app.db.repositories.graph_repository import GraphRepository
+from app.models.graph import Graph, GraphDelta, Node
+from app.services.graph_service import GraphService
+
+
+class ScriptedResult:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    async def single(self):
+        return self.rows[0] if self.rows else None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self.rows:
+            yield row
+
+
+class ChangeLogTransaction:
+    """Serves the change log query and the follow-up node lookup from fixed data."""
+
+    def __init__(self, revision, trimmed_through, changes, nodes):
+        self.log_row = {"revision": revision, "trimmed_through": trimmed_through, "changes": changes}
+        self.nodes = {str(node.id): node for node in nodes}
+        self.queries = []
+
+    async def run(self, query, parameters=None, **kwargs):
+        self.queries.append(parameters)
+        if "ids" in parameters:
+            return ScriptedResult([
+                {"n": self.nodes[node_id].model_dump(mode="json")}
+                for node_id in parameters["ids"] if node_id in self.nodes
+            ])
+        return ScriptedResult([self.log_row])
+
+
+def node_change(op, node):
+    return {"entity": "node", "op": op, "nodeId": str(node.id), "sourceId": None, "targetId": None, "label": None}
+
+
+def edge_change(op, source, target, label="rel"):
+    return {
+        "entity": "edge", "op": op, "nodeId": None,
+        "sourceId": str(source.id), "targetId": str(target.id), "label": label,
+    }
+
+
+@pytest.mark.asyncio
+async def test_changes_fold_to_the_latest_operation_per_node_and_edge():
+    kept, renamed, removed, vanished = (Node(name=n, description="d") for n in ("kept", "renamed", "removed", "vanished"))
+    tx = ChangeLogTransaction(12, 2, [
+        node_change("upsert", renamed),
+        node_change("upsert", removed),
+        edge_change("upsert", kept, removed),
+        edge_change("upsert", kept, renamed),
+        edge_change("upsert", renamed, kept),
+        node_change("delete", removed),
+        edge_change("delete", renamed, kept),
+        node_change("upsert", vanished),
+    ], nodes=[kept, renamed])
+
+    delta = await GraphRepository._fetch_graph_changes(tx, "user-1", 5, False)
+
+    assert (delta.since, delta.revision, delta.full_resync) == (5, 12, False)
+    assert [node.name for node in delta.nodes] == ["renamed"]
+    assert set(delta.deleted_node_ids) == {removed.id, vanished.id}
+    assert [(e.source_id, e.target_id) for e in delta.edges] == [(kept.id, renamed.id)]
+    assert [(e.source_id, e.target_id) for e in delta.deleted_edges] == [(renamed.id, kept.id)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("since", [1, 13])
+async def test_revisions_outside_the_retained_log_require_a_resync(since):
+    tx = ChangeLogTransaction(12, 2, [], nodes=[])
+
+    delta = await GraphRepository._fetch_graph_changes(tx, "user-1", since, False)
+
+    assert delta.full_resync is True
+    assert delta.revision == 12
+
+
+class StubRepository:
+    def __init__(self, graph, delta):
+        self.graph = graph
+        self.delta = delta
+
+    async def get_full_graph(self, user_id, include_embedding=False):
+        return self.graph.model_copy(deep=True)
+
+    async def get_graph_changes(self, user_id, since, include_embedding=False):
+        return self.delta
+
+
+@pytest.mark.asyncio
+async def test_service_fills_a_full_resync_with_the_whole_graph():
+    node = Node(name="A", description="a")
+    service = GraphService(driver=None, embedding_service=object(), ai_service=object())
+    service.repo = StubRepository(
+        Graph(nodes=[node], edges=[], revision=9), GraphDelta(since=1, revision=9, full_resync=True)
+    )
+
+    delta = await service.get_graph_delta("user-1", 1)
+
+    assert delta.full_resync is True
+    assert [n.id for n in delta.nodes] == [node.id]
+    assert delta.revision == 9
+
+
+class StubGraphService:
+    def __init__(self, revision):
+        self.revision = revision
+        self.graph = Graph(nodes=[Node(name="A", description="a")], edges=[], revision=revision)
+        self.payload_builds = 0
+
+    async def get_graph_revision(self, user_id):
+        return self.revision
+
+    async def get_graph_payload(self, user_id, vector_encoding=None):
+        self.payload_builds += 1
+        return gzip.compress(self.graph.model_dump_json().encode()), self.revision
+
+    async def get_graph_delta(self, user_id, since, vector_encoding=None):
+        return GraphDelta(since=since, revision=self.revision, deleted_node_ids=[uuid4()])
+
+
+def build_client(service):
+    app = FastAPI()
+    app.include_router(router_module.router)
+    app.dependency_overrides[router_module.get_service] = lambda: service
+    return TestClient(app)
+
+
+def test_graph_etag_answers_matching_if_none_match_with_304():
+    client = build_client(StubGraphService(revision=4))
+
+    first = client.get("/graph", headers={"X-User-ID": "user-1"})
+    etag = first.headers["etag"]
+    repeat = client.get("/graph", headers={"X-User-ID": "user-1", "If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert first.json()["revision"] == 4
+    assert etag.startswith('"4-plain')
+    assert repeat.status_code == 304
+    assert repeat.content == b""
+    assert repeat.headers["etag"] == etag
+
+
+def test_matching_if_none_match_skips_building_the_payload():
+    service = StubGraphService(revision=4)
+    client = build_client(service)
+    etag = client.get("/graph", headers={"X-User-ID": "user-1"}).headers["etag"]
+
+    repeat = client.get("/graph", headers={"X-User-ID": "user-1", "If-None-Match": etag})
+    service.revision = 5
+    changed = client.get("/graph", headers={"X-User-ID": "user-1", "If-None-Match": etag})
+
+    assert repeat.status_code == 304
+    assert changed.status_code == 200
+    assert changed.headers["etag"].startswith('"5-plain')
+    assert service.payload_builds == 2
+
+
+def test_graph_etag_changes_with_revision_and_encoding():
+    client = build_client(StubGraphService(revision=4))
+    etag = client.get("/graph", headers={"X-User-ID": "user-1"}).headers["etag"]
+
+    other_encoding = client.get("/graph?vector_encoding=int8", headers={"X-User-ID": "user-1", "If-None-Match": etag})
+    identity = client.get("/graph", headers={"X-User-ID": "user-1", "Accept-Encoding": "identity", "If-None-Match": etag})
+
+    assert other_encoding.status_code == 200
+    assert identity.status_code == 200
+    assert identity.headers.get("content-encoding") is None
+    assert json.loads(identity.content)["nodes"][0]["name"] == "A"
+
+
+def test_graph_since_returns_a_delta():
+    client = build_client(StubGraphService(revision=6))
+
+    response = client.get("/graph?since=3", headers={"X-User-ID": "user-1"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["since"], body["revision"], body["full_resync"]) == (3, 6, False)
+    assert len(body["deleted_node_ids"]) == 1
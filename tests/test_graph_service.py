@@ -0,0 +1,244 @@
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.models.graph import ExpansionContext, Node, NodeUpdate
+from app.services.ai_service import AI_Edge, AI_NodeIdentifier
+from app.services.graph_service import GraphService
+from app.services.vector_index import InMemoryVectorIndex
+
+
+class StubRepository:
+    def __init__(self, source_nodes, neighbors=None, semantic_nodes=None):
+        self.context = ExpansionContext(
+            source_nodes=source_nodes,
+            neighbors=neighbors or [],
+            semantic_nodes=semantic_nodes or [],
+        )
+        self.context_calls = []
+        self.batch_searches = []
+        self.subgraphs = []
+
+    async def get_expansion_context(
+        self, node_ids, user_id, threshold, limit, max_neighbors=200, use_centroid=False, include_candidates=True
+    ):
+        self.context_calls.append((list(node_ids), user_id))
+        self.use_centroid = use_centroid
+        self.include_candidates = include_candidates
+        return self.context
+
+    async def find_semantically_similar_nodes_batch(self, query_vectors, *args, **kwargs):
+        self.batch_searches.append((list(query_vectors), kwargs.get("use_centroid")))
+        return []
+
+    async def add_subgraph(self, nodes, edges, user_id):
+        self.subgraphs.append((list(nodes), list(edges)))
+        return set(range(len(edges)))
+
+
+class StubGraphCache:
+    def __init__(self):
+        self.invalidations = []
+
+    async def invalidate(self, user_id):
+        self.invalidations.append(user_id)
+
+
+class StubEmbeddingService:
+    async def fetch_embedding(self, text):
+        return [0.1, 0.2], True
+
+
+class StubAIService:
+    def __init__(self, events=None, result=None):
+        self.events = events or []
+        self.result = result
+        self.contexts = []
+
+    async def generate_graph_modification(self, source_nodes, user_id, prompt_key, context=""):
+        self.contexts.append(context)
+        return self.result
+
+    async def stream_graph_modification(self, source_nodes, user_id, prompt_key, context=""):
+        self.contexts.append(context)
+        for event in self.events:
+            yield event
+
+
+def build_service(repo, ai_service):
+    service = GraphService(
+        driver=None,
+        embedding_service=StubEmbeddingService(),
+        ai_service=ai_service,
+    )
+    service.repo = repo
+    return service
+
+
+def edge(source, target, label="rel"):
+    return AI_Edge(
+        source=AI_NodeIdentifier(is_new=source[0], index=source[1]),
+        target=AI_NodeIdentifier(is_new=target[0], index=target[1]),
+        label=label,
+    )
+
+
+@pytest.mark.asyncio
+async def test_execute_ai_action_fetches_context_in_one_call():
+    source = Node(name="Source", description="s", embedding=[1.0, 0.0], userId="user-1")
+    neighbor = Node(name="Neighbor", description="n")
+    similar = Node(name="Similar", description="m")
+    repo = StubRepository([source], neighbors=[neighbor], semantic_nodes=[similar])
+    new_node = Node(name="New", description="generated")
+    ai_service = StubAIService(result=([new_node], []))
+
+    graph = await build_service(repo, ai_service).execute_ai_action("expand-node", [source.id], "user-1")
+
+    assert repo.context_calls == [([source.id], "user-1")]
+    assert "- Neighbor: n" in ai_service.contexts[0]
+    assert "- Similar: m" in ai_service.contexts[0]
+    assert [node.name for node in graph.nodes] == ["New"]
+    assert graph.nodes[0].embedding is None
+    assert repo.subgraphs[0][0][0].embedding == [0.1, 0.2]
+
+
+@pytest.mark.asyncio
+async def test_sources_without_embeddings_share_one_batched_search():
+    sources = [Node(name=f"Source {i}", description="s", userId="user-1") for i in range(4)]
+    repo = StubRepository(sources)
+    ai_service = StubAIService(result=([], []))
+
+    await build_service(repo, ai_service).execute_ai_action("expand-node", [n.id for n in sources], "user-1")
+
+    assert repo.use_centroid is True
+    assert repo.batch_searches == [([[0.1, 0.2]] * 4, True)]
+
+
+@pytest.mark.asyncio
+async def test_memory_vector_backend_answers_semantic_search_and_indexes_new_nodes():
+    source = Node(name="Source", description="s", embedding=[1.0, 0.0], userId="user-1")
+    similar = Node(name="Similar", description="m", embedding=[0.9, 0.1], userId="user-1")
+    unrelated = Node(name="Unrelated", description="u", embedding=[0.0, 1.0], userId="user-1")
+    new_node = Node(name="New", description="generated")
+
+    async def load(user_id):
+        return [source, similar, unrelated]
+
+    repo = StubRepository([source])
+    ai_service = StubAIService(result=([new_node], []))
+    service = build_service(repo, ai_service)
+    service.vector_index = InMemoryVectorIndex(loader=load, max_bytes=1 << 20, ttl_seconds=60)
+
+    await service.execute_ai_action("expand-node", [source.id], "user-1")
+
+    assert repo.include_candidates is False
+    assert repo.batch_searches == []
+    assert "- Similar: m" in ai_service.contexts[0]
+    assert "Unrelated" not in ai_service.contexts[0]
+    found = await service.vector_index.search("user-1", [[0.2, 0.1]], [], 0.0, 10)
+    assert new_node.id in {node.id for node in found}
+
+
+@pytest.mark.asyncio
+async def test_stream_ai_action_persists_nodes_and_defers_edges_until_endpoints_exist():
+    source = Node(id=uuid4(), name="Source", description="s", embedding=[1.0], userId="user-1")
+    first = Node(name="First", description="1")
+    second = Node(name="Second", description="2")
+    ai_service = StubAIService(events=[
+        ("node", 0, first),
+        ("edge", 0, edge((False, 0), (True, 1))),
+        ("edge", 1, edge((False, 0), (True, 0))),
+        ("node", 1, second),
+        ("edge", 2, edge((True, 0), (True, 7))),
+    ])
+    repo = StubRepository([source])
+    service = build_service(repo, ai_service)
+
+    events = [event async for event in await service.stream_ai_action("expand-node", [source.id], "user-1")]
+
+    assert [(kind, getattr(item, "name", None) or item.target_id) for kind, item in events] == [
+        ("node", "First"),
+        ("edge", first.id),
+        ("node", "Second"),
+        ("edge", second.id),
+    ]
+    assert all(item.embedding is None for kind, item in events if kind == "node")
+    persisted_nodes = [node for nodes, _ in repo.subgraphs for node in nodes]
+    assert [node.userId for node in persisted_nodes] == ["user-1", "user-1"]
+    assert len([edge for _, edges in repo.subgraphs for edge in edges]) == 2
+
+
+@pytest.mark.asyncio
+async def test_streamed_items_are_written_in_batches(monkeypatch):
+    monkeypatch.setattr(settings, "AI_STREAM_WRITE_BATCH_SIZE", 2)
+    source = Node(id=uuid4(), name="Source", description="s", embedding=[1.0], userId="user-1")
+    nodes = [Node(name=f"Node {i}", description=str(i)) for i in range(3)]
+    ai_service = StubAIService(events=[
+        *[("node", i, node) for i, node in enumerate(nodes)],
+        *[("edge", i, edge((False, 0), (True, i))) for i in range(3)],
+    ])
+    repo = StubRepository([source])
+    graph_cache = StubGraphCache()
+    service = build_service(repo, ai_service)
+    service.graph_cache = graph_cache
+
+    events = [event async for event in await service.stream_ai_action("expand-node", [source.id], "user-1")]
+
+    assert [kind for kind, _ in events] == ["node"] * 3 + ["edge"] * 3
+    assert [(len(nodes), len(edges)) for nodes, edges in repo.subgraphs] == [(1, 0), (2, 0), (0, 2), (0, 1)]
+    assert graph_cache.invalidations == ["user-1"] * 4
+
+
+@pytest.mark.asyncio
+async def test_first_streamed_node_is_yielded_before_the_next_is_generated():
+    source = Node(id=uuid4(), name="Source", description="s", embedding=[1.0], userId="user-1")
+    log = []
+
+    class LoggingAIService(StubAIService):
+        async def stream_graph_modification(self, source_nodes, user_id, prompt_key, context=""):
+            for index in range(3):
+                log.append(f"generated {index}")
+                yield "node", index, Node(name=f"Node {index}", description=str(index))
+
+    service = build_service(StubRepository([source]), LoggingAIService())
+
+    async for kind, item in await service.stream_ai_action("expand-node", [source.id], "user-1"):
+        log.append(f"received {item.name}")
+
+    assert log[:3] == ["generated 0", "received Node 0", "generated 1"]
+
+
+@pytest.mark.asyncio
+async def test_renaming_a_node_re_embeds_it():
+    node = Node(name="Old", description="d", embedding=[1.0, 0.0], userId="user-1")
+    updates = []
+
+    class UpdateRepository:
+        async def get_node_by_id(self, node_id, user_id):
+            return node.model_copy()
+
+        async def update_node(self, node_id, node_update, user_id, embedding=None):
+            updates.append((node_update.model_dump(exclude_unset=True), embedding))
+            return node.model_copy(update={**node_update.model_dump(exclude_unset=True), "embedding": None})
+
+    class RecordingEmbeddingService:
+        def __init__(self):
+            self.texts = []
+
+        async def fetch_embedding(self, text):
+            self.texts.append(text)
+            return [0.0, 1.0], True
+
+    embedding_service = RecordingEmbeddingService()
+    service = GraphService(driver=None, embedding_service=embedding_service, ai_service=object())
+    service.repo = UpdateRepository()
+    indexed = []
+    service._index_nodes = lambda user_id, nodes: indexed.extend(nodes)
+
+    renamed = await service.update_node_properties(node.id, NodeUpdate(name="New"), "user-1")
+
+    assert embedding_service.texts == ["Concept Name: New\nDescription: d"]
+    assert updates == [({"name": "New"}, [0.0, 1.0])]
+    assert renamed.name == "New" and renamed.embedding is None
+    assert indexed[0].embedding == [0.0, 1.0]
@@ -0,0 +1,60 @@
+import json
+from uuid import uuid4
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import router as router_module
+from app.models.graph import Edge, Node
+
+
+class StubGraphService:
+    def __init__(self, nodes, edges):
+        self.nodes = nodes
+        self.edges = edges
+
+    async def check_budget(self, user_id):
+        return None
+
+    async def _stream(self, user_id):
+        for node in self.nodes:
+            yield node
+        for edge in self.edges:
+            yield edge
+
+    def stream_graph(self, user_id, vector_encoding=None):
+        return self._stream(user_id)
+
+
+def build_client(service):
+    app = FastAPI()
+    app.include_router(router_module.router)
+    app.dependency_overrides[router_module.get_service] = lambda: service
+    return TestClient(app)
+
+
+def test_graph_stream_emits_ndjson_nodes_then_edges(monkeypatch):
+    monkeypatch.setattr(router_module, "NDJSON_CHUNK_SIZE", 2)
+    nodes = [Node(name=f"Concept {i}", description="d") for i in range(3)]
+    edges = [Edge(source_id=nodes[0].id, target_id=nodes[1].id, label="relates to")]
+    client = build_client(StubGraphService(nodes, edges))
+
+    response = client.get("/graph/stream", headers={"X-User-ID": "user-1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines] == ["node", "node", "node", "edge"]
+    assert lines[0]["data"]["id"] == str(nodes[0].id)
+    assert lines[-1]["data"] == {
+        "source_id": str(nodes[0].id),
+        "target_id": str(nodes[1].id),
+        "label": "relates to",
+    }
+
+
+def test_graph_stream_handles_empty_workspace():
+    client = build_client(StubGraphService([], []))
+    response = client.get("/graph/stream", headers={"X-User-ID": str(uuid4())})
+    assert response.status_code == 200
+    assert response.text == ""
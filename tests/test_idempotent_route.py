@@ -1,13 +1,50 @@
-from fastapi import FastAPI
+import asyncio
+
+import httpx
+import pytest
+import base64
+import json
+
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
 
 from app.api import idempotency as idempotency_module
-from app.api.idempotency import IdempotentAPIRoute
+from app.api.idempotency import IdempotentAPIRoute, decode_response, encode_response
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class StubPubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.setdefault(channel, []).append(self)
+
+    async def unsubscribe(self, channel):
+        self.redis.subscribers[channel].remove(self)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        pass
 
 
 class StubRedis:
+    """Runs the idempotency Lua scripts in Python and records every round trip."""
+
     def __init__(self):
         self.store: dict[str, str] = {}
+        self.subscribers: dict[str, list[StubPubSub]] = {}
+        self.calls: list[str] = []
+        self.renewals = 0
+        self.registered_scripts = 0
 
     async def get(self, key: str):
         return self.store.get(key)
@@ -21,6 +58,47 @@ class StubRedis:
     async def delete(self, key: str):
         self.store.pop(key, None)
 
+    def pubsub(self):
+        return StubPubSub(self)
+
+    def register_script(self, script):
+        self.registered_scripts += 1
+        scripts = {
+            idempotency_module.CHECK_AND_LOCK_SCRIPT: self._check_and_lock,
+            idempotency_module.STORE_AND_UNLOCK_SCRIPT: self._store_and_unlock,
+            idempotency_module.RENEW_LOCK_SCRIPT: self._renew_lock,
+        }
+        run = scripts[script]
+
+        async def call(keys, args):
+            self.calls.append(run.__name__)
+            return run(keys, args)
+        return call
+
+    def _check_and_lock(self, keys, args):
+        cache_key, lock_key = keys
+        if cache_key in self.store:
+            return [b"cached", self.store[cache_key]]
+        if lock_key in self.store:
+            return [b"busy"]
+        self.store[lock_key] = args[0]
+        return [b"acquired"]
+
+    def _store_and_unlock(self, keys, args):
+        cache_key, lock_key = keys
+        token, response, _, channel = args
+        if response:
+            self.store[cache_key] = response
+        if self.store.get(lock_key) == token:
+            del self.store[lock_key]
+        for subscriber in self.subscribers.get(channel, []):
+            subscriber.messages.put_nowait({"type": "message", "data": "stored" if response else "released"})
+        return 1
+
+    def _renew_lock(self, keys, args):
+        self.renewals += 1
+        return 1 if self.store.get(keys[0]) == args[0] else 0
+
 
 def build_app():
     app = FastAPI()
@@ -41,7 +119,7 @@ HEADERS = {
 
 def test_idempotent_route_caches_response(monkeypatch):
     redis_client = StubRedis()
-    monkeypatch.setattr(idempotency_module, "get_redis_client", lambda: redis_client)
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
 
     client = TestClient(build_app())
 
@@ -53,3 +131,223 @@ def test_idempotent_route_caches_response(monkeypatch):
     second = client.post("/echo", json={"value": "second"}, headers=HEADERS)
     assert second.status_code == 200
     assert second.json() == payload
+
+
+def test_idempotent_route_replays_binary_bodies(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+    app = FastAPI()
+    app.router.route_class = IdempotentAPIRoute
+    body = bytes(range(256))
+
+    @app.post("/blob")
+    async def blob():
+        return Response(content=body, media_type="application/msgpack")
+
+    client = TestClient(app)
+    first = client.post("/blob", headers=HEADERS)
+    second = client.post("/blob", headers=HEADERS)
+
+    assert first.content == second.content == body
+
+
+def test_first_request_takes_two_redis_round_trips(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+
+    client = TestClient(build_app())
+    client.post("/echo", json={"value": "first"}, headers=HEADERS)
+    client.post("/echo", json={"value": "first"}, headers=HEADERS)
+
+    # The repeat is answered from the in-process cache.
+    assert redis_client.calls == ["_check_and_lock", "_store_and_unlock"]
+
+
+def test_scripts_are_registered_once_per_client(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+
+    client = TestClient(build_app())
+    for key in ["key-1", "key-2", "key-3"]:
+        client.post("/echo", json={"value": key}, headers={**HEADERS, "Idempotency-Key": key})
+
+    assert redis_client.registered_scripts == 3
+    assert "idempotency:user-1:key-1:lock" not in redis_client.store
+
+
+async def _post_concurrently(app, first_json, second_json, release):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        first = asyncio.create_task(client.post("/slow", json=first_json, headers=HEADERS))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(client.post("/slow", json=second_json, headers=HEADERS))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await first, await second
+
+
+def build_slow_app(release, calls, fail_first=False):
+    app = FastAPI()
+    app.router.route_class = IdempotentAPIRoute
+
+    @app.post("/slow")
+    async def slow(payload: dict):
+        calls.append(payload)
+        await release.wait()
+        if fail_first and len(calls) == 1:
+            raise RuntimeError("handler failed")
+        return payload
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_waits_for_the_original_response(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+    release, calls = asyncio.Event(), []
+
+    first, second = await _post_concurrently(
+        build_slow_app(release, calls), {"value": "first"}, {"value": "second"}, release
+    )
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json() == {"value": "first"}
+    assert calls == [{"value": "first"}]
+
+
+@pytest.mark.asyncio
+async def test_waiting_duplicate_runs_the_handler_when_the_original_fails(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+    release, calls = asyncio.Event(), []
+    app = build_slow_app(release, calls, fail_first=True)
+
+    @app.exception_handler(RuntimeError)
+    async def handle(request, exc):
+        return Response(status_code=500)
+
+    first, second = await _post_concurrently(app, {"value": "first"}, {"value": "second"}, release)
+
+    assert first.status_code == 500
+    assert second.json() == {"value": "second"}
+
+
+@pytest.mark.asyncio
+async def test_lock_is_renewed_while_a_slow_handler_runs(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+    monkeypatch.setattr(idempotency_module, "LOCK_RENEW_INTERVAL_SECONDS", 0.01)
+    app = FastAPI()
+    app.router.route_class = IdempotentAPIRoute
+
+    @app.post("/slow")
+    async def slow():
+        await asyncio.sleep(0.1)
+        return {"done": True}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/slow", headers=HEADERS)
+
+    assert response.status_code == 200
+    assert redis_client.renewals >= 3
+
+
+def test_envelope_compresses_large_bodies_and_reads_legacy_entries():
+    body = b'{"nodes": []}' * 500
+    entry = encode_response(201, {"content-type": "application/json", "content-length": "6500"}, body)
+
+    stored = decode_response(entry)
+    assert len(entry) < len(body) // 10
+    assert (stored.status_code, stored.body) == (201, body)
+    assert stored.headers == {"content-type": "application/json"}
+
+    legacy = json.dumps({
+        "status_code": 200, "headers": {}, "body": base64.b64encode(b"ok").decode(), "body_encoding": "base64"
+    }).encode()
+    assert decode_response(legacy).body == b"ok"
+
+
+def test_oversized_response_is_stored_as_a_marker(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_MAX_ENTRY_BYTES", 64)
+    metrics.reset()
+
+    client = TestClient(build_app())
+    first = client.post("/echo", json={"value": "x" * 200}, headers=HEADERS)
+    retry = client.post("/echo", json={"value": "x" * 200}, headers=HEADERS)
+
+    assert first.status_code == 200
+    assert retry.status_code == 409
+    assert metrics.get("idempotency.oversize.POST /echo") == 1
+    assert metrics.get("idempotency.bytes_stored.POST /echo") == len(redis_client.store["idempotency:user-1:key-1"])
+
+
+def test_oversized_response_is_not_stored_with_skip_policy(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_MAX_ENTRY_BYTES", 64)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_OVERSIZE_POLICY", "skip")
+
+    client = TestClient(build_app())
+    client.post("/echo", json={"value": "x" * 200}, headers=HEADERS)
+
+    assert redis_client.store == {}
+
+
+def test_streaming_response_holds_the_lock_until_the_stream_ends(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+    app = FastAPI()
+    app.router.route_class = IdempotentAPIRoute
+    lock_held_while_streaming = []
+
+    @app.post("/stream")
+    async def stream():
+        async def events():
+            lock_held_while_streaming.append("idempotency:user-1:key-1:lock" in redis_client.store)
+            yield b"data: 1\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    client = TestClient(app)
+    first = client.post("/stream", headers=HEADERS)
+    retry = client.post("/stream", headers=HEADERS)
+
+    assert first.text == "data: 1\n\n"
+    assert lock_held_while_streaming == [True]
+    assert "idempotency:user-1:key-1:lock" not in redis_client.store
+    assert retry.status_code == 409
+
+
+def test_streaming_response_releases_the_lock_when_the_stream_fails(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+    app = FastAPI()
+    app.router.route_class = IdempotentAPIRoute
+
+    @app.post("/stream")
+    async def stream():
+        async def events():
+            raise RuntimeError("stream broke")
+            yield b""
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    client = TestClient(app, raise_server_exceptions=False)
+    client.post("/stream", headers=HEADERS)
+
+    assert "idempotency:user-1:key-1:lock" not in redis_client.store
+    assert "idempotency:user-1:key-1" in redis_client.store
+
+
+@pytest.mark.asyncio
+async def test_lock_renewal_stops_after_the_maximum_hold(monkeypatch):
+    redis_client = StubRedis()
+    monkeypatch.setattr(idempotency_module, "LOCK_RENEW_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(idempotency_module, "LOCK_MAX_HOLD_SECONDS", 0.05)
+    keys = idempotency_module.IdempotencyKeys(redis_client, "user-1", "key-1")
+    await keys.check_and_lock()
+
+    await asyncio.wait_for(keys.keep_lock(), timeout=1)
+    assert 1 <= redis_client.renewals <= 5
@@ -0,0 +1,284 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import idempotency as idempotency_module
+from app.api import router as router_module
+from app.core.exceptions import NodeNotFoundException
+from app.core.limiter import limiter
+from app.models.graph import Graph, Node
+from app.services import job_queue as job_queue_module
+from app.services.job_queue import CLAIMS_KEY, PROCESSING_KEY, QUEUE_KEY, JobQueue
+from app.worker import EMPTY_RESULT_ERROR, _worker_loop, process_job
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue_call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue_call
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values: dict[str, str] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.lists: dict[str, list[str]] = {}
+        self.sorted_sets: dict[str, dict[str, float]] = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return False
+        self.values[key] = value
+        return True
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    def register_script(self, script):
+        async def run(keys, args):
+            # The idempotency scripts (app/api/idempotency.py) and the job reaper.
+            if script == job_queue_module.REQUEUE_STALE_SCRIPT:
+                return self._requeue_stale(keys, args)
+            if script == idempotency_module.CHECK_AND_LOCK_SCRIPT:
+                if keys[0] in self.values:
+                    return [b"cached", self.values[keys[0]]]
+                return [b"acquired"] if await self.set(keys[1], args[0], nx=True) else [b"busy"]
+            if script == idempotency_module.STORE_AND_UNLOCK_SCRIPT:
+                if args[1]:
+                    self.values[keys[0]] = args[1]
+                self.values.pop(keys[1], None)
+            return 1
+        return run
+
+    def _requeue_stale(self, keys, args):
+        processing, queue, claims = keys
+        cutoff, job_prefix, now = args
+        requeued = []
+        for job_id, claimed_at in list(self.sorted_sets.get(claims, {}).items()):
+            if claimed_at > cutoff:
+                continue
+            del self.sorted_sets[claims][job_id]
+            if job_id in self.lists.get(processing, []) and job_prefix + job_id in self.hashes:
+                self.lists[processing].remove(job_id)
+                self.hashes[job_prefix + job_id].update({"status": "queued", "updated_at": now})
+                self.lists.setdefault(queue, []).append(job_id)
+                requeued.append(job_id)
+        return requeued
+
+    async def zadd(self, key, mapping):
+        self.sorted_sets.setdefault(key, {}).update(mapping)
+
+    async def zrem(self, key, member):
+        self.sorted_sets.get(key, {}).pop(member, None)
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def expire(self, key, seconds):
+        return True
+
+    async def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    async def rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value)
+
+    async def lrem(self, key, count, value):
+        items = self.lists.get(key, [])
+        if value in items:
+            items.remove(value)
+
+    async def blmove(self, source, destination, timeout, src_side, dest_side):
+        items = self.lists.get(source, [])
+        if not items:
+            return None
+        value = items.pop() if src_side == "RIGHT" else items.pop(0)
+        self.lists.setdefault(destination, []).insert(0, value)
+        return value
+
+
+class StubGraphService:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = []
+
+    async def execute_ai_action(self, action_key, selected_node_ids, user_id):
+        self.calls.append((action_key, selected_node_ids, user_id))
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def created_graph():
+    return Graph(nodes=[Node(name="New", description="Generated")], edges=[])
+
+
+@pytest.mark.asyncio
+async def test_worker_completes_claimed_job():
+    queue = JobQueue(FakeRedis())
+    node_id = uuid4()
+    job = await queue.enqueue("user-1", "expand-node", [node_id])
+    service = StubGraphService(created_graph())
+
+    job_id = await queue.claim(timeout=0)
+    assert (await queue.get(job_id)).status == "running"
+    await process_job(job_id, queue, service)
+
+    assert service.calls == [("expand-node", [node_id], "user-1")]
+    finished = await queue.get(job.id, "user-1")
+    assert finished.status == "succeeded"
+    assert (await queue.get_result(job.id)).nodes[0].name == "New"
+    assert await queue.get(job.id, "someone-else") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "outcome, expected_error",
+    [
+        (NodeNotFoundException("None of the selected nodes were found."), "None of the selected nodes were found."),
+        (Graph(nodes=[], edges=[]), EMPTY_RESULT_ERROR),
+    ],
+)
+async def test_worker_records_failures(outcome, expected_error):
+    queue = JobQueue(FakeRedis())
+    job = await queue.enqueue("user-1", "expand-node", [uuid4()])
+
+    await process_job(await queue.claim(timeout=0), queue, StubGraphService(outcome))
+
+    failed = await queue.get(job.id)
+    assert failed.status == "failed"
+    assert failed.error == expected_error
+    assert await queue.get_result(job.id) is None
+
+
+@pytest.mark.asyncio
+async def test_worker_loop_survives_redis_errors_while_recording_a_job():
+    stop = asyncio.Event()
+
+    class FlakyQueue(JobQueue):
+        async def claim(self, timeout=5):
+            job_id = await super().claim(timeout)
+            if job_id is None:
+                stop.set()
+            return job_id
+
+        async def complete(self, job_id, graph):
+            raise ConnectionError("redis down")
+
+    queue = FlakyQueue(FakeRedis())
+    await queue.enqueue("user-1", "expand-node", [uuid4()])
+    await queue.enqueue("user-1", "expand-node", [uuid4()])
+    service = StubGraphService(created_graph())
+
+    await asyncio.wait_for(_worker_loop(queue, service, stop), timeout=5)
+    assert len(service.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_jobs_of_crashed_workers_are_requeued_after_the_visibility_timeout():
+    redis_client = FakeRedis()
+    queue = JobQueue(redis_client)
+    stale = await queue.enqueue("user-1", "expand-node", [uuid4()])
+    finished = await queue.enqueue("user-1", "expand-node", [uuid4()])
+    stale_id = await queue.claim(timeout=0)
+    finished_id = await queue.claim(timeout=0)
+    await queue.complete(finished_id, created_graph())
+
+    assert await queue.requeue_stale(visibility_timeout=60) == []
+    assert await queue.requeue_stale(visibility_timeout=0) == [stale_id]
+
+    assert (await queue.get(stale.id)).status == "queued"
+    assert (await queue.get(finished.id)).status == "succeeded"
+    assert redis_client.lists[PROCESSING_KEY] == []
+    assert redis_client.lists[QUEUE_KEY] == [stale_id]
+    assert redis_client.sorted_sets[CLAIMS_KEY] == {}
+
+
+@pytest.mark.asyncio
+async def test_a_job_that_already_ran_is_completed_without_running_again():
+    class FlakyQueue(JobQueue):
+        failing = True
+
+        async def complete(self, job_id, graph):
+            if self.failing:
+                raise ConnectionError("redis down")
+            await super().complete(job_id, graph)
+
+    queue = FlakyQueue(FakeRedis())
+    job = await queue.enqueue("user-1", "expand-node", [uuid4()])
+    service = StubGraphService(created_graph())
+
+    job_id = await queue.claim(timeout=0)
+    with pytest.raises(ConnectionError):
+        await process_job(job_id, queue, service)
+    assert await queue.requeue_stale(visibility_timeout=0) == [job_id]
+
+    queue.failing = False
+    await process_job(await queue.claim(timeout=0), queue, service)
+
+    assert len(service.calls) == 1
+    assert (await queue.get(job.id)).status == "succeeded"
+
+
+def test_async_execute_action_returns_job_and_serves_result(monkeypatch):
+    redis_client = FakeRedis()
+    queue = JobQueue(redis_client)
+    monkeypatch.setattr(idempotency_module, "get_binary_redis_client", lambda: redis_client)
+    monkeypatch.setattr(limiter, "enabled", False)
+
+    app = FastAPI()
+    app.include_router(router_module.router)
+    app.dependency_overrides[router_module.get_job_queue] = lambda: queue
+    app.dependency_overrides[router_module.get_service] = lambda: None
+    client = TestClient(app)
+    headers = {"X-User-ID": "user-1", "Idempotency-Key": "job-key"}
+
+    response = client.post(
+        "/graph/execute-action?async=true",
+        json={"action_key": "expand-node", "selected_node_ids": [str(uuid4())]},
+        headers=headers,
+    )
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "queued"
+    assert response.headers["location"] == body["status_url"]
+
+    pending = client.get(body["result_url"], headers=headers)
+    assert pending.status_code == 409
+
+    job_id = redis_client.lists["jobs:ai-action:queue"][0]
+    asyncio.run(process_job(job_id, queue, StubGraphService(created_graph())))
+
+    status_response = client.get(body["status_url"], headers=headers)
+    assert status_response.json()["status"] == "succeeded"
+    result = client.get(body["result_url"], headers=headers)
+    assert result.status_code == 200
+    assert result.json()["nodes"][0]["name"] == "New"
+    assert client.get(body["status_url"], headers={"X-User-ID": "user-2"}).status_code == 404
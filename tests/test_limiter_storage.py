@@ -0,0 +1,86 @@
+from limits import parse
+from limits.storage import MemoryStorage
+from limits.strategies import FixedWindowRateLimiter
+
+from app.core.limiter_storage import HybridStorage
+
+STRICT = "app.api.router.execute_action"
+
+
+class CountingStorage(MemoryStorage):
+    def __init__(self):
+        super().__init__()
+        self.increments = 0
+        self.failing = False
+
+    def incr(self, key, expiry, amount=1):
+        if self.failing:
+            raise ConnectionError("redis down")
+        self.increments += 1
+        return super().incr(key, expiry, amount)
+
+
+def key(endpoint="app.api.router.get_node"):
+    return f"LIMITER/user-1/{endpoint}/200/1/minute"
+
+
+def test_hits_are_counted_locally_and_synced_in_one_batch():
+    remote = CountingStorage()
+    storage = HybridStorage(remote=remote, strict_scopes=(STRICT,))
+
+    assert [storage.incr(key(), 60) for _ in range(5)] == [1, 2, 3, 4, 5]
+    assert remote.increments == 0
+
+    storage.sync()
+
+    assert remote.increments == 1
+    assert remote.get(key()) == 5
+    assert storage.incr(key(), 60) == 6
+
+
+def test_workers_share_counts_through_the_remote_storage():
+    remote = CountingStorage()
+    first, second = HybridStorage(remote=remote), HybridStorage(remote=remote)
+    for _ in range(3):
+        first.incr(key(), 60)
+    first.sync()
+
+    # A worker's first hit in a window starts from the shared count.
+    assert second.incr(key(), 60) == 4
+    second.sync()
+    first.incr(key(), 60)
+    first.sync()
+    assert first.get(key()) == 5
+
+
+def test_strict_endpoints_are_checked_against_the_remote_storage_on_every_hit():
+    remote = CountingStorage()
+    storage = HybridStorage(remote=remote, strict_scopes=(STRICT,))
+
+    storage.incr(key(STRICT), 60)
+    storage.incr(key(STRICT), 60)
+
+    assert remote.increments == 2
+    assert remote.get(key(STRICT)) == 2
+
+
+def test_failed_sync_keeps_hits_pending():
+    remote = CountingStorage()
+    storage = HybridStorage(remote=remote)
+    storage.incr(key(), 60)
+    storage.incr(key(), 60)
+
+    remote.failing = True
+    storage.sync()
+    assert storage.get(key()) == 2
+
+    remote.failing = False
+    storage.sync()
+    assert remote.get(key()) == 2
+
+
+def test_fixed_window_limiter_rejects_hits_over_the_limit():
+    limiter = FixedWindowRateLimiter(HybridStorage(remote=CountingStorage()))
+    item = parse("3/minute")
+
+    assert [limiter.hit(item, "user-1", "endpoint") for _ in range(4)] == [True, True, True, False]
@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+from app.core.metrics import metrics
+from app.services.llm_cache import LLMResponseCache
+
+
+class StubRedis:
+    def __init__(self):
+        self.store: dict[str, str] = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.store:
+            return False
+        self.store[key] = value
+        return True
+
+    async def exists(self, key):
+        return int(key in self.store)
+
+    async def delete(self, key):
+        self.store.pop(key, None)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def build_cache(redis_client):
+    return LLMResponseCache(
+        ttl_seconds=60, lease_seconds=5, poll_interval=0.001, enabled=True,
+        redis_client_factory=lambda: redis_client,
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_prompts_make_one_upstream_call():
+    cache = build_cache(StubRedis())
+    calls = 0
+    release = asyncio.Event()
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return '{"nodes": [], "edges": []}'
+
+    tasks = [asyncio.create_task(cache.get_or_generate("model", "same prompt", generate)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == 1
+    assert set(results) == {'{"nodes": [], "edges": []}'}
+    assert metrics.get("llm_cache.coalesced_local") == 2
+    assert metrics.get("llm_cache.misses") == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_responses_are_served_until_invalidated():
+    redis_client = StubRedis()
+    cache = build_cache(redis_client)
+    responses = iter(["first", "second"])
+
+    async def generate():
+        return next(responses)
+
+    assert await cache.get_or_generate("model", "prompt", generate) == "first"
+    assert await cache.get_or_generate("model", "prompt", generate) == "first"
+    assert await cache.get_or_generate("model", "other prompt", generate) == "second"
+    assert metrics.get("llm_cache.hits") == 1
+
+    await cache.invalidate("model", "prompt")
+    assert LLMResponseCache.make_key("model", "prompt") not in redis_client.store
+    assert not any(key.endswith(":lease") for key in redis_client.store)
+
+
+@pytest.mark.asyncio
+async def test_waits_behind_another_workers_lease():
+    redis_client = StubRedis()
+    cache = build_cache(redis_client)
+    key = LLMResponseCache.make_key("model", "prompt")
+    redis_client.store[f"{key}:lease"] = "other-worker"
+
+    async def finish_elsewhere():
+        await asyncio.sleep(0.01)
+        redis_client.store[key] = "from other worker"
+        del redis_client.store[f"{key}:lease"]
+
+    async def generate():
+        raise AssertionError("should not call the model")
+
+    finisher = asyncio.create_task(finish_elsewhere())
+    assert await cache.get_or_generate("model", "prompt", generate) == "from other worker"
+    await finisher
+    assert metrics.get("llm_cache.coalesced_remote") == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_propagate_to_every_waiter_and_are_not_cached():
+    redis_client = StubRedis()
+    cache = build_cache(redis_client)
+
+    async def generate():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(
+        cache.get_or_generate("model", "prompt", generate),
+        cache.get_or_generate("model", "prompt", generate),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert redis_client.store == {}
+
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_when_the_generating_caller_is_cancelled():
+    cache = build_cache(StubRedis())
+    started = asyncio.Event()
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            started.set()
+            await asyncio.Event().wait()
+        return "response"
+
+    leader = asyncio.create_task(cache.get_or_generate("model", "prompt", generate))
+    await started.wait()
+    waiter = asyncio.create_task(cache.get_or_generate("model", "prompt", generate))
+    await asyncio.sleep(0.01)
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert await waiter == "response"
+    assert calls == 2
+
+
+class FlakyRedis(StubRedis):
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = failing
+
+    async def set(self, key, value, ex=None, nx=False):
+        if ("lease" in key) == (self.failing == "lease"):
+            raise ConnectionError("redis down")
+        return await super().set(key, value, ex=ex, nx=nx)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failing", ["lease", "result"])
+async def test_redis_errors_after_the_first_read_still_return_the_generated_response(failing):
+    cache = build_cache(FlakyRedis(failing))
+
+    async def generate():
+        return "response"
+
+    assert await cache.get_or_generate("model", "prompt", generate) == "response"
+    assert metrics.get("llm_cache.errors") == 1
@@ -0,0 +1,85 @@
+import pytest
+
+from app.db import migrations as migrations_module
+from app.db.migrations import Migration, run_migrations
+
+
+class FakeResult:
+    def __init__(self, records=None):
+        self.records = records or []
+
+    async def consume(self):
+        return None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, parameters=None):
+        self.driver.statements.append(query.strip())
+        if "MATCH (m:SchemaMigration)" in query:
+            return FakeResult([{"version": version} for version in self.driver.applied])
+        if "MERGE (m:SchemaMigration" in query:
+            self.driver.applied.add(parameters["version"])
+        return FakeResult()
+
+
+class FakeDriver:
+    def __init__(self, applied=None):
+        self.applied = set(applied or [])
+        self.statements = []
+
+    def session(self):
+        return FakeSession(self)
+
+
+MIGRATIONS = (
+    Migration(1, "first", ("CREATE INDEX one",)),
+    Migration(2, "second", ("CREATE INDEX two", "CREATE INDEX three")),
+)
+
+
+@pytest.mark.asyncio
+async def test_applies_pending_migrations_in_order_and_records_them():
+    driver = FakeDriver()
+
+    applied = await run_migrations(driver, MIGRATIONS)
+
+    assert applied == [1, 2]
+    assert driver.applied == {1, 2}
+    schema_statements = [s for s in driver.statements if s.startswith("CREATE INDEX")]
+    assert schema_statements == ["CREATE INDEX one", "CREATE INDEX two", "CREATE INDEX three"]
+
+
+@pytest.mark.asyncio
+async def test_skips_already_applied_migrations():
+    driver = FakeDriver(applied={1})
+
+    assert await run_migrations(driver, MIGRATIONS) == [2]
+    assert "CREATE INDEX one" not in driver.statements
+    assert await run_migrations(driver, MIGRATIONS) == []
+
+
+@pytest.mark.asyncio
+async def test_rejects_out_of_order_versions():
+    with pytest.raises(ValueError):
+        await run_migrations(FakeDriver(), tuple(reversed(MIGRATIONS)))
+
+
+def test_shipped_migrations_are_ordered():
+    versions = [migration.version for migration in migrations_module.MIGRATIONS]
+    assert versions == sorted(set(versions))
@@ -0,0 +1,287 @@
+"""
+Query-plan regression checks for GraphRepository.
+
+Every public repository method is invoked against a recording driver that captures the
+Cypher it sends. When NEO4J_TEST_URI points at a disposable database (with APOC), each
+captured query is run through EXPLAIN after migrations and must not plan a label or
+all-nodes scan.
+"""
+import inspect
+import os
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.core.rag_config import VECTOR_DIMENSIONS
+from app.db.migrations import run_migrations
+from app.db.repositories.graph_repository import GraphRepository, centroid_vector
+from app.models.graph import Edge, Node, NodeUpdate
+
+FORBIDDEN_OPERATORS = ("NodeByLabelScan", "AllNodesScan")
+NODE_ID = uuid4()
+OTHER_ID = uuid4()
+VECTOR = [0.1] * VECTOR_DIMENSIONS
+
+
+STUB_NODE = {"id": str(NODE_ID), "name": "a", "description": "b", "embedding": VECTOR, "userId": "user-1"}
+# Enough of every record shape the repository reads for each method to reach its follow-up
+# queries: a change log with a node upsert for the delta lookup, embedded sources for the
+# expansion context's vector search and a deleted node for the delete's change log write.
+STUB_ROW = {
+    "n": STUB_NODE,
+    "nodes": [STUB_NODE],
+    "relationships": [],
+    "revision": 5,
+    "trimmed_through": 0,
+    "changes": [{
+        "entity": "node", "op": "upsert", "nodeId": str(NODE_ID),
+        "sourceId": None, "targetId": None, "label": None,
+    }],
+    "sources": [STUB_NODE],
+    "neighbors": [],
+    "deleted_count": 1,
+    "was_deleted": True,
+}
+
+
+class RecordingResult:
+    async def single(self):
+        return STUB_ROW
+
+    async def consume(self):
+        return SimpleNamespace(counters=SimpleNamespace(nodes_deleted=1))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+
+class RecordingTransaction:
+    def __init__(self, queries):
+        self.queries = queries
+
+    async def run(self, query, parameters=None, **kwargs):
+        self.queries.append((query, parameters or {}))
+        return RecordingResult()
+
+
+class RecordingSession(RecordingTransaction):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute_read(self, func, *args, **kwargs):
+        return await func(RecordingTransaction(self.queries), *args, **kwargs)
+
+    execute_write = execute_read
+
+
+class RecordingDriver:
+    def __init__(self):
+        self.queries = []
+
+    def session(self, **kwargs):
+        return RecordingSession(self.queries)
+
+
+# One representative call per public repository method. A new method without an entry
+# here fails `test_every_repository_method_is_covered`.
+REPOSITORY_CALLS = {
+    "delete_all_nodes_for_user": lambda: (("user-1",), {}),
+    "get_full_graph": lambda: (("user-1",), {"include_embedding": True}),
+    "get_workspace_revision": lambda: (("user-1",), {}),
+    "get_graph_changes": lambda: (("user-1", 3), {}),
+    "stream_full_graph": lambda: (("user-1",), {}),
+    "add_edge": lambda: ((Edge(source_id=NODE_ID, target_id=OTHER_ID, label="rel"), "user-1"), {}),
+    "add_subgraph": lambda: (
+        (
+            [Node(id=NODE_ID, name="a", description="b", embedding=VECTOR, userId="user-1")],
+            [Edge(source_id=NODE_ID, target_id=OTHER_ID, label="rel")],
+            "user-1",
+        ),
+        {},
+    ),
+    "update_node": lambda: ((NODE_ID, NodeUpdate(name="renamed"), "user-1"), {}),
+    "add_node": lambda: ((Node(id=NODE_ID, name="a", description="b", embedding=VECTOR, userId="user-1"),), {}),
+    "get_node_by_id": lambda: ((NODE_ID, "user-1"), {}),
+    "delete_node_by_id": lambda: ((NODE_ID, "user-1"), {}),
+    "delete_edge": lambda: ((Edge(source_id=NODE_ID, target_id=OTHER_ID, label="rel"), "user-1"), {}),
+    "get_node_embeddings": lambda: (("user-1",), {}),
+    "get_1_hop_neighbors": lambda: ((NODE_ID, "user-1"), {}),
+    "find_semantically_similar_nodes": lambda: ((VECTOR, [OTHER_ID], "user-1", 0.75, 10), {}),
+    "find_semantically_similar_nodes_batch": lambda: (([VECTOR, VECTOR], [OTHER_ID], "user-1", 0.75, 10), {}),
+    "get_expansion_context": lambda: (([NODE_ID, OTHER_ID], "user-1", 0.75, 10), {"use_centroid": True}),
+}
+
+
+def _public_methods():
+    return sorted(
+        name for name, member in inspect.getmembers(GraphRepository)
+        if not name.startswith("_") and callable(member)
+    )
+
+
+async def _record_queries(method_name):
+    driver = RecordingDriver()
+    repo = GraphRepository(driver)
+    args, kwargs = REPOSITORY_CALLS[method_name]()
+    call = getattr(repo, method_name)(*args, **kwargs)
+    try:
+        if inspect.isasyncgen(call):
+            async for _ in call:
+                pass
+        else:
+            await call
+    except Exception:
+        # The recording driver returns canned rows; only the issued queries matter here.
+        pass
+    return driver.queries
+
+
+def _find_forbidden_operators(plan):
+    found = []
+    operator = plan.get("operatorType", "")
+    if operator.split("@")[0] in FORBIDDEN_OPERATORS:
+        found.append(operator)
+    for child in plan.get("children", []):
+        found.extend(_find_forbidden_operators(child))
+    return found
+
+
+@pytest.mark.asyncio
+async def test_batch_vector_search_sends_all_vectors_in_one_query():
+    driver = RecordingDriver()
+    repo = GraphRepository(driver)
+
+    await repo.find_semantically_similar_nodes_batch([[1.0, 0.0], [0.0, 1.0]], [OTHER_ID], "user-1", 0.75, 10)
+    await repo.find_semantically_similar_nodes_batch(
+        [[2.0, 0.0], [0.0, 1.0]], [], "user-1", 0.75, 10, use_centroid=True
+    )
+
+    (batched_query, batched), (_, centroid) = driver.queries
+    assert "UNWIND range(0, size($query_vectors) - 1)" in batched_query
+    assert batched["query_vectors"] == [[1.0, 0.0], [0.0, 1.0]]
+    assert centroid["query_vectors"] == [pytest.approx([0.5, 0.5])]
+
+
+class ScriptedVectorIndexTransaction:
+    """Answers the vector search query from an in-memory, globally ranked hit list."""
+
+    def __init__(self, hits):
+        self.hits = sorted(hits, key=lambda hit: hit[2], reverse=True)
+        self.ks = []
+
+    async def run(self, query, parameters=None, **kwargs):
+        k = parameters["k"]
+        self.ks.append(k)
+        top = self.hits[:k]
+        matches = [
+            {"node": {"id": node_id, "userId": user_id}, "score": score}
+            for node_id, user_id, score in top
+            if score >= parameters["threshold"] and user_id == parameters["userId"]
+            and node_id not in parameters["excluded_ids"]
+        ]
+        rows = [{
+            "vector_index": index,
+            "raw_hits": len(top),
+            "min_score": top[-1][2],
+            "matches": matches,
+        } for index in range(len(parameters["query_vectors"]))]
+        return ScriptedResult(rows)
+
+
+class ScriptedResult:
+    def __init__(self, rows):
+        self.rows = iter(rows)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.rows)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@pytest.mark.asyncio
+async def test_vector_search_widens_until_tenant_has_enough_results():
+    # Other tenants own the 40 best hits; user-1's nodes rank just below them.
+    hits = [(f"other-{i}", "user-2", 0.99 - i * 0.001) for i in range(40)]
+    hits += [(f"mine-{i}", "user-1", 0.9 - i * 0.001) for i in range(5)]
+    tx = ScriptedVectorIndexTransaction(hits)
+
+    found = await GraphRepository._search_vector_index(
+        tx, [VECTOR], ["mine-0"], "user-1", 0.75, 3, include_embedding=False, widening_factor=4
+    )
+
+    assert [node["id"] for node in found] == ["mine-1", "mine-2", "mine-3"]
+    assert tx.ks == [3, 12, 48]
+
+
+@pytest.mark.asyncio
+async def test_vector_search_stops_widening_below_threshold():
+    hits = [(f"other-{i}", "user-2", 0.9 - i * 0.1) for i in range(10)]
+    tx = ScriptedVectorIndexTransaction(hits)
+
+    found = await GraphRepository._search_vector_index(
+        tx, [VECTOR], [], "user-1", 0.75, 2, include_embedding=False, widening_factor=4
+    )
+
+    assert found == []
+    assert tx.ks == [2, 8]
+
+
+def test_centroid_vector_averages_normalized_vectors():
+    assert centroid_vector([[3.0, 0.0], [0.0, 0.5]]) == pytest.approx([0.5, 0.5])
+    assert centroid_vector([[0.0, 0.0], [0.0, 2.0]]) == pytest.approx([0.0, 0.5])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method_name, marker", [
+    ("get_graph_changes", "UNWIND $ids AS node_id"),
+    ("get_expansion_context", "db.index.vector.queryNodes"),
+    ("delete_node_by_id", "MERGE (w:Workspace"),
+])
+async def test_follow_up_queries_are_recorded(method_name, marker):
+    queries = await _record_queries(method_name)
+
+    assert len(queries) == 2
+    assert marker in queries[1][0]
+
+
+def test_every_repository_method_is_covered():
+    assert _public_methods() == sorted(REPOSITORY_CALLS)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method_name", sorted(REPOSITORY_CALLS))
+async def test_repository_method_issues_queries(method_name):
+    assert await _record_queries(method_name)
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.getenv("NEO4J_TEST_URI"), reason="NEO4J_TEST_URI is not set")
+@pytest.mark.parametrize("method_name", sorted(REPOSITORY_CALLS))
+async def test_repository_queries_do_not_scan_labels(method_name):
+    from neo4j import AsyncGraphDatabase
+
+    driver = AsyncGraphDatabase.driver(
+        os.environ["NEO4J_TEST_URI"],
+        auth=(os.getenv("NEO4J_TEST_USER", "neo4j"), os.getenv("NEO4J_TEST_PASSWORD", "test")),
+    )
+    try:
+        await run_migrations(driver)
+        async with driver.session() as session:
+            for query, parameters in await _record_queries(method_name):
+                result = await session.run(f"EXPLAIN {query}", parameters)
+                summary = await result.consume()
+                forbidden = _find_forbidden_operators(summary.plan or {})
+                assert not forbidden, f"{method_name} plans {forbidden} for query:\n{query}"
+    finally:
+        await driver.close()
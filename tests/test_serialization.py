@@ -0,0 +1,92 @@
+import gzip
+from uuid import uuid4
+
+import orjson
+import pytest
+from starlette.requests import Request
+
+from app.api import serialization
+from app.api.serialization import negotiate, negotiated_response
+from app.models.graph import Edge, Graph, Node
+
+# The optional codecs from the `fast-encodings` extra.
+brotli = pytest.importorskip("brotli")
+msgpack = pytest.importorskip("msgpack")
+
+
+def make_request(**headers):
+    raw = [(name.replace("_", "-").lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def make_graph(size):
+    nodes = [Node(name=f"Concept {i}", description="A description long enough to compress.") for i in range(size)]
+    edges = [Edge(source_id=a.id, target_id=b.id, label="relates_to") for a, b in zip(nodes, nodes[1:])]
+    return Graph(nodes=nodes, edges=edges, revision=3)
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("", "identity"),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("*", "br"),
+    ("gzip;q=0, identity", "identity"),
+])
+def test_negotiates_content_coding_by_quality(accept_encoding, expected):
+    assert negotiate(make_request(accept_encoding=accept_encoding)).encoding == expected
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", "application/json"),
+    ("application/json", "application/json"),
+    ("application/msgpack", "application/msgpack"),
+    ("application/x-msgpack, application/json;q=0.5", "application/msgpack"),
+    ("application/json, application/msgpack;q=0.5", "application/json"),
+])
+def test_negotiates_media_type(accept, expected):
+    assert negotiate(make_request(accept=accept)).media_type == expected
+
+
+def test_falls_back_without_optional_codecs(monkeypatch):
+    monkeypatch.setattr(serialization, "brotli", None)
+    monkeypatch.setattr(serialization, "msgpack", None)
+
+    negotiation = negotiate(make_request(accept="application/msgpack", accept_encoding="br, gzip"))
+
+    assert (negotiation.media_type, negotiation.encoding) == ("application/json", "gzip")
+
+
+def test_compresses_json_with_brotli_and_keeps_model_shape():
+    graph = make_graph(50)
+
+    response = negotiated_response(make_request(accept_encoding="br"), graph)
+
+    assert response.headers["content-encoding"] == "br"
+    assert orjson.loads(brotli.decompress(response.body)) == graph.model_dump(mode="json")
+
+
+def test_encodes_msgpack_with_uuids_as_strings():
+    graph = make_graph(3)
+
+    response = negotiated_response(make_request(accept="application/msgpack"), graph)
+
+    assert response.media_type == "application/msgpack"
+    assert msgpack.unpackb(response.body) == graph.model_dump(mode="json")
+
+
+def test_small_bodies_are_not_compressed():
+    response = negotiated_response(make_request(accept_encoding="gzip"), Edge(source_id=uuid4(), target_id=uuid4(), label="r"))
+
+    assert "content-encoding" not in response.headers
+
+
+def test_pre_compressed_json_passes_through_or_is_transcoded():
+    graph = make_graph(20)
+    gzipped = gzip.compress(graph.model_dump_json().encode())
+
+    passthrough = negotiated_response(make_request(accept_encoding="gzip"), gzipped_json=gzipped)
+    transcoded = negotiated_response(make_request(accept="application/msgpack"), gzipped_json=gzipped)
+
+    assert passthrough.body is gzipped
+    assert msgpack.unpackb(transcoded.body) == graph.model_dump(mode="json")
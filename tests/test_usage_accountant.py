@@ -0,0 +1,151 @@
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.core.exceptions import QuotaExceededException
+from app.models.graph import NodeCreate
+from app.services.graph_service import GraphService
+from app.services.usage_accountant import UsageAccountant
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue_call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue_call
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values: dict[str, int] = {}
+        self.failing = False
+
+    def pipeline(self, transaction=True):
+        if self.failing:
+            raise ConnectionError("redis down")
+        return FakePipeline(self)
+
+    async def incrby(self, key, amount):
+        self.values[key] = self.values.get(key, 0) + amount
+        return self.values[key]
+
+    async def expire(self, key, seconds):
+        return True
+
+    async def mget(self, keys):
+        if self.failing:
+            raise ConnectionError("redis down")
+        return [self.values.get(key) for key in keys]
+
+
+def build_accountant(redis, budget=100):
+    return UsageAccountant(budget=budget, window_seconds=60, buckets=6, redis_client_factory=lambda: redis)
+
+
+@pytest.mark.asyncio
+async def test_charges_are_weighted_and_refused_once_the_budget_is_spent(monkeypatch):
+    monkeypatch.setattr(settings, "USAGE_RESPONSE_TOKEN_COST", 4)
+    monkeypatch.setattr(settings, "USAGE_EMBEDDING_COST", 20)
+    accountant = build_accountant(FakeRedis())
+
+    await accountant.charge_tokens("user-1", SimpleNamespace(prompt_token_count=10, candidates_token_count=5))
+    await accountant.charge_embeddings("user-1", 2)
+    await accountant.check("user-1")
+    await accountant.charge_rows("user-1", 30)
+
+    with pytest.raises(QuotaExceededException) as exc_info:
+        await accountant.check("user-1")
+    assert 1 <= exc_info.value.retry_after <= 60
+    # Budgets are per user.
+    await accountant.check("user-2")
+
+
+@pytest.mark.asyncio
+async def test_usage_older_than_the_window_no_longer_counts(monkeypatch):
+    redis = FakeRedis()
+    accountant = build_accountant(redis)
+    clock = {"now": 1_000.0}
+    monkeypatch.setattr("app.services.usage_accountant.time.time", lambda: clock["now"])
+
+    await accountant.charge_rows("user-1", 150)
+    with pytest.raises(QuotaExceededException):
+        await accountant.check("user-1")
+
+    clock["now"] += 60
+    await accountant.check("user-1")
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_fail_open():
+    redis = FakeRedis()
+    redis.failing = True
+    accountant = build_accountant(redis, budget=1)
+
+    await accountant.charge_rows("user-1", 10)
+    await accountant.check("user-1")
+
+
+@pytest.mark.asyncio
+async def test_ai_action_is_refused_before_any_work_when_over_budget():
+    redis = FakeRedis()
+    accountant = build_accountant(redis, budget=10)
+    await accountant.charge_rows("user-1", 10)
+
+    class FailingRepository:
+        async def get_nodes_by_ids(self, *args, **kwargs):
+            raise AssertionError("over-budget actions must not read the graph")
+
+    service = GraphService(
+        driver=None, embedding_service=object(), ai_service=object(), usage_accountant=accountant
+    )
+    service.repo = FailingRepository()
+
+    with pytest.raises(QuotaExceededException):
+        await service.execute_ai_action("expand", [uuid4()], "user-1")
+
+
+@pytest.mark.asyncio
+async def test_only_embeddings_computed_by_the_api_are_charged(monkeypatch):
+    monkeypatch.setattr(settings, "USAGE_EMBEDDING_COST", 20)
+    redis = FakeRedis()
+    accountant = build_accountant(redis)
+
+    class CachingEmbeddingService:
+        def __init__(self):
+            self.seen = set()
+
+        async def fetch_embedding(self, text):
+            from_api = text not in self.seen
+            self.seen.add(text)
+            return [0.1, 0.2], from_api
+
+    class StubRepository:
+        async def add_node(self, node):
+            return node
+
+    service = GraphService(
+        driver=None, embedding_service=CachingEmbeddingService(), ai_service=object(), usage_accountant=accountant
+    )
+    service.repo = StubRepository()
+    node = NodeCreate(name="Node", description="ok")
+
+    await service.create_node(node, "user-1")
+    await service.create_node(node, "user-1")
+
+    assert sum(redis.values.values()) == 20
@@ -0,0 +1,28 @@
+import pytest
+
+from app.models.graph import VectorEncoding
+from app.services.vector_codec import decode_vector, encode_vector
+
+
+def test_float32_round_trip_is_exact_for_float32_values():
+    values = [0.5, -0.25, 0.125, 1.0]
+    encoded = encode_vector(values, VectorEncoding.FLOAT32)
+
+    assert encoded.dimensions == 4
+    assert encoded.scale is None
+    assert decode_vector(encoded) == values
+
+
+def test_int8_round_trip_is_close_and_compact():
+    values = [i / 768 - 0.5 for i in range(768)]
+    encoded = encode_vector(values, VectorEncoding.INT8)
+    float_encoded = encode_vector(values, VectorEncoding.FLOAT32)
+
+    assert len(encoded.data) * 4 == pytest.approx(len(float_encoded.data), rel=0.01)
+    decoded = decode_vector(encoded)
+    assert max(abs(a - b) for a, b in zip(values, decoded)) <= encoded.scale
+
+
+def test_int8_handles_zero_vector():
+    encoded = encode_vector([0.0, 0.0], VectorEncoding.INT8)
+    assert decode_vector(encoded) == [0.0, 0.0]
@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+from app.core.metrics import metrics
+from app.models.graph import Node
+from app.services.vector_index import InMemoryVectorIndex, WorkspaceVectors
+
+
+def node(name, embedding, user_id="user-1"):
+    return Node(name=name, description=name.lower(), embedding=embedding, userId=user_id)
+
+
+class StubLoader:
+    def __init__(self, workspaces):
+        self.workspaces = workspaces
+        self.calls = []
+
+    async def __call__(self, user_id):
+        self.calls.append(user_id)
+        await asyncio.sleep(0)
+        return list(self.workspaces.get(user_id, []))
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_workspace_search_ranks_by_best_score_across_query_vectors():
+    a, b, c = node("A", [1.0, 0.0]), node("B", [0.0, 2.0]), node("C", [1.0, 1.0])
+    workspace = WorkspaceVectors([a, b, c])
+
+    found = workspace.search([[1.0, 0.0], [0.0, 1.0]], excluded_ids=set(), threshold=0.5, limit=3)
+
+    assert [n.name for n in found][:2] in (["A", "B"], ["B", "A"])
+    assert found[2].name == "C"
+    assert found[1].embedding is not None
+
+
+def test_workspace_search_applies_threshold_exclusions_and_limit():
+    nodes = [node(f"N{i}", [1.0, i / 10]) for i in range(10)]
+    workspace = WorkspaceVectors(nodes)
+
+    found = workspace.search([[1.0, 0.0]], excluded_ids={str(nodes[0].id)}, threshold=0.9, limit=3)
+
+    assert [n.name for n in found] == ["N1", "N2", "N3"]
+
+
+def test_workspace_append_grows_capacity_and_remove_fills_gaps():
+    workspace = WorkspaceVectors([])
+    nodes = [node(f"N{i}", [float(i + 1), 1.0]) for i in range(40)]
+    workspace.upsert(nodes)
+    workspace.remove([str(nodes[0].id), str(nodes[5].id)])
+
+    assert len(workspace) == 38
+    found = workspace.search([[1.0, 1.0]], excluded_ids=set(), threshold=-1.0, limit=100)
+    assert {n.id for n in found} == {n.id for n in nodes} - {nodes[0].id, nodes[5].id}
+
+
+def test_workspace_upsert_without_embedding_updates_metadata_only():
+    original = node("Old", [1.0, 0.0])
+    workspace = WorkspaceVectors([original])
+
+    workspace.upsert([Node(id=original.id, name="New", description="renamed")])
+
+    [found] = workspace.search([[1.0, 0.0]], excluded_ids=set(), threshold=0.5, limit=1)
+    assert (found.name, found.description, found.userId) == ("New", "renamed", "user-1")
+
+
+@pytest.mark.asyncio
+async def test_index_loads_lazily_once_and_tracks_writes():
+    loader = StubLoader({"user-1": [node("A", [1.0, 0.0])]})
+    index = InMemoryVectorIndex(loader, max_bytes=1 << 20, ttl_seconds=60)
+
+    results = await asyncio.gather(*[index.search("user-1", [[1.0, 0.0]], [], 0.5, 5) for _ in range(3)])
+    index.upsert("user-1", [node("B", [0.9, 0.1])])
+    after_write = await index.search("user-1", [[1.0, 0.0]], [], 0.5, 5)
+
+    assert loader.calls == ["user-1"]
+    assert all([n.name for n in found] == ["A"] for found in results)
+    assert [n.name for n in after_write] == ["A", "B"]
+
+
+@pytest.mark.asyncio
+async def test_index_evicts_least_recently_used_workspace():
+    loader = StubLoader({user: [node(user, [1.0] * 64, user)] for user in ("u1", "u2", "u3")})
+    workspace_bytes = WorkspaceVectors(await loader("u1")).nbytes
+    loader.calls.clear()
+    index = InMemoryVectorIndex(loader, max_bytes=2 * workspace_bytes, ttl_seconds=60)
+
+    for user in ("u1", "u2", "u1", "u3", "u1", "u2"):
+        await index.search(user, [[1.0] * 64], [], 0.5, 1)
+
+    assert loader.calls == ["u1", "u2", "u3", "u2"]
+    assert metrics.get("vector_index.evictions") == 2
+
+
+@pytest.mark.asyncio
+async def test_index_reports_fallback_for_oversized_workspace():
+    loader = StubLoader({"user-1": [node("A", [1.0] * 64)]})
+    index = InMemoryVectorIndex(loader, max_bytes=16, ttl_seconds=60)
+
+    assert await index.search("user-1", [[1.0] * 64], [], 0.5, 1) is None
+    assert metrics.get("vector_index.fallbacks") == 1
+
+
+@pytest.mark.asyncio
+async def test_index_reloads_after_ttl_and_drop():
+    loader = StubLoader({"user-1": [node("A", [1.0, 0.0])]})
+    index = InMemoryVectorIndex(loader, max_bytes=1 << 20, ttl_seconds=0)
+
+    await index.search("user-1", [[1.0, 0.0]], [], 0.5, 1)
+    await index.search("user-1", [[1.0, 0.0]], [], 0.5, 1)
+    index.ttl_seconds = 60
+    index.drop("user-1")
+    await index.search("user-1", [[1.0, 0.0]], [], 0.5, 1)
+
+    assert loader.calls == ["user-1", "user-1", "user-1"]
+
+
+class StubVersions:
+    def __init__(self):
+        self.versions = {}
+
+    async def __call__(self, user_id):
+        return self.versions.get(user_id, 0)
+
+
+@pytest.mark.asyncio
+async def test_index_reloads_when_another_process_bumps_the_version():
+    loader = StubLoader({"user-1": [node("A", [1.0, 0.0])]})
+    versions = StubVersions()
+    index = InMemoryVectorIndex(loader, max_bytes=1 << 20, ttl_seconds=3600, version_source=versions)
+
+    await index.search("user-1", [[1.0, 0.0]], [], 0.5, 5)
+    await index.search("user-1", [[1.0, 0.0]], [], 0.5, 5)
+    loader.workspaces["user-1"].append(node("B", [0.9, 0.1]))
+    versions.versions["user-1"] = 1
+    found = await index.search("user-1", [[1.0, 0.0]], [], 0.5, 5)
+
+    assert loader.calls == ["user-1", "user-1"]
+    assert [n.name for n in found] == ["A", "B"]
+    assert metrics.get("vector_index.stale") == 1
+
+
+@pytest.mark.asyncio
+async def test_index_keeps_serving_after_advancing_past_its_own_write():
+    loader = StubLoader({"user-1": [node("A", [1.0, 0.0])]})
+    versions = StubVersions()
+    index = InMemoryVectorIndex(loader, max_bytes=1 << 20, ttl_seconds=3600, version_source=versions)
+    await index.search("user-1", [[1.0, 0.0]], [], 0.5, 5)
+
+    index.upsert("user-1", [node("B", [0.9, 0.1])])
+    versions.versions["user-1"] = 1
+    index.advance("user-1", 1)
+    after_own_write = await index.search("user-1", [[1.0, 0.0]], [], 0.5, 5)
+    # Another process wrote version 2 before this one's write became version 3.
+    versions.versions["user-1"] = 3
+    index.advance("user-1", 3)
+    await index.search("user-1", [[1.0, 0.0]], [], 0.5, 5)
+
+    assert [n.name for n in after_own_write] == ["A", "B"]
+    assert loader.calls == ["user-1", "user-1"]